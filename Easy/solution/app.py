@@ -2,7 +2,7 @@ import datetime
 
 from flask import Flask, render_template, request
 
-from utilities import shop_details, shopping_list
+from utilities import price_line, pricing, shop_details, shopping_list
 
 app = Flask(__name__)
 
@@ -33,9 +33,7 @@ def get_bill(request):
     selected_item = request.form.get("selectedItem")
     quantity = int(request.form.get("quantity"))
     item_cost = shopping_list[selected_item]
-    price = item_cost * quantity
-    tax_applied = 0.06 * price
-    total_price = price + tax_applied
+    totals = pricing.quote([price_line(selected_item, quantity)]).rupees()
     bill = {
         **shop_details,
         "customerName": customer_name,
@@ -43,8 +41,8 @@ def get_bill(request):
         "selectedItem": selected_item,
         "quantity": quantity,
         "itemCost": item_cost,
-        "totalTax": tax_applied,
-        "totalPrice": total_price,
+        "totalTax": totals["tax"],
+        "totalPrice": totals["total"],
         "paymentMethod": payment_method,
         "billingDateTime": datetime.datetime.now(),
     }
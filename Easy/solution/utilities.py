@@ -1,3 +1,11 @@
+import os
+import sys
+
+# Shared components live in the gadgetify package at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from gadgetify.pricing import PriceLine, PricingEngine, to_paise  # noqa: E402
+
 shopping_list = {
     "boAt BassHeads 100 in-Ear Wired Earphones": 399,
     "Bose SoundSport Wireless Earbuds": 13275,
@@ -10,3 +18,11 @@ shop_details = {
     "shopAddress": "311/5 Akshay nagar, Bangalore, Karnataka, India",
     "shopContactNumber": "+91 9988776655",
 }
+# Tax and discount rules; see gadgetify.pricing
+pricing = PricingEngine()
+
+
+def price_line(item_name, quantity):
+    return PriceLine(
+        key=item_name, quantity=quantity, price=to_paise(shopping_list[item_name])
+    )
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "GadgetifyWithGSBlr.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up. Serves the order event streams on the event
+# loop and hands every other request to Django.
+from shoppingcart.streams import EventStreamRouter  # noqa: E402
+
+application = EventStreamRouter(django_application)
@@ -11,12 +11,16 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
 import os
+import sys
 
 from django.contrib.messages import constants as message_constants
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Components shared with the other solutions live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(BASE_DIR)))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.0/howto/deployment/checklist/
@@ -43,8 +47,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "shoppingcart.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "shoppingcart.cart.CartMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -56,7 +62,7 @@ ROOT_URLCONF = "GadgetifyWithGSBlr.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "shoppingcart.metrics.TimedDjangoTemplates",
         "DIRS": ["GadgetifyWithGSBlr/templates/"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -84,6 +90,38 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Use a cache shared by all worker processes (Memcached, Redis, database)
+# when running more than one worker.
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",}
+}
+
+
+# Cart storage
+# One of shoppingcart.cart.SignedCookieCartStore, CacheCartStore or
+# DatabaseCartStore. The cookie store keeps no server-side state, so any
+# worker can serve any request.
+
+CART_STORE = "shoppingcart.cart.SignedCookieCartStore"
+
+
+# Request metrics
+# MetricsMiddleware logs a warning when a view runs more queries than its
+# budget. QUERY_BUDGETS overrides QUERY_BUDGET per URL name.
+
+QUERY_BUDGET = 30
+QUERY_BUDGETS = {}
+
+
+# Background tasks
+# The run_worker command writes order_<id>.json invoice files here.
+
+INVOICE_DIRECTORY = os.path.join(BASE_DIR, "shoppingcart", "order_invoices")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -67,3 +67,114 @@ function deliveryCheck() {
 //   });
 // });
 // END //
+
+// Batch Cart Updates
+//
+// Sends every changed quantity on the shopping list in one request to the
+// cart API instead of posting and reloading the page once per item.
+$(function () {
+  var updateButton = $("#update_cart");
+  if (!updateButton.length) {
+    return;
+  }
+  var csrftoken = $("[name=csrfmiddlewaretoken]").first().val();
+
+  function showSummary(data) {
+    $("#cart_summary").text(
+      `${data["units"]} items, \u20B9 ${data["subtotal"]}` +
+        (data["savings"] ? ` (saving \u20B9 ${data["savings"]})` : "")
+    );
+  }
+
+  function pendingChanges() {
+    var changes = {};
+    $(".cart-form").each(function () {
+      var input = $(this).find("[name=quantity]");
+      if (input.val() !== String(input.data("saved"))) {
+        changes[$(this).data("item-pk")] = parseInt(input.val() || "0", 10);
+      }
+    });
+    return changes;
+  }
+
+  function updateCart() {
+    var changes = pendingChanges();
+    if ($.isEmptyObject(changes)) {
+      return;
+    }
+    $.ajax({
+      url: updateButton.data("url"),
+      type: "POST",
+      contentType: "application/json",
+      headers: { "X-CSRFToken": csrftoken },
+      data: JSON.stringify({ items: changes }),
+      success: function (data) {
+        var quantities = {};
+        data["lines"].forEach(function (line) {
+          quantities[line["item_pk"]] = line["quantity"];
+        });
+        $(".cart-form").each(function () {
+          var itemPk = $(this).data("item-pk");
+          var quantity = quantities[itemPk] || 0;
+          var input = $(this).find("[name=quantity]");
+          input.data("saved", quantity).val(quantity);
+          $(this)
+            .find("button")
+            .text(quantity ? "Update Quantity" : "Add to Cart");
+        });
+        showSummary(data);
+        var errors = Object.values(data["errors"]);
+        if (errors.length) {
+          alert(errors.join("\n"));
+        }
+      },
+    });
+  }
+
+  $(".cart-form").on("submit", function (event) {
+    event.preventDefault();
+    updateCart();
+  });
+  updateButton.on("click", updateCart);
+  $.getJSON(updateButton.data("url"), showSummary);
+});
+// END //
+
+// Live Order Updates
+//
+// Server-Sent Events from the ASGI event streams (see shoppingcart/streams.py).
+// Under a WSGI server the streams don't exist and these quietly do nothing.
+$(function () {
+  var orderFeed = $("#order_feed");
+  if (orderFeed.length && window.EventSource) {
+    var statuses = JSON.parse($("#order_status_names").text());
+    var newOrders = 0;
+    var source = new EventSource(orderFeed.data("url"));
+    source.addEventListener("order", function () {
+      newOrders += 1;
+      orderFeed.find("span").text(`${newOrders} new order(s) placed.`);
+      orderFeed.show();
+    });
+    source.addEventListener("status", function (event) {
+      var change = JSON.parse(event.data);
+      $(`tr[data-order-id=${change["id"]}] .order-status`).text(
+        statuses[change["status"]] || change["status"]
+      );
+    });
+  }
+
+  var statusFeed = $("#order_status_feed");
+  if (statusFeed.length && window.EventSource) {
+    var statusSource = new EventSource(statusFeed.data("url"));
+    statusSource.addEventListener("status", function (event) {
+      var change = JSON.parse(event.data);
+      if (change["status"] !== statusFeed.data("status")) {
+        statusFeed
+          .text("Your order status has changed. Reload to see the update.")
+          .show();
+        statusSource.close();
+      }
+    });
+  }
+});
+// END //
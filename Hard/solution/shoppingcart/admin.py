@@ -1,38 +1,73 @@
-from datetime import datetime
-
 from django.contrib import admin
+from django.utils import timezone
+
+from shoppingcart.models import (
+    Category,
+    DeliveryTier,
+    Item,
+    ItemPriceVersion,
+    Order,
+    OrderPromotion,
+    OrderStatusEvent,
+    Promotion,
+    Task,
+)
+
 
-from shoppingcart.models import Category, Item, Order
+class OrderPromotionInline(admin.TabularInline):
+    model = OrderPromotion
+    fields = ("promotion", "name", "discount")
+    readonly_fields = fields
+    extra = 0
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    actions = ["mark_as_complete", "mark_as_cancelled", "mark_as_in_transit"]
+    actions = ["mark_as_complete", "mark_as_cancelled"]
     list_display = (
         "pk",
         "order_status",
         "billing_date_time",
         "order_modified",
-        "amount_payable",
+        "payable",
         "delivery_option",
         "payment_method",
     )
     list_filter = ("order_status", "delivery_option")
+    inlines = [OrderPromotionInline]
+
+    def change_status(self, request, queryset, new_status):
+        changed = queryset.change_status(new_status, source="admin")
+        self.message_user(
+            request,
+            f"{len(changed)} orders changed, "
+            f"{queryset.count() - len(changed)} not allowed to change",
+        )
 
     def mark_as_complete(self, request, queryset):
-        queryset.update(order_status="COMP", order_modified=datetime.now())
+        self.change_status(request, queryset, "COMP")
 
     mark_as_complete.short_description = "Mark selected orders as completed"
 
     def mark_as_cancelled(self, request, queryset):
-        queryset.update(order_status="CANC", order_modified=datetime.now())
+        self.change_status(request, queryset, "CANC")
 
     mark_as_cancelled.short_description = "Mark selected orders as cancelled"
 
-    def mark_as_in_transit(self, request, queryset):
-        queryset.update(order_status="TRAN", order_modified=datetime.now())
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
-    mark_as_in_transit.short_description = "Mark selected orders as in transit"
+
+@admin.register(OrderStatusEvent)
+class OrderStatusEventAdmin(admin.ModelAdmin):
+    list_display = ("order", "from_status", "to_status", "changed_at", "source")
+    list_filter = ("to_status", "source")
 
     def has_add_permission(self, request):
         return False
@@ -54,13 +89,84 @@ class ItemAdmin(admin.ModelAdmin):
         "discount_price",
         "weight_in_gms",
         "available",
+        "stock_quantity",
     )
     list_filter = ("category", "available")
 
+    def save_model(self, request, obj, form, change):
+        # Write only what changed, so stock taken by checkouts isn't overwritten
+        if change and form.changed_data:
+            obj.save(update_fields=form.changed_data)
+        elif not change:
+            obj.save()
+
+
+@admin.register(ItemPriceVersion)
+class ItemPriceVersionAdmin(admin.ModelAdmin):
+    list_display = ("item", "original_price", "discount_price", "valid_from")
+    list_select_related = ("item",)
+    date_hierarchy = "valid_from"
+    raw_id_fields = ("item",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = (
         "pk",
         "name",
+        "tax_rate",
+    )
+
+
+@admin.register(Promotion)
+class PromotionAdmin(admin.ModelAdmin):
+    list_display = (
+        "pk",
+        "name",
+        "kind",
+        "percent",
+        "starts_at",
+        "ends_at",
+        "enabled",
+    )
+    list_filter = ("kind", "enabled")
+    filter_horizontal = ("items", "categories")
+
+
+@admin.register(DeliveryTier)
+class DeliveryTierAdmin(admin.ModelAdmin):
+    list_display = (
+        "max_distance_km",
+        "cost",
+        "surcharge_per_kg",
     )
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    actions = ["retry"]
+    list_display = ("pk", "name", "status", "attempts", "run_at", "finished")
+    list_filter = ("status", "name")
+
+    def retry(self, request, queryset):
+        retried = queryset.exclude(status=Task.RUNNING).update(
+            status=Task.QUEUED, attempts=0, run_at=timezone.now(), finished=None
+        )
+        self.message_user(request, f"{retried} tasks queued again")
+
+    retry.short_description = "Run selected tasks again"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,266 @@
+"""Hourly and daily sales rollups for the vendor sales dashboard.
+
+Every order that isn't cancelled adds its totals to one ``SalesRollup`` row
+per period (the hour and the day it was billed in) and dimension: the
+overall total, its payment method, its delivery option, and each item and
+category on it. ``Order.in_sales_rollups`` records whether an order is
+currently added in, so ``update_rollups`` only applies the difference for
+each order; running it twice changes nothing, and a cancellation takes the
+order's amounts back out of the same rows.
+
+Line prices are before promotions, order subtotals after them, so what
+promotions took off an order is split across its lines in proportion to
+their amounts; item and category revenue then add up to the subtotal.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from gadgetify.pricing import allocate, to_paise, to_rupees
+from shoppingcart.exports import iter_orders
+from shoppingcart.models import Order, SalesRollup
+
+ROLLUP_BATCH_SIZE = 1000
+ROLLUP_LINE_FIELDS = (
+    "item_id",
+    "name",
+    "category_id",
+    "category__name",
+    "original_price",
+    "discount_price",
+    "quantity",
+)
+UNCOUNTED_STATUSES = {"CANC"}
+DASHBOARD_PERIODS = {
+    SalesRollup.HOUR: timedelta(hours=48),
+    SalesRollup.DAY: timedelta(days=30),
+}
+PAYMENT_NAMES = dict(Order.PAYMENT_CHOICES)
+DELIVERY_NAMES = dict(Order.DELIVERY_CHOICES)
+
+
+def period_starts(billing_date_time):
+    local = timezone.localtime(billing_date_time)
+    hour = local.replace(minute=0, second=0, microsecond=0)
+    return [(SalesRollup.HOUR, hour), (SalesRollup.DAY, hour.replace(hour=0))]
+
+
+def contributions(order, lines):
+    """``(dimension, key, label, amounts)`` for each rollup row an order adds
+    to, with amounts in ``SalesRollup.AMOUNT_FIELDS`` order."""
+    units = sum(line["quantity"] for line in lines)
+    order_amounts = [
+        1,
+        units,
+        order["subtotal"] or 0,
+        order["tax"] or 0,
+        order["shipping"] or 0,
+        order["savings"] or 0,
+    ]
+    payment_method = order["payment_method"]
+    delivery_option = order["delivery_option"]
+    rows = [
+        (SalesRollup.TOTAL, "", "", order_amounts),
+        (
+            SalesRollup.PAYMENT_METHOD,
+            payment_method,
+            PAYMENT_NAMES.get(payment_method, payment_method),
+            order_amounts,
+        ),
+        (
+            SalesRollup.DELIVERY_OPTION,
+            delivery_option,
+            DELIVERY_NAMES.get(delivery_option, delivery_option),
+            order_amounts,
+        ),
+    ]
+    line_amounts = {
+        i: to_paise(line["discount_price"] or line["original_price"]) * line["quantity"]
+        for i, line in enumerate(lines)
+    }
+    # What promotions took off the lines' total, shared out between them.
+    shares = {}
+    if order["subtotal"] is not None:
+        promotion_discount = sum(line_amounts.values()) - to_paise(order["subtotal"])
+        if promotion_discount > 0:
+            shares = allocate(promotion_discount, line_amounts)
+    categories = {}
+    for i, line in enumerate(lines):
+        price = line["discount_price"] or line["original_price"]
+        quantity = line["quantity"]
+        share = float(to_rupees(shares.get(i, 0)))
+        amounts = [
+            1,
+            quantity,
+            price * quantity - share,
+            0,
+            0,
+            (line["original_price"] - price) * quantity + share,
+        ]
+        if line["item_id"] is not None:
+            rows.append((SalesRollup.ITEM, str(line["item_id"]), line["name"], amounts))
+        if line["category_id"] is not None:
+            name, totals = categories.setdefault(
+                line["category_id"], (line["category__name"], [1, 0, 0, 0, 0, 0])
+            )
+            for i in range(1, len(totals)):
+                totals[i] += amounts[i]
+    for category_id, (name, totals) in categories.items():
+        rows.append((SalesRollup.CATEGORY, str(category_id), name, totals))
+    return rows
+
+
+def add_order(deltas, order, lines, sign=1):
+    """Add ``sign`` times the order's amounts to ``deltas``, keyed by rollup
+    row as ``(period, period_start, dimension, key)``."""
+    rows = contributions(order, lines)
+    for period, start in period_starts(order["billing_date_time"]):
+        for dimension, key, label, amounts in rows:
+            delta = deltas.setdefault(
+                (period, start, dimension, key), [label, 0, 0, 0, 0, 0, 0]
+            )
+            delta[0] = label
+            for i, amount in enumerate(amounts, 1):
+                delta[i] += sign * amount
+
+
+def build_rollup(row_key, delta):
+    period, period_start, dimension, key = row_key
+    label, *amounts = delta
+    return SalesRollup(
+        period=period,
+        period_start=period_start,
+        dimension=dimension,
+        key=key,
+        label=label[:40],
+        **{
+            field: round(amount, 2)
+            for field, amount in zip(SalesRollup.AMOUNT_FIELDS, amounts)
+        },
+    )
+
+
+def apply_deltas(deltas, batch_size=ROLLUP_BATCH_SIZE):
+    """Add ``deltas`` to the rollup rows, creating the rows that are missing
+    and deleting those left without orders."""
+    if not deltas:
+        return
+    existing = {
+        (rollup.period, rollup.period_start, rollup.dimension, rollup.key): rollup
+        for rollup in SalesRollup.objects.select_for_update().filter(
+            period_start__in={start for _, start, _, _ in deltas},
+            key__in={key for _, _, _, key in deltas},
+        )
+    }
+    created, changed, emptied = [], [], []
+    for row_key, delta in deltas.items():
+        rollup = existing.get(row_key)
+        if rollup is None:
+            created.append(build_rollup(row_key, delta))
+            continue
+        label, *amounts = delta
+        rollup.label = label[:40]
+        for field, amount in zip(SalesRollup.AMOUNT_FIELDS, amounts):
+            setattr(rollup, field, round(getattr(rollup, field) + amount, 2))
+        if rollup.orders > 0:
+            changed.append(rollup)
+        else:
+            emptied.append(rollup.pk)
+    SalesRollup.objects.bulk_create(created, batch_size)
+    SalesRollup.objects.bulk_update(
+        changed, ["label", *SalesRollup.AMOUNT_FIELDS], batch_size
+    )
+    SalesRollup.objects.filter(pk__in=emptied).delete()
+
+
+@transaction.atomic
+def update_rollups(order_ids):
+    """Bring the rollups in line with the current status of ``order_ids``."""
+    signs = {}
+    for pk, status, counted in (
+        Order.objects.filter(pk__in=order_ids)
+        .select_for_update()
+        .values_list("pk", "order_status", "in_sales_rollups")
+    ):
+        should_count = status not in UNCOUNTED_STATUSES
+        if should_count != counted:
+            signs[pk] = 1 if should_count else -1
+    if not signs:
+        return 0
+
+    deltas = {}
+    changing = Order.objects.filter(pk__in=list(signs))
+    for order, lines in iter_orders(
+        changing, with_lines=True, line_fields=ROLLUP_LINE_FIELDS
+    ):
+        add_order(deltas, order, lines, signs[order["id"]])
+    apply_deltas(deltas)
+    for sign in (1, -1):
+        changing.filter(pk__in=[pk for pk in signs if signs[pk] == sign]).update(
+            in_sales_rollups=sign > 0
+        )
+    return len(signs)
+
+
+@transaction.atomic
+def rebuild_rollups(batch_size=ROLLUP_BATCH_SIZE):
+    """Recompute every rollup row from the order history.
+
+    Orders and their lines are read in one streaming pass; only the rollup
+    rows being built are held in memory. Returns the number of rows.
+    """
+    # Orders placed while this runs are left for their own update task.
+    last_pk = Order.objects.aggregate(last_pk=Max("pk"))["last_pk"] or 0
+    read = Order.objects.filter(pk__lte=last_pk)
+    deltas = {}
+    for order, lines in iter_orders(
+        read.exclude(order_status__in=UNCOUNTED_STATUSES),
+        with_lines=True,
+        line_fields=ROLLUP_LINE_FIELDS,
+    ):
+        add_order(deltas, order, lines)
+
+    SalesRollup.objects.all().delete()
+    SalesRollup.objects.bulk_create(
+        (build_rollup(row_key, delta) for row_key, delta in deltas.items()),
+        batch_size,
+    )
+    read.filter(order_status__in=UNCOUNTED_STATUSES).update(in_sales_rollups=False)
+    read.exclude(order_status__in=UNCOUNTED_STATUSES).update(in_sales_rollups=True)
+    return len(deltas)
+
+
+def sales_summary(period=SalesRollup.DAY, top=10, now=None):
+    """Dashboard figures for the last ``DASHBOARD_PERIODS[period]``, read
+    from the rollups alone."""
+    now = now or timezone.now()
+    since = dict(period_starts(now - DASHBOARD_PERIODS[period]))[period]
+    rollups = SalesRollup.objects.filter(period=period, period_start__gte=since)
+    sums = {f"total_{field}": Sum(field) for field in SalesRollup.AMOUNT_FIELDS}
+    totals = rollups.filter(dimension=SalesRollup.TOTAL)
+
+    def breakdown(dimension, limit=None):
+        rows = (
+            rollups.filter(dimension=dimension)
+            .values("key")
+            .annotate(name=Max("label"), **sums)
+            .order_by("-total_revenue", "key")
+        )
+        return list(rows[:limit] if limit else rows)
+
+    return {
+        "since": since,
+        "totals": totals.aggregate(**sums),
+        "timeline": list(
+            totals.order_by("-period_start").values(
+                "period_start", *SalesRollup.AMOUNT_FIELDS
+            )
+        ),
+        "top_items": breakdown(SalesRollup.ITEM, top),
+        "categories": breakdown(SalesRollup.CATEGORY),
+        "payment_methods": breakdown(SalesRollup.PAYMENT_METHOD),
+        "delivery_options": breakdown(SalesRollup.DELIVERY_OPTION),
+    }
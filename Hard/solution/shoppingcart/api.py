@@ -0,0 +1,308 @@
+import json
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import (
+    condition,
+    require_GET,
+    require_http_methods,
+    require_POST,
+)
+
+from gadgetify.pricing import to_rupees
+from shoppingcart.catalog import (
+    get_catalog_modified,
+    get_catalog_version,
+    get_categories,
+    get_category_items,
+)
+from shoppingcart.checkout import place_order
+from shoppingcart.forms import OrderForm
+from shoppingcart.models import Item, Order
+from shoppingcart.recommendations import recommended_items
+from shoppingcart.stock import OutOfStock, reserve_many
+from shoppingcart.streams import check_order_stream_token, order_stream_token
+
+
+def json_api(view):
+    """Accept writes only as JSON bodies.
+
+    Browsers can't send ``application/json`` across origins without a CORS
+    preflight, which this site never grants, so requiring it protects the
+    writes as well as a CSRF token would while letting app clients post
+    without one.
+    """
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method == "POST" and request.content_type != "application/json":
+            return json_error("Send a JSON body", status=415)
+        return view(request, *args, **kwargs)
+
+    return csrf_exempt(wrapped)
+
+
+def json_error(message, status=400, **extra):
+    return JsonResponse({"error": message, **extra}, status=status)
+
+
+def item_json(item):
+    return {
+        "id": item.pk,
+        "name": item.name,
+        "category_id": item.category_id,
+        "original_price": item.original_price,
+        "discount_price": item.discount_price,
+        "price": item.actual_price,
+        "savings": item.savings,
+        "weight_in_gms": item.weight_in_gms,
+        "available": item.available,
+    }
+
+
+def order_json(order):
+    return {
+        "id": order.pk,
+        "status": order.order_status,
+        "status_display": order.get_order_status_display(),
+        "billing_date_time": order.billing_date_time,
+        "order_modified": order.order_modified,
+        "customer_name": order.customer_name,
+        "payment_method": order.payment_method,
+        "delivery_option": order.delivery_option,
+        "shipping_address": order.shipping_address,
+        "subtotal": order.subtotal,
+        "tax": order.tax,
+        "shipping": order.shipping,
+        "savings": order.savings,
+        "payable": order.payable,
+        "promotions": [
+            {
+                "id": promotion.promotion_id,
+                "name": promotion.name,
+                "discount": promotion.discount,
+            }
+            for promotion in order.promotions.all()
+        ],
+        "lines": [
+            {
+                "item_id": line.item_id,
+                "price_version_id": line.price_version_id,
+                "name": line.name,
+                "quantity": line.quantity,
+                "original_price": line.original_price,
+                "discount_price": line.discount_price,
+                "price": line.actual_price,
+            }
+            for line in order.lines.select_related("price_version")
+        ],
+    }
+
+
+# ----------Catalog----------
+# Catalog responses are tagged with the catalog version, which every Item or
+# Category change bumps, so a revalidation costs one cache read.
+
+
+def catalog_etag(request, *args, **kwargs):
+    return quote_etag(f"catalog-{get_catalog_version()}")
+
+
+def catalog_modified(request, *args, **kwargs):
+    return get_catalog_modified()
+
+
+catalog_condition = condition(
+    etag_func=catalog_etag, last_modified_func=catalog_modified
+)
+
+
+@require_GET
+@cache_control(no_cache=True)
+@catalog_condition
+def categories_api(request):
+    categories = [
+        {"id": category.pk, "name": category.name} for category in get_categories()
+    ]
+    return JsonResponse({"categories": categories})
+
+
+@require_GET
+@cache_control(no_cache=True)
+@catalog_condition
+def category_items_api(request, category_id):
+    if not any(category.pk == category_id for category in get_categories()):
+        return json_error("Category not found", status=404)
+    items = [item_json(item) for item in get_category_items(category_id)]
+    return JsonResponse({"category_id": category_id, "items": items})
+
+
+@require_GET
+def related_items_api(request, item_id):
+    """Items most often bought together with ``item_id``."""
+    if not Item.objects.filter(pk=item_id).exists():
+        return json_error("Item not found", status=404)
+    items = [item_json(item) for item in recommended_items([item_id])]
+    return JsonResponse({"item_id": item_id, "items": items})
+
+
+# ----------Cart and checkout----------
+
+
+def cart_summary(cart, items):
+    lines = []
+    price_lines = []
+    for item_pk, quantity in cart.items():
+        item = items.get(item_pk)
+        if item is None:
+            continue
+        lines.append(
+            {
+                "item_pk": item_pk,
+                "name": item.name,
+                "quantity": quantity,
+                "price": item.actual_price,
+                "savings": item.savings,
+            }
+        )
+        price_lines.append(item.price_line(quantity))
+    quote = Order.get_pricing_engine().quote(price_lines)
+    totals = quote.rupees()
+    return {
+        "lines": lines,
+        "units": quote.units,
+        "subtotal": float(totals["subtotal"]),
+        "savings": float(totals["savings"]),
+        "discount": float(totals["discount"]),
+        "tax": float(totals["tax"]),
+        "promotions": [
+            {"id": rule.key, "name": rule.name, "discount": float(to_rupees(discount))}
+            for rule, discount in quote.applied.items()
+        ],
+    }
+
+
+def parse_cart_changes(body):
+    try:
+        changes = json.loads(body)["items"]
+        return {int(item_pk): int(quantity) for item_pk, quantity in changes.items()}
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+@json_api
+@require_http_methods(["GET", "POST"])
+@cache_control(private=True, no_cache=True)
+def cart_api(request):
+    """Read the cart, or set many quantities at once from a JSON body like
+    ``{"items": {"<item pk>": <quantity>, ...}}``; a quantity of 0 removes the
+    item. Items that can't be added are left out and listed in ``errors``."""
+    if request.method == "GET":
+        items = Item.objects.in_bulk(list(request.cart))
+        return JsonResponse({**cart_summary(request.cart, items), "errors": {}})
+
+    changes = parse_cart_changes(request.body)
+    if changes is None:
+        return json_error('Expected {"items": {"<item pk>": <quantity>}}')
+    items = Item.objects.in_bulk(set(request.cart) | set(changes))
+    errors = {}
+    accepted = {}
+    for item_pk, quantity in changes.items():
+        item = items.get(item_pk)
+        if item is None:
+            errors[item_pk] = "Item not found"
+        elif quantity > 0 and not item.available:
+            errors[item_pk] = f"{item.name} is unavailable"
+        else:
+            accepted[item_pk] = max(quantity, 0)
+
+    # Drop whatever is short and hold the rest; untracked items need no hold.
+    while accepted:
+        try:
+            reserve_many(
+                request.cart.session_key,
+                {
+                    pk: quantity
+                    for pk, quantity in accepted.items()
+                    if items[pk].stock_quantity is not None
+                },
+            )
+            break
+        except OutOfStock as e:
+            for item_pk in e.item_ids:
+                errors[item_pk] = f"Not enough {items[item_pk].name} in stock"
+                accepted.pop(item_pk, None)
+    for item_pk, quantity in accepted.items():
+        request.cart.set(item_pk, quantity)
+
+    return JsonResponse({**cart_summary(request.cart, items), "errors": errors})
+
+
+@json_api
+@require_POST
+def checkout_api(request):
+    """Bill the cart; the body holds the same fields as the order form."""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return json_error("Invalid JSON")
+    if not request.cart:
+        return json_error("No items in cart to be billed")
+    form = OrderForm(data)
+    if not form.is_valid():
+        return json_error("Invalid order", errors=form.errors.get_json_data())
+    try:
+        order = place_order(form.save(commit=False), request.cart)
+    except OutOfStock as e:
+        return json_error(
+            "Some items in the cart are out of stock", status=409, items=e.item_ids
+        )
+    # The token authorises order_status_api and the order's event stream.
+    return JsonResponse(
+        {**order_json(order), "token": order_stream_token(order.pk)}, status=201
+    )
+
+
+# ----------Order status----------
+# Only order_status and order_modified change after checkout, so
+# order_modified alone versions the response.
+
+
+def find_order(request, order_id):
+    token = request.headers.get("X-Order-Token", "")
+    if not check_order_stream_token(token, order_id):
+        return Order.objects.none()
+    return Order.objects.filter(pk=order_id)
+
+
+def get_order_modified(request, order_id):
+    # Looked up once for both the ETag and Last-Modified checks.
+    if not hasattr(request, "order_modified"):
+        request.order_modified = (
+            find_order(request, order_id)
+            .values_list("order_modified", flat=True)
+            .first()
+        )
+    return request.order_modified
+
+
+def order_etag(request, order_id):
+    modified = get_order_modified(request, order_id)
+    if modified is None:
+        return None
+    return quote_etag(f"order-{order_id}-{modified.timestamp()}")
+
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=order_etag, last_modified_func=get_order_modified)
+def order_status_api(request, order_id):
+    """Order ``order_id``, for the token checkout_api returned with it, sent
+    as the ``X-Order-Token`` header."""
+    order = find_order(request, order_id).prefetch_related("promotions").first()
+    if order is None:
+        return json_error("Order not found", status=404)
+    return JsonResponse(order_json(order))
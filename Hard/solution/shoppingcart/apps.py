@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ShoppingcartConfig(AppConfig):
     name = "shoppingcart"
+
+    def ready(self):
+        from shoppingcart import signals, tasks  # noqa: F401
@@ -0,0 +1,131 @@
+import random
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shoppingcart.models import Category, Item, Order
+
+BENCHMARK_REPEAT = 20
+SAMPLE_SIZE = 1000
+
+
+class Scenario:
+    """One request to time. ``prepare`` runs untimed before every request
+    and returns the ``(method, path, data)`` to send."""
+
+    def __init__(self, name, prepare):
+        self.name = name
+        self.prepare = prepare
+
+
+def shopping_list(client, rng, sample):
+    category_id = rng.choice(sample["categories"])
+    return "get", reverse("display_shopping_list", args=[category_id]), {}
+
+
+def all_items(client, rng, sample):
+    return "get", reverse("all_items"), {}
+
+
+def all_orders(client, rng, sample):
+    return "get", reverse("all_orders"), {"order_status": "TRAN"}
+
+
+def order_status(client, rng, sample):
+    order_id, mobile_no = rng.choice(sample["orders"])
+    return (
+        "post",
+        reverse("order_status"),
+        {
+            "order_id": order_id,
+            "phone_number": mobile_no,
+        },
+    )
+
+
+def checkout(client, rng, sample):
+    basket_size = min(3, len(sample["items"]))
+    for item_id, category_id in rng.sample(sample["items"], basket_size):
+        client.post(
+            reverse("display_shopping_list", args=[category_id]),
+            {"item_pk": item_id, "quantity": 1},
+        )
+    return (
+        "post",
+        reverse("create_order"),
+        {
+            "customer_name": "Benchmark",
+            "customer_mobile_no": 9988776655,
+            "payment_method": "COD",
+            "delivery_option": "TKW",
+            "distance_from_shop": 0,
+            "shipping_address": "",
+        },
+    )
+
+
+SCENARIOS = [
+    Scenario("display_shopping_list", shopping_list),
+    Scenario("show_all_items", all_items),
+    Scenario("show_all_orders", all_orders),
+    Scenario("get_order_status", order_status),
+    Scenario("create_order", checkout),
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def take_sample(rng):
+    # Checkout only draws untracked items so it never runs out of stock.
+    items = Item.objects.filter(stock_quantity__isnull=True).values_list(
+        "pk", "category_id"
+    )
+    orders = Order.objects.values_list("pk", "customer_mobile_no")
+    return {
+        "categories": list(Category.objects.values_list("pk", flat=True)[:SAMPLE_SIZE]),
+        "items": list(items[:SAMPLE_SIZE]),
+        "orders": list(orders[:SAMPLE_SIZE]),
+    }
+
+
+def run_benchmarks(repeat=BENCHMARK_REPEAT, seed=0, scenarios=SCENARIOS):
+    """Time each scenario ``repeat`` times against the current database.
+
+    Returns one dict per scenario with latency percentiles in milliseconds
+    and the query count of the slowest-querying request.
+    """
+    rng = random.Random(seed)
+    sample = take_sample(rng)
+    client = Client()
+    results = []
+    for scenario in scenarios:
+        timings = []
+        query_counts = []
+        status_codes = set()
+        for _ in range(repeat):
+            method, path, data = scenario.prepare(client, rng, sample)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, method)(path, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(queries))
+            status_codes.add(response.status_code)
+        results.append(
+            {
+                "scenario": scenario.name,
+                "requests": repeat,
+                "p50_ms": round(percentile(timings, 0.5), 3),
+                "p95_ms": round(percentile(timings, 0.95), 3),
+                "max_ms": round(max(timings), 3),
+                "mean_ms": round(sum(timings) / len(timings), 3),
+                "queries": max(query_counts),
+                "status_codes": sorted(status_codes),
+            }
+        )
+    return results
@@ -0,0 +1,166 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+CART_COOKIE_NAME = "cart"
+CART_COOKIE_SALT = "shoppingcart.cart"
+CART_CACHE_TIMEOUT = 60 * 60 * 24 * 14
+
+
+class CartStore:
+    """Per-visitor cart holding item pk -> quantity.
+
+    Backends only implement ``load`` and ``persist``; ``CartMiddleware``
+    attaches a store to every request as ``request.cart`` and persists it
+    once the response is ready.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.modified = False
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = {
+                int(item_pk): int(quantity) for item_pk, quantity in self.load().items()
+            }
+        return self._data
+
+    @property
+    def session_key(self):
+        """Key identifying this visitor's cart on the server side."""
+        session = self.request.session
+        if session.session_key is None:
+            session.save()
+        return session.session_key
+
+    def load(self):
+        raise NotImplementedError
+
+    def persist(self, response):
+        raise NotImplementedError
+
+    def get(self, item_pk, default=0):
+        return self.data.get(item_pk, default)
+
+    def set(self, item_pk, quantity):
+        if quantity > 0:
+            self.data[item_pk] = quantity
+        else:
+            self.data.pop(item_pk, None)
+        self.modified = True
+
+    def clear(self):
+        self.data.clear()
+        self.modified = True
+
+    def items(self):
+        return self.data.items()
+
+    def get_items(self):
+        """Cart contents as ``{Item: quantity}``, fetched with one query."""
+        from shoppingcart.models import Item
+
+        items = Item.objects.in_bulk(list(self.data))
+        return {
+            items[item_pk]: quantity
+            for item_pk, quantity in self.data.items()
+            if item_pk in items
+        }
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class SignedCookieCartStore(CartStore):
+    """Keeps the cart in a signed cookie; needs no server-side state."""
+
+    def load(self):
+        value = self.request.get_signed_cookie(
+            CART_COOKIE_NAME, default=None, salt=CART_COOKIE_SALT
+        )
+        return json.loads(value) if value else {}
+
+    def persist(self, response):
+        if not self.modified:
+            return
+        if self.data:
+            response.set_signed_cookie(
+                CART_COOKIE_NAME,
+                json.dumps(self.data),
+                salt=CART_COOKIE_SALT,
+                max_age=settings.SESSION_COOKIE_AGE,
+                httponly=True,
+                samesite="Lax",
+            )
+        else:
+            response.delete_cookie(CART_COOKIE_NAME)
+
+
+class CacheCartStore(CartStore):
+    """Keeps the cart in Django's cache; needs a cache shared by all workers."""
+
+    def cache_key(self):
+        return f"cart:{self.session_key}"
+
+    def load(self):
+        return cache.get(self.cache_key(), {})
+
+    def persist(self, response):
+        if not self.modified:
+            return
+        if self.data:
+            cache.set(self.cache_key(), self.data, CART_CACHE_TIMEOUT)
+        else:
+            cache.delete(self.cache_key())
+
+
+class DatabaseCartStore(CartStore):
+    """Keeps the cart as CartLine rows."""
+
+    def load(self):
+        from shoppingcart.models import CartLine
+
+        return dict(
+            CartLine.objects.filter(session_key=self.session_key).values_list(
+                "item_id", "quantity"
+            )
+        )
+
+    def persist(self, response):
+        from shoppingcart.models import CartLine
+
+        if not self.modified:
+            return
+        with transaction.atomic():
+            CartLine.objects.filter(session_key=self.session_key).delete()
+            CartLine.objects.bulk_create(
+                CartLine(session_key=self.session_key, item_id=item_pk, quantity=qty)
+                for item_pk, qty in self.data.items()
+            )
+
+
+def get_cart_store(request):
+    store_class = import_string(
+        getattr(settings, "CART_STORE", "shoppingcart.cart.SignedCookieCartStore")
+    )
+    return store_class(request)
+
+
+class CartMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.cart = get_cart_store(request)
+        response = self.get_response(request)
+        request.cart.persist(response)
+        return response
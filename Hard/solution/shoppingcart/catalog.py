@@ -0,0 +1,56 @@
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from shoppingcart.models import Category, Item
+
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_MODIFIED_KEY = "catalog:modified"
+CATALOG_TIMEOUT = 60 * 60
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a lost counter never reuses an old version
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def get_catalog_modified():
+    """When the catalog last changed, or when this was first asked for."""
+    modified = cache.get(CATALOG_MODIFIED_KEY)
+    if modified is None:
+        cache.add(CATALOG_MODIFIED_KEY, timezone.now(), None)
+        modified = cache.get(CATALOG_MODIFIED_KEY)
+    return modified
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_MODIFIED_KEY, timezone.now(), None)
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+def get_cached(name, build):
+    key = f"catalog:{get_catalog_version()}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, CATALOG_TIMEOUT)
+    return value
+
+
+def get_categories():
+    return get_cached("categories", lambda: list(Category.objects.all()))
+
+
+def get_category_items(category_id):
+    return get_cached(
+        f"items:{category_id}",
+        lambda: list(Item.objects.filter(category=category_id)),
+    )
@@ -0,0 +1,34 @@
+from django.db import transaction
+
+from shoppingcart.stock import commit
+from shoppingcart.tasks import (
+    notify_order_placed,
+    update_item_pairs,
+    update_sales_rollups,
+    write_invoice,
+)
+from shoppingcart.worker import enqueue_many
+
+
+def place_order(order, cart):
+    """Bill ``cart`` as ``order`` and empty the cart.
+
+    The cart's stock holds and the order are saved in one transaction, so a
+    checkout that hits OutOfStock leaves no order behind. Everything else
+    about the order is queued for the background worker in that same
+    transaction.
+    """
+    order.order_status = "TRAN"
+    with transaction.atomic():
+        commit(cart.session_key, cart)
+        order.save(cart)
+        enqueue_many(
+            [
+                (write_invoice, {"order_id": order.pk}),
+                (notify_order_placed, {"order_id": order.pk}),
+                (update_sales_rollups, {"order_ids": [order.pk]}),
+                (update_item_pairs, {"order_id": order.pk}),
+            ]
+        )
+    cart.clear()
+    return order
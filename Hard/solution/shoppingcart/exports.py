@@ -0,0 +1,120 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from shoppingcart.models import ItemPriceVersion, OrderLine
+
+EXPORT_CHUNK_SIZE = 2000
+ORDER_FIELDS = (
+    "id",
+    "billing_date_time",
+    "order_modified",
+    "order_status",
+    "customer_name",
+    "customer_mobile_no",
+    "shipping_address",
+    "payment_method",
+    "delivery_option",
+    "distance_from_shop",
+    "subtotal",
+    "tax",
+    "shipping",
+    "savings",
+    "payable",
+)
+LINE_FIELDS = (
+    "item_id",
+    "name",
+    "original_price",
+    "discount_price",
+    "weight_in_gms",
+    "quantity",
+)
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+class Echo:
+    """File-like object handing back what is written, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def iter_orders(
+    orders, with_lines=False, chunk_size=EXPORT_CHUNK_SIZE, line_fields=LINE_FIELDS
+):
+    """Yield ``(order, lines)`` dicts for ``orders`` in pk order.
+
+    Orders and lines are read through two cursors walking the same pk order
+    and merged as they go, so only one chunk of each is held in memory no
+    matter how many orders match. ``lines`` is ``None`` unless
+    ``with_lines`` is set.
+    """
+    order_rows = orders.order_by("pk").values(*ORDER_FIELDS).iterator(chunk_size)
+    if not with_lines:
+        for order in order_rows:
+            yield order, None
+        return
+
+    # Line prices are read from the version each line was billed at.
+    price_fields = {
+        field: F(f"price_version__{field}")
+        for field in line_fields
+        if field in ItemPriceVersion.PRICE_FIELDS
+    }
+    line_rows = (
+        OrderLine.objects.filter(order__in=orders.values("pk"))
+        .order_by("order_id", "pk")
+        .values(
+            "order_id",
+            *(field for field in line_fields if field not in price_fields),
+            **price_fields,
+        )
+        .iterator(chunk_size)
+    )
+    line = next(line_rows, None)
+    for order in order_rows:
+        lines = []
+        while line is not None and line["order_id"] <= order["id"]:
+            if line["order_id"] == order["id"]:
+                del line["order_id"]
+                lines.append(line)
+            line = next(line_rows, None)
+        yield order, lines
+
+
+def export_csv(orders, with_lines=False):
+    """Yield CSV text for ``orders``, one row per order or, with lines, one
+    row per order line with the order columns repeated."""
+    writer = csv.writer(Echo())
+    header = list(ORDER_FIELDS)
+    if with_lines:
+        header += [f"line_{name}" for name in LINE_FIELDS]
+    yield writer.writerow(header)
+    for order, lines in iter_orders(orders, with_lines):
+        row = [order[name] for name in ORDER_FIELDS]
+        if not with_lines:
+            yield writer.writerow(row)
+            continue
+        # Orders without lines still get a row, with the line columns empty.
+        for line in lines or [dict.fromkeys(LINE_FIELDS, "")]:
+            yield writer.writerow(row + [line[name] for name in LINE_FIELDS])
+
+
+def export_jsonl(orders, with_lines=False):
+    """Yield one JSON object per order, with a ``lines`` list if asked for."""
+    for order, lines in iter_orders(orders, with_lines):
+        if with_lines:
+            order["lines"] = lines
+        yield json.dumps(order, cls=DjangoJSONEncoder) + "\n"
+
+
+def export_orders(orders, export_format="csv", with_lines=False):
+    if export_format == "jsonl":
+        return export_jsonl(orders, with_lines)
+    return export_csv(orders, with_lines)
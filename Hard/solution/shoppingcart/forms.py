@@ -1,5 +1,5 @@
 from django.core.exceptions import ValidationError
-from django.forms import ModelForm
+from django.forms import CharField, ModelForm
 
 from shoppingcart.models import Category, Item, Order
 
@@ -39,6 +39,24 @@ class ItemForm(ModelForm):
             "discount_price",
             "weight_in_gms",
             "available",
+            "stock_quantity",
+        ]
+
+
+class ItemImportForm(ModelForm):
+    """One row of a bulk item import; the category is given by name."""
+
+    category = CharField(max_length=30)
+
+    class Meta:
+        model = Item
+        fields = [
+            "name",
+            "original_price",
+            "discount_price",
+            "weight_in_gms",
+            "available",
+            "stock_quantity",
         ]
 
 
@@ -47,4 +65,5 @@ class CategoryForm(ModelForm):
         model = Category
         fields = [
             "name",
+            "tax_rate",
         ]
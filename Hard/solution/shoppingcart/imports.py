@@ -0,0 +1,132 @@
+import csv
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.forms import modelform_factory
+
+from shoppingcart.catalog import bump_catalog_version
+from shoppingcart.forms import ItemImportForm
+from shoppingcart.models import Category, Item
+from shoppingcart.prices import record_prices
+from shoppingcart.search import index_category, index_items
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_COLUMNS = ("category",) + tuple(ItemImportForm._meta.fields)
+REQUIRED_COLUMNS = ("name", "category", "original_price", "weight_in_gms")
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def add_error(self, line_no, message):
+        self.errors.append((line_no, message))
+
+
+def form_errors(form):
+    return "; ".join(
+        " ".join(errors) if field == "__all__" else f"{field}: {' '.join(errors)}"
+        for field, errors in form.errors.items()
+    )
+
+
+def import_items(csv_file, batch_size=IMPORT_BATCH_SIZE):
+    """Create or update items from a CSV price list.
+
+    Rows are matched to existing items on ``(name, category)``; categories
+    that don't exist yet are created. Only the columns present in the file
+    are written to existing items, so a price-only file leaves stock and
+    availability alone. Rows are validated one by one and saved a batch at a
+    time; invalid rows are reported in the returned ``ImportResult`` and
+    skipped.
+    """
+    reader = csv.DictReader(csv_file)
+    columns = [name.strip() for name in reader.fieldnames or []]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValidationError(f"Missing columns: {', '.join(missing)}")
+    reader.fieldnames = columns
+    fields = [name for name in ItemImportForm._meta.fields if name in columns]
+    form_class = modelform_factory(Item, form=ItemImportForm, fields=fields)
+    update_fields = [name for name in fields if name != "name"]
+
+    result = ImportResult()
+    batch = []
+    # Line 1 is the header.
+    for line_no, row in enumerate(reader, start=2):
+        form = form_class(row)
+        if form.is_valid():
+            batch.append((line_no, form.cleaned_data))
+        else:
+            result.add_error(line_no, form_errors(form))
+        if len(batch) >= batch_size:
+            save_batch(batch, update_fields, result)
+            batch = []
+    if batch:
+        save_batch(batch, update_fields, result)
+    if result.created or result.updated:
+        bump_catalog_version()
+    return result
+
+
+def save_batch(batch, update_fields, result):
+    try:
+        with transaction.atomic():
+            created, updated = upsert_items(batch, update_fields)
+    except IntegrityError as e:
+        # Most likely a concurrent edit added one of these items first.
+        for line_no, _ in batch:
+            result.add_error(line_no, f"batch not saved: {e}")
+        return
+    result.created += created
+    result.updated += updated
+
+
+def upsert_items(batch, update_fields):
+    # bulk_create/bulk_update skip the post_save signals, so the search index,
+    # price history and catalog cache are updated here and by import_items
+    # instead.
+    category_names = {data["category"] for _, data in batch}
+    categories = Category.objects.in_bulk(category_names, field_name="name")
+    new_categories = [
+        Category(name=name) for name in category_names if name not in categories
+    ]
+    if new_categories:
+        Category.objects.bulk_create(new_categories)
+        categories = Category.objects.in_bulk(category_names, field_name="name")
+        for name in {category.name for category in new_categories}:
+            index_category(categories[name])
+
+    # Later rows for the same item win.
+    rows = {}
+    for _, data in batch:
+        data = dict(data)
+        category = categories[data.pop("category")]
+        rows[(data["name"], category.pk)] = (category, data)
+
+    items = Item.objects.filter(
+        category__in=[category for category, _ in rows.values()],
+        name__in=[data["name"] for _, data in rows.values()],
+    )
+    existing = {(item.name, item.category_id): item for item in items}
+    to_create = []
+    to_update = []
+    for key, (category, data) in rows.items():
+        item = existing.get(key)
+        if item is None:
+            to_create.append(Item(category=category, **data))
+            continue
+        # stock_quantity is set outright here: a supplier count replaces
+        # whatever was left, including units held by carts.
+        for name in update_fields:
+            setattr(item, name, data[name])
+        to_update.append(item)
+
+    Item.objects.bulk_create(to_create)
+    if update_fields:
+        Item.objects.bulk_update(to_update, update_fields)
+    index_items(items.select_related("category"))
+    record_prices(items)
+    return len(to_create), len(to_update)
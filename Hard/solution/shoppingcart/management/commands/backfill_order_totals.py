@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from shoppingcart.models import Order
+
+TOTAL_FIELDS = ["subtotal", "tax", "shipping", "savings", "payable"]
+
+
+class Command(BaseCommand):
+    help = "Fill in stored bill totals for orders placed before they were persisted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute totals for every order, not only the missing ones",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Today's promotions aren't the ones these orders were billed with.
+        orders = Order.objects.filter(promotions__isnull=True)
+        if not options["all"]:
+            orders = orders.filter(payable__isnull=True)
+
+        engine = Order.get_pricing_engine(promotions=False)
+        batch = []
+        updated = 0
+        skipped = 0
+        for order in orders.iterator(chunk_size=options["batch_size"]):
+            item_list = order.get_billed_items()
+            if not item_list:
+                skipped += 1
+                self.stderr.write(
+                    f"Order {order.pk}: no order lines, run import_order_invoices"
+                )
+                continue
+            order.compute_totals(item_list, engine)
+            batch.append(order)
+            if len(batch) >= options["batch_size"]:
+                Order.objects.bulk_update(batch, TOTAL_FIELDS)
+                updated += len(batch)
+                batch = []
+        if batch:
+            Order.objects.bulk_update(batch, TOTAL_FIELDS)
+            updated += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled {updated} orders ({skipped} skipped)")
+        )
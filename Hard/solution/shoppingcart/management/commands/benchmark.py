@@ -0,0 +1,94 @@
+import json
+import subprocess
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.utils import timezone
+
+from shoppingcart.benchmarks import BENCHMARK_REPEAT, run_benchmarks
+from shoppingcart.synthetic import generate_catalog, generate_orders
+
+
+def parse_size(value):
+    try:
+        categories, items, orders = (int(part) for part in value.split(":"))
+    except ValueError:
+        raise CommandError(f"Size {value!r} is not CATEGORIES:ITEMS:ORDERS")
+    if categories < 1 or items < 1:
+        raise CommandError(f"Size {value!r} needs a category and an item")
+    return {"categories": categories, "items": items, "orders": orders}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the storefront and vendor views against synthetic data in a "
+        "throwaway test database and print the results as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            default=["10:1000:1000"],
+            metavar="CATEGORIES:ITEMS:ORDERS",
+            help="Data sizes to benchmark, e.g. 10:1000:1000 1000:100000:1000000",
+        )
+        parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", "-o", help="File to write the JSON to")
+
+    def handle(self, *args, **options):
+        sizes = [parse_size(value) for value in options["sizes"]]
+        report = {
+            "commit": git_commit(),
+            "django": django.get_version(),
+            "started": timezone.now().isoformat(),
+            "repeat": options["repeat"],
+            "seed": options["seed"],
+            "sizes": [],
+        }
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            for size in sizes:
+                call_command("flush", interactive=False, verbosity=0)
+                cache.clear()
+                self.stderr.write(f"Generating {size}")
+                items = generate_catalog(
+                    size["categories"], size["items"], seed=options["seed"]
+                )
+                generate_orders(size["orders"], items, seed=options["seed"])
+                self.stderr.write("Running benchmarks")
+                results = run_benchmarks(options["repeat"], seed=options["seed"])
+                report["sizes"].append({**size, "results": results})
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
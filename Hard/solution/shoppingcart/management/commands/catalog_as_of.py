@@ -0,0 +1,77 @@
+import csv
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from shoppingcart.prices import catalog_as_of
+
+CATALOG_COLUMNS = (
+    "item_id",
+    "name",
+    "category",
+    "original_price",
+    "discount_price",
+    "price",
+    "valid_from",
+    "price_version_id",
+)
+
+
+def parse_as_of(value):
+    """A datetime, or a date meaning the end of that day, in the current
+    time zone unless it says otherwise."""
+    at = parse_datetime(value)
+    if at is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        at = datetime.combine(day, time.max)
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+    return at
+
+
+class Command(BaseCommand):
+    help = "Write the catalog with the prices in force at a past date, as CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "at", help="Date (end of day) or date and time, e.g. 2026-03-31"
+        )
+        parser.add_argument("--category", type=int, help="Only this category's items")
+        parser.add_argument(
+            "--output", "-o", help="File to write to (default: standard output)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            at = parse_as_of(options["at"])
+        except ValueError:
+            raise CommandError(f"Not a date or date and time: {options['at']}")
+        versions = catalog_as_of(at, options["category"])
+        rows = (
+            (
+                version.item_id,
+                version.item.name,
+                version.item.category.name,
+                version.original_price,
+                version.discount_price,
+                version.actual_price,
+                version.valid_from.isoformat(),
+                version.pk,
+            )
+            for version in versions.iterator()
+        )
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as f:
+                self.write_csv(f, rows)
+        else:
+            self.write_csv(self.stdout, rows)
+
+    def write_csv(self, f, rows):
+        writer = csv.writer(f)
+        writer.writerow(CATALOG_COLUMNS)
+        writer.writerows(rows)
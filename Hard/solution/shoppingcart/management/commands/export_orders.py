@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+
+from shoppingcart.exports import EXPORT_FORMATS, export_orders
+from shoppingcart.models import Order
+
+
+class Command(BaseCommand):
+    help = "Stream orders, optionally with their lines, as CSV or JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=sorted(EXPORT_FORMATS), default="csv", dest="format"
+        )
+        parser.add_argument(
+            "--lines", action="store_true", help="Include each order's line items"
+        )
+        parser.add_argument(
+            "--output", "-o", help="File to write to (default: standard output)"
+        )
+        for field_name, choices in Order.get_filter_choices().items():
+            parser.add_argument(
+                f"--{field_name}", choices=[value for value, _ in choices]
+            )
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        for field_name in Order.get_filter_choices():
+            if options[field_name]:
+                params[field_name] = options[field_name]
+        orders = Order.objects.matching(params)
+        chunks = export_orders(orders, options["format"], options["lines"])
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as f:
+                f.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
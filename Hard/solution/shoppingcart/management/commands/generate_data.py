@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shoppingcart.synthetic import (
+    GENERATE_BATCH_SIZE,
+    generate_catalog,
+    generate_orders,
+)
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a synthetic catalog and order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=10)
+        parser.add_argument("--items", type=int, default=1000)
+        parser.add_argument("--orders", type=int, default=1000)
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for reproducible data"
+        )
+        parser.add_argument("--batch-size", type=int, default=GENERATE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options["categories"] < 1 or options["items"] < 1:
+            raise CommandError("Generate at least one category and one item")
+
+        items = generate_catalog(
+            options["categories"],
+            options["items"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            f"Created {options['categories']} categories and {options['items']} items"
+        )
+        generate_orders(
+            options["orders"],
+            items,
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Created {options['orders']} orders"))
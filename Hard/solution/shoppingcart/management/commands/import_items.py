@@ -0,0 +1,30 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from shoppingcart.imports import IMPORT_BATCH_SIZE, IMPORT_COLUMNS, import_items
+
+
+class Command(BaseCommand):
+    help = "Create or update items from a CSV file with the columns " + ", ".join(
+        IMPORT_COLUMNS
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        with open(options["path"], newline="", encoding="utf-8-sig") as f:
+            try:
+                result = import_items(f, options["batch_size"])
+            except ValidationError as e:
+                raise CommandError(" ".join(e.messages))
+
+        for line_no, message in result.errors:
+            self.stderr.write(f"Line {line_no}: {message}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result.created} and updated {result.updated} items "
+                f"({len(result.errors)} rows skipped)"
+            )
+        )
@@ -0,0 +1,86 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shoppingcart.models import Category, Item, ItemPriceVersion, Order, OrderLine
+from shoppingcart.utilities import order_directory
+
+
+class Command(BaseCommand):
+    help = "Import legacy order_<pk>.json invoice files into OrderLine rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            default=order_directory,
+            help=f"Directory holding the invoice files (default: {order_directory})",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Remove each invoice file once its lines are imported",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        imported = set(OrderLine.objects.values_list("order_id", flat=True).distinct())
+        billed_at = dict(Order.objects.values_list("pk", "billing_date_time"))
+
+        created = 0
+        for file_name in sorted(os.listdir(directory)):
+            if not (file_name.startswith("order_") and file_name.endswith(".json")):
+                continue
+            path = os.path.join(directory, file_name)
+            try:
+                with open(path) as f:
+                    cart_list = json.load(f)
+                order_id = cart_list[0]["order_id"]
+            except (ValueError, LookupError, TypeError):
+                self.stderr.write(f"{file_name}: not an invoice file, skipped")
+                continue
+            if order_id not in billed_at:
+                self.stderr.write(f"{file_name}: order {order_id} not found, skipped")
+                continue
+            if order_id in imported:
+                self.stdout.write(f"{file_name}: already imported")
+            else:
+                created += self.import_lines(
+                    order_id, billed_at[order_id], cart_list[1:]
+                )
+            if options["delete"]:
+                os.remove(path)
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} order lines"))
+
+    @transaction.atomic
+    def import_lines(self, order_id, billed_at, entries):
+        existing_items = Item.objects.in_bulk([entry["pk"] for entry in entries])
+        existing_categories = Category.objects.in_bulk(
+            [entry["fields"]["category"] for entry in entries]
+        )
+        lines = []
+        for entry in entries:
+            fields = entry["fields"]
+            # Line prices live on a price version; record the invoiced ones
+            # as the item's prices when it was billed.
+            price_version = ItemPriceVersion.objects.create(
+                item=existing_items.get(entry["pk"]),
+                original_price=fields["original_price"],
+                discount_price=fields["discount_price"],
+                valid_from=billed_at,
+            )
+            lines.append(
+                OrderLine(
+                    order_id=order_id,
+                    item=existing_items.get(entry["pk"]),
+                    category=existing_categories.get(fields["category"]),
+                    price_version=price_version,
+                    name=fields["name"],
+                    weight_in_gms=fields["weight_in_gms"],
+                    quantity=entry["quantity"],
+                )
+            )
+        OrderLine.objects.bulk_create(lines)
+        return len(lines)
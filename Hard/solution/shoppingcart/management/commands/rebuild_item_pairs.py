@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shoppingcart.recommendations import PAIR_BATCH_SIZE, rebuild_pairs
+
+
+class Command(BaseCommand):
+    help = "Recount which items were bought together from the order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=PAIR_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        pairs = rebuild_pairs(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Counted {pairs} item pairs"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shoppingcart.analytics import ROLLUP_BATCH_SIZE, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the hourly and daily sales rollups from the order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=ROLLUP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rollup rows"))
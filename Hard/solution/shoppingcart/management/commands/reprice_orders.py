@@ -0,0 +1,95 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import QueryDict
+from django.utils import timezone
+
+from gadgetify.pricing import to_paise
+from shoppingcart.exports import iter_orders
+from shoppingcart.models import ItemPriceVersion, Order, OrderLine
+
+REPRICE_BATCH_SIZE = 1000
+REPRICE_LINE_FIELDS = (
+    "item_id",
+    "category_id",
+    "original_price",
+    "discount_price",
+    "weight_in_gms",
+    "quantity",
+)
+TOTAL_FIELDS = ("subtotal", "tax", "shipping", "savings", "payable")
+
+
+def price_line(line):
+    """PriceLine for a line as read by iter_orders."""
+    price_version = ItemPriceVersion(
+        **{field: line.pop(field) for field in ItemPriceVersion.PRICE_FIELDS}
+    )
+    return OrderLine(price_version=price_version, **line).price_line()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute order totals from their lines with the current tax rates, "
+        "e.g. after a category's tax rate changed. Orders that had promotions "
+        "applied are left as billed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report changes without saving"
+        )
+        parser.add_argument("--batch-size", type=int, default=REPRICE_BATCH_SIZE)
+        for field_name, choices in Order.get_filter_choices().items():
+            parser.add_argument(
+                f"--{field_name}", choices=[value for value, _ in choices]
+            )
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        for field_name in Order.get_filter_choices():
+            if options[field_name]:
+                params[field_name] = options[field_name]
+        # Today's promotions aren't the ones these orders were billed with.
+        orders = iter_orders(
+            Order.objects.matching(params).filter(promotions__isnull=True),
+            with_lines=True,
+            line_fields=REPRICE_LINE_FIELDS,
+        )
+        engine = Order.get_pricing_engine(promotions=False)
+        now = timezone.now()
+        checked = 0
+        changed = 0
+        while True:
+            batch = list(islice(orders, options["batch_size"]))
+            if not batch:
+                break
+            checked += len(batch)
+            # Shipping was charged by distance and weight; keep it as billed.
+            quotes = engine.quote_many(
+                ([price_line(line) for line in lines] for _, lines in batch),
+                [to_paise(order["shipping"] or 0) for order, _ in batch],
+            )
+            repriced = []
+            for (order, _), quote in zip(batch, quotes):
+                order_totals = Order(pk=order["id"], order_modified=now)
+                order_totals.set_totals(quote)
+                if any(
+                    getattr(order_totals, field) != order[field]
+                    for field in TOTAL_FIELDS
+                ):
+                    repriced.append(order_totals)
+            changed += len(repriced)
+            if repriced and not options["dry_run"]:
+                with transaction.atomic():
+                    Order.objects.bulk_update(
+                        repriced, [*TOTAL_FIELDS, "order_modified"]
+                    )
+
+        verb = "Would change" if options["dry_run"] else "Changed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {changed} of {checked} orders"))
+        if changed and not options["dry_run"]:
+            self.stdout.write(
+                "Run rebuild_sales_rollups to bring the sales dashboard up to date"
+            )
@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from shoppingcart.models import Task
+from shoppingcart.tasks import sweep_reservations
+from shoppingcart.worker import CLAIM_BATCH_SIZE, enqueue_once, run_pending
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks, or report on the queue with --status"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run every task that is due, then exit",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1,
+            help="Seconds to wait when no task is due (default: 1)",
+        )
+        parser.add_argument("--batch-size", type=int, default=CLAIM_BATCH_SIZE)
+        parser.add_argument(
+            "--sweep-interval",
+            type=int,
+            default=60,
+            help="Queue a stock reservation sweep every N seconds (0 to disable)",
+        )
+        parser.add_argument(
+            "--status", action="store_true", help="Print queue statistics and exit"
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Queue every failed task again and exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["status"]:
+            return self.print_status()
+        if options["retry_failed"]:
+            retried = Task.objects.filter(status=Task.FAILED).update(
+                status=Task.QUEUED, attempts=0, run_at=timezone.now(), finished=None
+            )
+            self.stdout.write(self.style.SUCCESS(f"Queued {retried} failed tasks"))
+            return
+
+        next_sweep = time.monotonic()
+        ran = 0
+        while True:
+            if options["sweep_interval"] and time.monotonic() >= next_sweep:
+                enqueue_once(sweep_reservations)
+                next_sweep = time.monotonic() + options["sweep_interval"]
+            count = run_pending(options["batch_size"])
+            ran += count
+            if count:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} tasks"))
+
+    def print_status(self):
+        rows = (
+            Task.objects.values("name", "status")
+            .annotate(count=Count("pk"), oldest=Min("run_at"))
+            .order_by("name", "status")
+        )
+        now = timezone.now()
+        for row in rows:
+            line = f"{row['name']:50} {row['status']:8} {row['count']:8}"
+            if row["status"] == Task.QUEUED:
+                age = max((now - row["oldest"]).total_seconds(), 0)
+                line += f"  oldest due {age:.0f}s ago"
+            self.stdout.write(line)
+        for failed in Task.objects.filter(status=Task.FAILED).order_by("-finished")[
+            :5
+        ]:
+            last_line = failed.last_error.strip().splitlines()[-1:]
+            self.stderr.write(f"{failed}: {' '.join(last_line)}")
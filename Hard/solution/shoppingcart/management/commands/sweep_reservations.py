@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shoppingcart.stock import sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Return stock held by expired cart reservations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            help="Keep running, sweeping every INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = sweep_expired()
+            self.stdout.write(f"Released {released} expired reservations")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
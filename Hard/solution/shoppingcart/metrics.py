@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger(__name__)
+
+METRICS_WINDOW = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+# Name, Prometheus metric and whether the value is a duration.
+SERIES = (
+    ("total", "gadgetify_request_duration_seconds", True),
+    ("db", "gadgetify_request_db_seconds", True),
+    ("queries", "gadgetify_request_queries", False),
+    ("template", "gadgetify_request_template_seconds", True),
+)
+SERIES_NAMES = [name for name, _, _ in SERIES]
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """What one request spent its time on. Durations are in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.values = dict.fromkeys(SERIES_NAMES, 0)
+
+    def add(self, name, value):
+        self.values[name] += value
+
+    def finish(self):
+        self.values["total"] = time.perf_counter() - self.started
+
+    def server_timing(self):
+        values = self.values
+        return ", ".join(
+            [
+                f'db;dur={values["db"] * 1000:.1f};desc="{values["queries"]} queries"',
+                f'tpl;dur={values["template"] * 1000:.1f}',
+                f'total;dur={values["total"] * 1000:.1f}',
+            ]
+        )
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name``
+    series, e.g. ``with timed("template"): ...`` around rendering."""
+    timings = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.add(name, time.perf_counter() - started)
+
+
+def count_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is not None:
+        timings.add("queries", 1)
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+class MetricsStore:
+    """Rolling window of the last ``METRICS_WINDOW`` requests per view, plus
+    running counts and sums, kept in this process."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.counts = defaultdict(int)
+        self.sums = defaultdict(lambda: dict.fromkeys(SERIES_NAMES, 0))
+
+    def record(self, view_name, timings):
+        with self.lock:
+            self.samples[view_name].append(dict(timings.values))
+            self.counts[view_name] += 1
+            sums = self.sums[view_name]
+            for name, value in timings.values.items():
+                sums[name] += value
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.counts.clear()
+            self.sums.clear()
+
+    def quantiles(self, view_name, name):
+        with self.lock:
+            values = sorted(sample[name] for sample in self.samples[view_name])
+        if not values:
+            return {}
+        return {
+            q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES
+        }
+
+    def to_prometheus(self):
+        """Summaries per view in the Prometheus text exposition format."""
+        with self.lock:
+            view_names = sorted(self.counts)
+            counts = dict(self.counts)
+            sums = {view_name: dict(self.sums[view_name]) for view_name in view_names}
+        lines = []
+        for name, metric, is_duration in SERIES:
+            unit = "seconds" if is_duration else "queries"
+            lines.append(f"# HELP {metric} Per-request {name} ({unit}) by view.")
+            lines.append(f"# TYPE {metric} summary")
+            for view_name in view_names:
+                label = f'view="{view_name}"'
+                for q, value in self.quantiles(view_name, name).items():
+                    lines.append(f'{metric}{{{label},quantile="{q}"}} {value}')
+                lines.append(f"{metric}_sum{{{label}}} {sums[view_name][name]}")
+                lines.append(f"{metric}_count{{{label}}} {counts[view_name]}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsStore()
+
+
+def get_query_budget(view_name):
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    return budgets.get(view_name, getattr(settings, "QUERY_BUDGET", None))
+
+
+class MetricsMiddleware:
+    """Measures every request and reports it in a ``Server-Timing`` header.
+
+    Queries on every database connection are counted and timed through
+    ``execute_wrapper``; template rendering is timed by
+    ``TimedDjangoTemplates``. A warning is logged when a view runs more
+    queries than its budget in ``QUERY_BUDGETS``/``QUERY_BUDGET``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timings.finish()
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "unmatched"
+        metrics.record(view_name, timings)
+        response["Server-Timing"] = timings.server_timing()
+
+        budget = get_query_budget(view_name)
+        queries = timings.values["queries"]
+        if budget is not None and queries > budget:
+            logger.warning(
+                "%s ran %d queries (budget %d) for %s",
+                view_name,
+                queries,
+                budget,
+                request.get_full_path(),
+            )
+        return response
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed("template"):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to MetricsMiddleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,62 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Category',
+                'verbose_name_plural': 'Categories',
+            },
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('billing_date_time', models.DateTimeField(auto_now_add=True)),
+                ('order_modified', models.DateTimeField(auto_now=True)),
+                ('order_status', models.CharField(choices=[('TRAN', 'In Transit'), ('COMP', 'Completed'), ('CANC', 'Cancelled')], default='TRAN', max_length=4)),
+                ('customer_name', models.CharField(max_length=40)),
+                ('customer_mobile_no', models.BigIntegerField()),
+                ('payment_method', models.CharField(choices=[('NETB', 'Net Banking'), ('COD', 'Cash On Delivery'), ('CCARD', 'Credit Card'), ('DCARD', 'Debit Card')], max_length=5)),
+                ('delivery_option', models.CharField(choices=[('TKW', 'Takeaway'), ('HMD', 'Home Delivery')], max_length=3)),
+                ('distance_from_shop', models.IntegerField(blank=True, default=0, null=True)),
+                ('shipping_address', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Order',
+                'verbose_name_plural': 'Orders',
+            },
+        ),
+        migrations.CreateModel(
+            name='Item',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30)),
+                ('original_price', models.FloatField()),
+                ('discount_price', models.FloatField(blank=True, null=True)),
+                ('weight_in_gms', models.FloatField()),
+                ('available', models.BooleanField(default=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='shoppingcart.Category')),
+            ],
+            options={
+                'verbose_name': 'Item',
+                'verbose_name_plural': 'Items',
+                'unique_together': {('name', 'category')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0002_order_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30)),
+                ('original_price', models.FloatField()),
+                ('discount_price', models.FloatField(blank=True, null=True)),
+                ('weight_in_gms', models.FloatField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shoppingcart.Item')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='shoppingcart.Order')),
+            ],
+            options={
+                'verbose_name': 'Order Line',
+                'verbose_name_plural': 'Order Lines',
+            },
+        ),
+    ]
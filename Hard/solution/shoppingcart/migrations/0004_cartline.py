@@ -0,0 +1,29 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0003_orderline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartLine',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(db_index=True, max_length=40)),
+                ('quantity', models.PositiveIntegerField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shoppingcart.Item')),
+            ],
+            options={
+                'verbose_name': 'Cart Line',
+                'verbose_name_plural': 'Cart Lines',
+                'unique_together': {('session_key', 'item')},
+            },
+        ),
+    ]
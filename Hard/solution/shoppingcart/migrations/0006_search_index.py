@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# FTS5 tables backing shoppingcart.search; rowid mirrors the source pk.
+# Other database backends fall back to LIKE queries and need no tables.
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE shoppingcart_item_search "
+        "USING fts5(name, category, prefix='1 2 3')"
+    )
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE shoppingcart_category_search "
+        "USING fts5(name, prefix='1 2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO shoppingcart_item_search (rowid, name, category) "
+        "SELECT item.id, item.name, category.name FROM shoppingcart_item item "
+        "JOIN shoppingcart_category category ON category.id = item.category_id"
+    )
+    schema_editor.execute(
+        "INSERT INTO shoppingcart_category_search (rowid, name) "
+        "SELECT id, name FROM shoppingcart_category"
+    )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS shoppingcart_item_search")
+    schema_editor.execute("DROP TABLE IF EXISTS shoppingcart_category_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shoppingcart", "0005_vendor_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryTier',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_distance_km', models.FloatField(unique=True)),
+                ('cost', models.FloatField()),
+                ('surcharge_per_kg', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Delivery Tier',
+                'verbose_name_plural': 'Delivery Tiers',
+                'ordering': ['max_distance_km'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='distance_from_shop',
+            field=models.FloatField(blank=True, default=0, null=True),
+        ),
+    ]
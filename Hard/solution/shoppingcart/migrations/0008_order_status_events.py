@@ -0,0 +1,31 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0007_delivery_tiers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('TRAN', 'In Transit'), ('COMP', 'Completed'), ('CANC', 'Cancelled')], max_length=4)),
+                ('to_status', models.CharField(choices=[('TRAN', 'In Transit'), ('COMP', 'Completed'), ('CANC', 'Cancelled')], max_length=4)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('source', models.CharField(blank=True, max_length=20)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='shoppingcart.Order')),
+            ],
+            options={
+                'verbose_name': 'Order Status Event',
+                'verbose_name_plural': 'Order Status Events',
+                'ordering': ['changed_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0008_order_status_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='stock_quantity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=40)),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shoppingcart.Item')),
+            ],
+            options={
+                'verbose_name': 'Stock Reservation',
+                'verbose_name_plural': 'Stock Reservations',
+                'unique_together': {('session_key', 'item')},
+            },
+        ),
+    ]
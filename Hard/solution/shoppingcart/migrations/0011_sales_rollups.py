@@ -0,0 +1,61 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def copy_line_categories(apps, schema_editor):
+    Item = apps.get_model("shoppingcart", "Item")
+    OrderLine = apps.get_model("shoppingcart", "OrderLine")
+    OrderLine.objects.filter(item__isnull=False).update(
+        category=Subquery(
+            Item.objects.filter(pk=OuterRef("item_id")).values("category_id")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0010_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('period_start', models.DateTimeField()),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('payment_method', 'Payment Method'), ('delivery_option', 'Delivery Option'), ('item', 'Item'), ('category', 'Category')], max_length=15)),
+                ('key', models.CharField(blank=True, max_length=20)),
+                ('label', models.CharField(blank=True, max_length=40)),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('tax', models.FloatField(default=0)),
+                ('shipping', models.FloatField(default=0)),
+                ('savings', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sales Rollup',
+                'verbose_name_plural': 'Sales Rollups',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='in_sales_rollups',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shoppingcart.Category'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'dimension', 'period_start', 'key'), name='sales_rollup_unique'),
+        ),
+        migrations.RunPython(copy_line_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0011_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='in_item_pairs',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ItemPair',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shoppingcart.Item')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shoppingcart.Item')),
+            ],
+            options={
+                'verbose_name': 'Item Pair',
+                'verbose_name_plural': 'Item Pairs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='itempair',
+            index=models.Index(fields=['item', '-count'], name='item_pair_count_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='itempair',
+            constraint=models.UniqueConstraint(fields=('item', 'other'), name='item_pair_unique'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:53
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0012_item_pairs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='tax_rate',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=5, null=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)]),
+        ),
+    ]
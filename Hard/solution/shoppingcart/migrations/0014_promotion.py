@@ -0,0 +1,51 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:58
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0013_category_tax_rate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Promotion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40)),
+                ('kind', models.CharField(choices=[('PCT', 'Percent off'), ('BXGY', 'Buy X get Y'), ('CART', 'Cart total threshold')], max_length=4)),
+                ('percent', models.DecimalField(decimal_places=2, default=0, help_text='Off the items covered; for Buy X get Y, off the Y units', max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('buy_quantity', models.PositiveIntegerField(blank=True, null=True)),
+                ('get_quantity', models.PositiveIntegerField(blank=True, null=True)),
+                ('minimum_total', models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0)])),
+                ('amount_off', models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0)])),
+                ('starts_at', models.DateTimeField(blank=True, null=True)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('enabled', models.BooleanField(default=True)),
+                ('categories', models.ManyToManyField(blank=True, related_name='_promotion_categories_+', to='shoppingcart.Category')),
+                ('items', models.ManyToManyField(blank=True, related_name='_promotion_items_+', to='shoppingcart.Item')),
+            ],
+            options={
+                'verbose_name': 'Promotion',
+                'verbose_name_plural': 'Promotions',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderPromotion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40)),
+                ('discount', models.FloatField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='shoppingcart.Order')),
+                ('promotion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shoppingcart.Promotion')),
+            ],
+            options={
+                'verbose_name': 'Order Promotion',
+                'verbose_name_plural': 'Order Promotions',
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.0.14 on 2026-10-18 05:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.utils import timezone
+
+
+def record_current_prices(apps, schema_editor):
+    # Earlier prices weren't kept, so history starts now.
+    Item = apps.get_model("shoppingcart", "Item")
+    ItemPriceVersion = apps.get_model("shoppingcart", "ItemPriceVersion")
+    now = timezone.now()
+    ItemPriceVersion.objects.bulk_create(
+        [
+            ItemPriceVersion(
+                item_id=pk,
+                original_price=original_price,
+                discount_price=discount_price,
+                valid_from=now,
+            )
+            for pk, original_price, discount_price in Item.objects.values_list(
+                "pk", "original_price", "discount_price"
+            ).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0014_promotion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemPriceVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_price', models.FloatField()),
+                ('discount_price', models.FloatField(blank=True, null=True)),
+                ('valid_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_versions', to='shoppingcart.Item')),
+            ],
+            options={
+                'verbose_name': 'Item Price Version',
+                'verbose_name_plural': 'Item Price Versions',
+            },
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='price_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shoppingcart.ItemPriceVersion'),
+        ),
+        migrations.AddIndex(
+            model_name='itempriceversion',
+            index=models.Index(fields=['item', 'valid_from'], name='price_version_item_from_idx'),
+        ),
+        migrations.RunPython(record_current_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.0.14 on 2026-10-18 05:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_lines_to_versions(apps, schema_editor):
+    # Point every line at a version holding the prices it was billed at. Lines
+    # without one, or whose version disagrees with their copied prices, get a
+    # version per item and prices, valid from the first order billing them.
+    OrderLine = apps.get_model("shoppingcart", "OrderLine")
+    ItemPriceVersion = apps.get_model("shoppingcart", "ItemPriceVersion")
+    unlinked = {}
+    for line in OrderLine.objects.select_related("price_version", "order").iterator():
+        prices = (line.original_price, line.discount_price)
+        version = line.price_version
+        if version and (version.original_price, version.discount_price) == prices:
+            continue
+        billed = unlinked.setdefault((line.item_id, *prices), [line.order.billing_date_time, []])
+        billed[0] = min(billed[0], line.order.billing_date_time)
+        billed[1].append(line.pk)
+    for (item_id, original_price, discount_price), (billed_at, line_pks) in unlinked.items():
+        version = ItemPriceVersion.objects.create(
+            item_id=item_id,
+            original_price=original_price,
+            discount_price=discount_price,
+            valid_from=billed_at,
+        )
+        for start in range(0, len(line_pks), 500):
+            OrderLine.objects.filter(pk__in=line_pks[start:start + 500]).update(
+                price_version=version
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingcart', '0015_item_price_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itempriceversion',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_versions', to='shoppingcart.Item'),
+        ),
+        migrations.RunPython(link_lines_to_versions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='orderline',
+            name='discount_price',
+        ),
+        migrations.RemoveField(
+            model_name='orderline',
+            name='original_price',
+        ),
+        migrations.AlterField(
+            model_name='orderline',
+            name='price_version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='shoppingcart.ItemPriceVersion'),
+        ),
+    ]
@@ -1,16 +1,50 @@
-import json
+from collections import defaultdict
 
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.core.serializers import deserialize, serialize
-from django.db import models
-
-from shoppingcart.utilities import delivery_cost, order_directory
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from gadgetify.delivery import DeliveryTariff
+from gadgetify.pricing import (
+    BuyXGetY,
+    CartThreshold,
+    PercentOff,
+    PriceLine,
+    PricingEngine,
+    PromotionIndex,
+    to_paise,
+    to_rupees,
+)
+from shoppingcart.utilities import delivery_cost
 
 
 class Category(models.Model):
     """docstring for Category."""
 
+    TAX_RATES_CACHE_KEY = "pricing:tax_rates"
+
     name = models.CharField(max_length=30, unique=True)
+    # Blank means the default rate, gadgetify.pricing.DEFAULT_TAX_RATE.
+    tax_rate = models.DecimalField(
+        max_digits=5,
+        decimal_places=4,
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(0), MaxValueValidator(1)],
+    )
+
+    @classmethod
+    def get_tax_rates(cls):
+        tax_rates = cache.get(cls.TAX_RATES_CACHE_KEY)
+        if tax_rates is None:
+            tax_rates = dict(
+                cls.objects.filter(tax_rate__isnull=False).values_list("pk", "tax_rate")
+            )
+            cache.set(cls.TAX_RATES_CACHE_KEY, tax_rates, None)
+        return tax_rates
 
     def __str__(self):
         return f"Category {self.pk}: {self.name}"
@@ -20,15 +54,38 @@ class Category(models.Model):
         verbose_name_plural = "Categories"
 
 
+class ItemQuerySet(models.QuerySet):
+    def with_price_version(self):
+        """Annotate each item with ``current_price_version``, the pk of its
+        latest ItemPriceVersion, and that version's prices as
+        ``current_<field>``, read in the same query as the item."""
+        return self.annotate(
+            current_price_version=ItemPriceVersion.latest_for(OuterRef("pk")),
+            **{
+                f"current_{field}": ItemPriceVersion.latest_for(
+                    OuterRef("pk"), field=field
+                )
+                for field in ItemPriceVersion.PRICE_FIELDS
+            },
+        )
+
+
 class Item(models.Model):
     """docstring for Item."""
 
+    objects = ItemQuerySet.as_manager()
+
     name = models.CharField(max_length=30)
     category = models.ForeignKey("Category", on_delete=models.PROTECT)
+    # Every price change is kept as an ItemPriceVersion: saving an Item
+    # records one, and bulk writers call shoppingcart.prices.record_prices.
     original_price = models.FloatField()
     discount_price = models.FloatField(null=True, blank=True)
     weight_in_gms = models.FloatField()
     available = models.BooleanField(default=True)
+    # Units left to sell; null means stock isn't tracked for this item. Only
+    # ever change it with conditional F() updates (see shoppingcart.stock).
+    stock_quantity = models.PositiveIntegerField(null=True, blank=True)
 
     @property
     def actual_price(self):
@@ -41,6 +98,16 @@ class Item(models.Model):
         else:
             return 0
 
+    def price_line(self, quantity):
+        return PriceLine(
+            key=self.pk,
+            quantity=quantity,
+            price=to_paise(self.actual_price),
+            original_price=to_paise(self.original_price),
+            category=self.category_id,
+            weight_in_gms=self.weight_in_gms,
+        )
+
     def __str__(self):
         return f"Item {self.pk}: {self.name}"
 
@@ -48,6 +115,313 @@ class Item(models.Model):
         verbose_name = "Item"
         verbose_name_plural = "Items"
         unique_together = [["name", "category"]]
+        # Vendor item listing: filter by category/availability, sort by the
+        # columns offered in all_items.html. discount_price is paginated on
+        # COALESCE(discount_price, 0), which a plain column index can't serve.
+        indexes = [
+            models.Index(
+                fields=["category", "available"], name="item_category_avail_idx"
+            ),
+            models.Index(fields=["original_price"], name="item_original_price_idx"),
+            models.Index(fields=["name"], name="item_name_idx"),
+            models.Index(fields=["weight_in_gms"], name="item_weight_idx"),
+        ]
+
+
+class ItemPriceVersionQuerySet(models.QuerySet):
+    def as_of(self, at):
+        """The version in force at ``at`` for each item that had a price by
+        then."""
+        return self.filter(
+            valid_from__lte=at,
+            pk=ItemPriceVersion.latest_for(OuterRef("item_id"), at),
+        )
+
+
+class ItemPriceVersion(models.Model):
+    """An Item's prices from ``valid_from`` until its next version.
+
+    Rows are only ever added (see shoppingcart.prices), so the price of any
+    item at any time since its first version can be looked up. Order lines
+    read their prices from the version they were billed at, so versions
+    outlive their item.
+    """
+
+    PRICE_FIELDS = ("original_price", "discount_price")
+
+    objects = ItemPriceVersionQuerySet.as_manager()
+
+    item = models.ForeignKey(
+        "Item",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="price_versions",
+    )
+    original_price = models.FloatField()
+    discount_price = models.FloatField(null=True, blank=True)
+    valid_from = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def latest_for(cls, item, at=None, field="pk"):
+        """Subquery for ``field`` of the latest version of ``item`` (a pk or
+        an OuterRef), as of ``at`` if given."""
+        versions = cls.objects.filter(item=item)
+        if at is not None:
+            versions = versions.filter(valid_from__lte=at)
+        return Subquery(versions.order_by("-valid_from", "-pk").values(field)[:1])
+
+    @property
+    def actual_price(self):
+        return self.discount_price or self.original_price
+
+    def __str__(self):
+        return f"Item {self.item_id} from {self.valid_from}: {self.actual_price}"
+
+    class Meta:
+        verbose_name = "Item Price Version"
+        verbose_name_plural = "Item Price Versions"
+        indexes = [
+            models.Index(
+                fields=["item", "valid_from"], name="price_version_item_from_idx"
+            ),
+        ]
+
+
+class CartLine(models.Model):
+    """Cart entry for DatabaseCartStore, keyed by session."""
+
+    session_key = models.CharField(max_length=40, db_index=True)
+    item = models.ForeignKey("Item", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.quantity} x Item {self.item_id} ({self.session_key})"
+
+    class Meta:
+        verbose_name = "Cart Line"
+        verbose_name_plural = "Cart Lines"
+        unique_together = [["session_key", "item"]]
+
+
+class StockReservation(models.Model):
+    """Units held for a cart until expires_at, already taken off stock."""
+
+    session_key = models.CharField(max_length=40)
+    item = models.ForeignKey("Item", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.quantity} x Item {self.item_id} ({self.session_key})"
+
+    class Meta:
+        verbose_name = "Stock Reservation"
+        verbose_name_plural = "Stock Reservations"
+        unique_together = [["session_key", "item"]]
+
+
+class DeliveryTier(models.Model):
+    """Vendor-configured delivery charge for distances up to max_distance_km."""
+
+    TARIFF_CACHE_KEY = "delivery:tariff"
+
+    max_distance_km = models.FloatField(unique=True)
+    cost = models.FloatField()
+    surcharge_per_kg = models.FloatField(default=0)
+
+    @classmethod
+    def get_tariff(cls):
+        tariff = cache.get(cls.TARIFF_CACHE_KEY)
+        if tariff is None:
+            tiers = list(
+                cls.objects.values_list("max_distance_km", "cost", "surcharge_per_kg")
+            )
+            tariff = DeliveryTariff(tiers) if tiers else delivery_cost
+            cache.set(cls.TARIFF_CACHE_KEY, tariff, None)
+        return tariff
+
+    def __str__(self):
+        return f"Up to {self.max_distance_km} km: {self.cost}"
+
+    class Meta:
+        verbose_name = "Delivery Tier"
+        verbose_name_plural = "Delivery Tiers"
+        ordering = ["max_distance_km"]
+
+
+class Promotion(models.Model):
+    """Discount rule run at cart update and checkout by gadgetify.pricing.
+
+    An empty ``items`` and ``categories`` means the whole catalog; otherwise
+    the promotion covers the items listed plus every item in the categories
+    listed. Amounts are in rupees.
+    """
+
+    INDEX_CACHE_KEY = "pricing:promotions"
+
+    PERCENT_OFF = "PCT"
+    BUY_X_GET_Y = "BXGY"
+    CART_THRESHOLD = "CART"
+    KIND_CHOICES = [
+        (PERCENT_OFF, "Percent off"),
+        (BUY_X_GET_Y, "Buy X get Y"),
+        (CART_THRESHOLD, "Cart total threshold"),
+    ]
+
+    name = models.CharField(max_length=40)
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    percent = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        help_text="Off the items covered; for Buy X get Y, off the Y units",
+    )
+    buy_quantity = models.PositiveIntegerField(blank=True, null=True)
+    get_quantity = models.PositiveIntegerField(blank=True, null=True)
+    minimum_total = models.FloatField(
+        blank=True, null=True, validators=[MinValueValidator(0)]
+    )
+    amount_off = models.FloatField(
+        blank=True, null=True, validators=[MinValueValidator(0)]
+    )
+    items = models.ManyToManyField("Item", blank=True, related_name="+")
+    categories = models.ManyToManyField("Category", blank=True, related_name="+")
+    starts_at = models.DateTimeField(blank=True, null=True)
+    ends_at = models.DateTimeField(blank=True, null=True)
+    enabled = models.BooleanField(default=True)
+
+    @classmethod
+    def get_index(cls):
+        """The enabled promotions that haven't ended, compiled into a
+        gadgetify.pricing.PromotionIndex. Cached until a promotion changes;
+        ones that end meanwhile are skipped by the engine's time check."""
+        index = cache.get(cls.INDEX_CACHE_KEY)
+        if index is None:
+            promotions = list(
+                cls.objects.filter(enabled=True).exclude(ends_at__lte=timezone.now())
+            )
+            items = defaultdict(list)
+            categories = defaultdict(list)
+            if promotions:
+                pks = [promotion.pk for promotion in promotions]
+                for through, scope, field in (
+                    (cls.items.through, items, "item_id"),
+                    (cls.categories.through, categories, "category_id"),
+                ):
+                    for promotion_id, pk in through.objects.filter(
+                        promotion_id__in=pks
+                    ).values_list("promotion_id", field):
+                        scope[promotion_id].append(pk)
+            index = PromotionIndex(
+                promotion.to_rule(items[promotion.pk], categories[promotion.pk])
+                for promotion in promotions
+            )
+            cache.set(cls.INDEX_CACHE_KEY, index, None)
+        return index
+
+    def to_rule(self, item_ids, category_ids):
+        scope = {
+            "items": item_ids,
+            "categories": category_ids,
+            "starts_at": self.starts_at,
+            "ends_at": self.ends_at,
+            "key": self.pk,
+            "name": self.name,
+        }
+        if self.kind == self.BUY_X_GET_Y:
+            return BuyXGetY(self.buy_quantity, self.get_quantity, self.percent, **scope)
+        if self.kind == self.CART_THRESHOLD:
+            return CartThreshold(
+                to_paise(self.minimum_total or 0),
+                self.percent,
+                to_paise(self.amount_off or 0),
+                **scope,
+            )
+        return PercentOff(self.percent, **scope)
+
+    def clean(self):
+        if self.kind == self.BUY_X_GET_Y and not (
+            self.buy_quantity and self.get_quantity
+        ):
+            raise ValidationError("Buy X get Y needs both quantities")
+        if self.kind == self.CART_THRESHOLD and self.minimum_total is None:
+            raise ValidationError("A cart total threshold needs a minimum total")
+        if self.kind != self.CART_THRESHOLD and self.amount_off:
+            raise ValidationError("Only cart total thresholds take an amount off")
+        if self.starts_at and self.ends_at and self.ends_at <= self.starts_at:
+            raise ValidationError("A promotion must end after it starts")
+
+    def __str__(self):
+        return f"Promotion {self.pk}: {self.name}"
+
+    class Meta:
+        verbose_name = "Promotion"
+        verbose_name_plural = "Promotions"
+
+
+class OrderQuerySet(models.QuerySet):
+    def matching(self, params):
+        """Orders matching the status/payment/delivery filters and ``q``
+        search that the vendor order list accepts."""
+        filters = {}
+        for field_name in Order.get_filter_choices():
+            val = params.get(field_name)
+            if val:
+                filters[field_name] = val
+        orders = self.filter(**filters)
+        search = params.get("q")
+        if search:
+            orders = orders.filter(pk=search)
+        return orders
+
+    def change_status(self, new_status, source=""):
+        """Move every order in this queryset that may transition to
+        ``new_status`` with a single UPDATE, logging an OrderStatusEvent per
+        order. Returns the pks of the orders that changed."""
+        from_statuses = [
+            status
+            for status, targets in Order.ALLOWED_TRANSITIONS.items()
+            if new_status in targets
+        ]
+        with transaction.atomic():
+            changed = list(
+                self.filter(order_status__in=from_statuses)
+                .select_for_update()
+                .values_list("pk", "order_status")
+            )
+            if not changed:
+                return []
+            order_ids = [order_id for order_id, _ in changed]
+            now = timezone.now()
+            Order.objects.filter(pk__in=order_ids).update(
+                order_status=new_status, order_modified=now
+            )
+            OrderStatusEvent.objects.bulk_create(
+                OrderStatusEvent(
+                    order_id=order_id,
+                    from_status=old_status,
+                    to_status=new_status,
+                    changed_at=now,
+                    source=source,
+                )
+                for order_id, old_status in changed
+            )
+            from shoppingcart.tasks import notify_status_changed, update_sales_rollups
+            from shoppingcart.worker import enqueue_many
+
+            enqueue_many(
+                [
+                    (
+                        notify_status_changed,
+                        {"order_ids": order_ids, "status": new_status},
+                    ),
+                    (update_sales_rollups, {"order_ids": order_ids}),
+                ]
+            )
+        return order_ids
 
 
 class Order(models.Model):
@@ -68,6 +442,11 @@ class Order(models.Model):
         ("COMP", "Completed"),
         ("CANC", "Cancelled"),
     ]
+    ALLOWED_TRANSITIONS = {
+        "TRAN": {"COMP", "CANC"},
+    }
+
+    objects = OrderQuerySet.as_manager()
 
     billing_date_time = models.DateTimeField(auto_now_add=True)
     order_modified = models.DateTimeField(auto_now=True)
@@ -78,84 +457,121 @@ class Order(models.Model):
     customer_mobile_no = models.BigIntegerField()
     payment_method = models.CharField(max_length=5, choices=PAYMENT_CHOICES)
     delivery_option = models.CharField(max_length=3, choices=DELIVERY_CHOICES)
-    distance_from_shop = models.IntegerField(blank=True, null=True, default=0)
+    distance_from_shop = models.FloatField(blank=True, null=True, default=0)
     shipping_address = models.TextField(blank=True, null=True)
+    # Bill totals, computed once at checkout so listings never touch the invoice
+    subtotal = models.FloatField(blank=True, null=True)
+    tax = models.FloatField(blank=True, null=True)
+    shipping = models.FloatField(blank=True, null=True)
+    savings = models.FloatField(blank=True, null=True)
+    payable = models.FloatField(blank=True, null=True)
+    # Whether the totals are currently added into the SalesRollup rows (see
+    # shoppingcart.analytics).
+    in_sales_rollups = models.BooleanField(default=False)
+    # Whether its items have been counted in ItemPair (see
+    # shoppingcart.recommendations).
+    in_item_pairs = models.BooleanField(default=False)
+
+    @classmethod
+    def get_filter_choices(cls):
+        return {
+            field.name: field.choices for field in cls._meta.fields if field.choices
+        }
 
     def get_billed_items(self):
-        item_list = self.get_items_from_json_cart()
+        item_list = [
+            (line, line.quantity) for line in self.lines.select_related("price_version")
+        ]
         return item_list
 
+    def get_shipping_cost(self, weight_in_gms=0):
+        if self.delivery_option == "HMD":
+            return DeliveryTier.get_tariff().cost(
+                self.distance_from_shop, weight_in_gms
+            )
+        else:
+            return 0
+
+    @staticmethod
+    def get_pricing_engine(promotions=True):
+        """The engine pricing carts now: current tax rates and, unless
+        ``promotions`` is false, the running promotions."""
+        return PricingEngine(
+            tax_rates=Category.get_tax_rates(),
+            discounts=Promotion.get_index() if promotions else (),
+            at=timezone.now(),
+        )
+
+    def compute_totals(self, item_list, engine=None):
+        """Price ``item_list`` with ``engine``, by default the one pricing
+        carts now, and store the totals on the order."""
+        engine = engine or self.get_pricing_engine()
+        quote = engine.quote(item.price_line(quantity) for item, quantity in item_list)
+        quote.shipping = to_paise(self.get_shipping_cost(quote.weight_in_gms))
+        self.set_totals(quote)
+        return quote
+
+    def set_totals(self, quote):
+        """Store a gadgetify.pricing Quote's totals on the order."""
+        self.subtotal = float(to_rupees(quote.subtotal))
+        self.tax = float(to_rupees(quote.tax))
+        self.shipping = float(to_rupees(quote.shipping))
+        self.savings = float(to_rupees(quote.savings))
+        self.payable = float(to_rupees(quote.total))
+
     @property
     def total_tax(self):
-        tax_rate = 0.06
-        total_price = self.total_item_price
-        return round(tax_rate * total_price, 2)
+        return self.tax
 
     @property
     def total_shipping(self):
-        if self.delivery_option == "HMD":
-            try:
-                return delivery_cost[
-                    filter(
-                        lambda x: self.distance_from_shop in x, delivery_cost.keys()
-                    ).__next__()
-                ]
-            except StopIteration:
-                return None
-        else:
-            return 0
+        return self.shipping
 
     @property
     def total_item_price(self):
-        price = 0
-        item_list = self.get_billed_items()
-        for item, quantity in item_list:
-            price += item.actual_price * quantity
-        return round(price, 2)
+        return self.subtotal
 
     @property
     def total_savings(self):
-        saved = 0
-        item_list = self.get_billed_items()
-        for item, quantity in item_list:
-            saved += item.savings * quantity
-        return round(saved, 2)
+        return self.savings
 
     @property
     def amount_payable(self):
-        return round((self.total_item_price + self.total_tax + self.total_shipping), 2)
-
-    def get_items_from_json_cart(self):
-        with open(order_directory + f"order_{self.pk}.json") as f:
-            cart_list = json.load(f)
-
-        item_list = []
-        for item in cart_list[1:]:
-            quantity = item.pop("quantity")
-            item_deserialized = list(deserialize("json", json.dumps([item])))[0]
-            item_obj = item_deserialized.object
-            item_list.append((item_obj, quantity))
-
-        return item_list
-
-    def save_cart(self, cart):
-        cart_list = [{"order_id": self.pk}]
-        for i, (item, quantity) in enumerate(cart.items()):
-            ser_item = Item.objects.filter(pk=item.pk)
-            store_cart = json.loads(serialize("json", ser_item))
-            store_cart[0]["quantity"] = quantity
-            cart_list.extend(store_cart)
-
-        with open(order_directory + f"order_{self.pk}.json", "w") as f:
-            json.dump(cart_list, f)
+        return self.payable
+
+    def build_lines(self, cart):
+        items = Item.objects.with_price_version().in_bulk(list(cart))
+        unpriced = [
+            pk for pk, item in items.items() if item.current_price_version is None
+        ]
+        if unpriced:
+            # Items bulk-created without shoppingcart.prices.record_prices.
+            from shoppingcart.prices import record_prices
+
+            record_prices(Item.objects.filter(pk__in=unpriced))
+            items.update(Item.objects.with_price_version().in_bulk(unpriced))
+        lines = []
+        for item_pk, quantity in cart.items():
+            if item_pk in items:
+                lines.append(OrderLine.from_item(self, items[item_pk], quantity))
+        return lines
 
     def clean(self):
-        if self.total_shipping is None:
+        if self.get_shipping_cost() is None:
             raise ValidationError("Undeliverable Shipping Address")
 
     def save(self, cart, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.save_cart(cart)
+        lines = self.build_lines(cart)
+        quote = self.compute_totals((line, line.quantity) for line in lines)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            for line in lines:
+                line.order = self
+            OrderLine.objects.bulk_create(lines)
+            if quote.applied:
+                OrderPromotion.objects.bulk_create(
+                    OrderPromotion.from_quote(self, quote)
+                )
 
     def __str__(self):
         return f"Order {self.pk}"
@@ -163,3 +579,269 @@ class Order(models.Model):
     class Meta:
         verbose_name = "Order"
         verbose_name_plural = "Orders"
+        # Vendor order listing: one equality filter on a choice field followed
+        # by the default billing_date_time sort, plus the other sort columns.
+        # The customer status lookup goes through the primary key.
+        indexes = [
+            models.Index(fields=["billing_date_time"], name="order_billed_idx"),
+            models.Index(
+                fields=["order_status", "billing_date_time"],
+                name="order_status_billed_idx",
+            ),
+            models.Index(
+                fields=["payment_method", "billing_date_time"],
+                name="order_payment_billed_idx",
+            ),
+            models.Index(
+                fields=["delivery_option", "billing_date_time"],
+                name="order_delivery_billed_idx",
+            ),
+            models.Index(fields=["order_modified"], name="order_modified_idx"),
+            models.Index(fields=["customer_name"], name="order_customer_name_idx"),
+        ]
+
+
+class OrderStatusEvent(models.Model):
+    """Audit log entry for an order status change."""
+
+    order = models.ForeignKey(
+        "Order", on_delete=models.CASCADE, related_name="status_events"
+    )
+    from_status = models.CharField(max_length=4, choices=Order.ORDER_STATUSES)
+    to_status = models.CharField(max_length=4, choices=Order.ORDER_STATUSES)
+    changed_at = models.DateTimeField(default=timezone.now)
+    source = models.CharField(max_length=20, blank=True)
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status} -> {self.to_status}"
+
+    class Meta:
+        verbose_name = "Order Status Event"
+        verbose_name_plural = "Order Status Events"
+        ordering = ["changed_at"]
+
+
+class OrderLine(models.Model):
+    """Snapshot of an Item as it was billed on an Order. Its prices are those
+    of the ItemPriceVersion it was billed at."""
+
+    order = models.ForeignKey("Order", on_delete=models.CASCADE, related_name="lines")
+    item = models.ForeignKey(
+        "Item", on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    category = models.ForeignKey(
+        "Category", on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    price_version = models.ForeignKey(
+        "ItemPriceVersion", on_delete=models.PROTECT, related_name="+"
+    )
+    name = models.CharField(max_length=30)
+    weight_in_gms = models.FloatField()
+    quantity = models.PositiveIntegerField()
+
+    @classmethod
+    def from_item(cls, order, item, quantity):
+        """Line for ``item``, annotated by ItemQuerySet.with_price_version."""
+        return cls(
+            order=order,
+            item=item,
+            category_id=item.category_id,
+            price_version=ItemPriceVersion(
+                pk=item.current_price_version,
+                item_id=item.pk,
+                original_price=item.current_original_price,
+                discount_price=item.current_discount_price,
+            ),
+            name=item.name,
+            weight_in_gms=item.weight_in_gms,
+            quantity=quantity,
+        )
+
+    @property
+    def original_price(self):
+        return self.price_version.original_price
+
+    @property
+    def discount_price(self):
+        return self.price_version.discount_price
+
+    @property
+    def actual_price(self):
+        return self.discount_price or self.original_price
+
+    @property
+    def savings(self):
+        if self.discount_price:
+            return self.original_price - self.discount_price
+        else:
+            return 0
+
+    def price_line(self, quantity=None):
+        return PriceLine(
+            key=self.item_id,
+            quantity=self.quantity if quantity is None else quantity,
+            price=to_paise(self.actual_price),
+            original_price=to_paise(self.original_price),
+            category=self.category_id,
+            weight_in_gms=self.weight_in_gms,
+        )
+
+    def __str__(self):
+        return f"{self.quantity} x {self.name} (Order {self.order_id})"
+
+    class Meta:
+        verbose_name = "Order Line"
+        verbose_name_plural = "Order Lines"
+
+
+class OrderPromotion(models.Model):
+    """A promotion as it was applied to an Order, with what it took off."""
+
+    order = models.ForeignKey(
+        "Order", on_delete=models.CASCADE, related_name="promotions"
+    )
+    promotion = models.ForeignKey(
+        "Promotion", on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    name = models.CharField(max_length=40)
+    discount = models.FloatField()
+
+    @classmethod
+    def from_quote(cls, order, quote):
+        # The index is cached, so a promotion may have been deleted since.
+        applied = quote.applied
+        existing = set(
+            Promotion.objects.filter(pk__in=[rule.key for rule in applied]).values_list(
+                "pk", flat=True
+            )
+        )
+        return [
+            cls(
+                order=order,
+                promotion_id=rule.key if rule.key in existing else None,
+                name=rule.name,
+                discount=float(to_rupees(discount)),
+            )
+            for rule, discount in applied.items()
+        ]
+
+    def __str__(self):
+        return f"{self.name}: -{self.discount} (Order {self.order_id})"
+
+    class Meta:
+        verbose_name = "Order Promotion"
+        verbose_name_plural = "Order Promotions"
+
+
+class ItemPair(models.Model):
+    """Number of orders that contained both ``item`` and ``other``. Each pair
+    is stored in both directions (see shoppingcart.recommendations)."""
+
+    item = models.ForeignKey("Item", on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey("Item", on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.item_id} & {self.other_id}: {self.count}"
+
+    class Meta:
+        verbose_name = "Item Pair"
+        verbose_name_plural = "Item Pairs"
+        constraints = [
+            models.UniqueConstraint(fields=["item", "other"], name="item_pair_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["item", "-count"], name="item_pair_count_idx"),
+        ]
+
+
+class SalesRollup(models.Model):
+    """Sales in one hour or day, overall or for one payment method, delivery
+    option, item or category. Maintained by shoppingcart.analytics."""
+
+    HOUR = "hour"
+    DAY = "day"
+    PERIODS = [
+        (HOUR, "Hourly"),
+        (DAY, "Daily"),
+    ]
+    TOTAL = "total"
+    PAYMENT_METHOD = "payment_method"
+    DELIVERY_OPTION = "delivery_option"
+    ITEM = "item"
+    CATEGORY = "category"
+    DIMENSIONS = [
+        (TOTAL, "Total"),
+        (PAYMENT_METHOD, "Payment Method"),
+        (DELIVERY_OPTION, "Delivery Option"),
+        (ITEM, "Item"),
+        (CATEGORY, "Category"),
+    ]
+    AMOUNT_FIELDS = ("orders", "units", "revenue", "tax", "shipping", "savings")
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    period_start = models.DateTimeField()
+    dimension = models.CharField(max_length=15, choices=DIMENSIONS)
+    # Payment method or delivery option code, item or category pk; blank for
+    # the total.
+    key = models.CharField(max_length=20, blank=True)
+    label = models.CharField(max_length=40, blank=True)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.FloatField(default=0)
+    tax = models.FloatField(default=0)
+    shipping = models.FloatField(default=0)
+    savings = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.period} {self.period_start}: {self.dimension} {self.label}"
+
+    class Meta:
+        verbose_name = "Sales Rollup"
+        verbose_name_plural = "Sales Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "dimension", "period_start", "key"],
+                name="sales_rollup_unique",
+            ),
+        ]
+
+
+class Task(models.Model):
+    """Unit of background work for the run_worker command (see
+    shoppingcart.worker)."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    # JSON-encoded keyword arguments for the task function.
+    payload = models.TextField(default="{}")
+    status = models.CharField(max_length=7, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    # A running task whose lease has expired is assumed lost with its worker
+    # and is picked up again.
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Task {self.pk}: {self.name} ({self.status})"
+
+    class Meta:
+        verbose_name = "Task"
+        verbose_name_plural = "Tasks"
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="task_status_run_at_idx"),
+        ]
@@ -0,0 +1,132 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class Page:
+    def __init__(self, object_list, order_by, next_query=None, prev_query=None):
+        self.object_list = object_list
+        self.order_by = order_by
+        self.next_query = next_query
+        self.prev_query = prev_query
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Cursor pagination on ``(sort field, pk)``.
+
+    Each page is fetched with a ``WHERE (key, pk) > cursor ... LIMIT n``
+    query, so its cost does not grow with how deep the visitor has paged.
+    ``order_by`` must name one of ``sort_fields``; anything else falls back
+    to ``default_order_by``.
+    """
+
+    def __init__(self, queryset, sort_fields, default_order_by):
+        self.queryset = queryset
+        self.sort_fields = sort_fields
+        self.default_order_by = default_order_by
+
+    def clean_order_by(self, order_by):
+        if order_by and order_by.lstrip("-") in self.sort_fields:
+            return order_by
+        return self.default_order_by
+
+    @staticmethod
+    def clean_page_size(page_size):
+        try:
+            page_size = int(page_size)
+        except (TypeError, ValueError):
+            return DEFAULT_PAGE_SIZE
+        return max(1, min(page_size, MAX_PAGE_SIZE))
+
+    def encode_cursor(self, field, obj):
+        value = obj.keyset_value
+        if value is not None and not isinstance(value, (int, float, str)):
+            value = field.value_to_string(obj)
+        payload = json.dumps([value, obj.pk]).encode()
+        return urlsafe_base64_encode(payload)
+
+    def decode_cursor(self, field, cursor):
+        if not cursor:
+            return None
+        try:
+            value, pk = json.loads(urlsafe_base64_decode(cursor))
+            return field.to_python(value), int(pk)
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def paginate(self, params):
+        """Return the ``Page`` selected by the ``order_by``, ``page_size``,
+        ``after`` and ``before`` query parameters in ``params``."""
+        order_by = self.clean_order_by(params.get("order_by"))
+        page_size = self.clean_page_size(params.get("page_size"))
+        descending = order_by.startswith("-")
+        field_name = order_by.lstrip("-")
+        field = self.queryset.model._meta.pk
+        if field_name != "pk":
+            field = self.queryset.model._meta.get_field(field_name)
+
+        # Nullable columns sort on a coalesced key so the cursor comparison
+        # stays total.
+        key = F(field.attname)
+        if field.null:
+            key = Coalesce(field.attname, Value(0.0))
+        queryset = self.queryset.annotate(keyset_value=key)
+
+        after = params.get("after")
+        before = params.get("before")
+        backwards = bool(before) and not after
+        cursor = self.decode_cursor(field, before if backwards else after)
+        if cursor is None:
+            backwards = False
+
+        # Walking backwards is walking forwards in the reversed order.
+        forward_descending = descending != backwards
+        if cursor is not None:
+            value, pk = cursor
+            if forward_descending:
+                condition = Q(keyset_value__lt=value) | Q(keyset_value=value, pk__lt=pk)
+            else:
+                condition = Q(keyset_value__gt=value) | Q(keyset_value=value, pk__gt=pk)
+            queryset = queryset.filter(condition)
+        direction = "-" if forward_descending else ""
+        queryset = queryset.order_by(f"{direction}keyset_value", f"{direction}pk")
+
+        rows = list(queryset[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, cursor is not None
+
+        page = Page(rows, order_by)
+        if rows and has_next:
+            page.next_query = self.build_query(
+                params, "after", self.encode_cursor(field, rows[-1])
+            )
+        if rows and has_prev:
+            page.prev_query = self.build_query(
+                params, "before", self.encode_cursor(field, rows[0])
+            )
+        return page
+
+    @staticmethod
+    def build_query(params, name, cursor):
+        query = params.copy()
+        query.pop("after", None)
+        query.pop("before", None)
+        query[name] = cursor
+        return query.urlencode()
@@ -0,0 +1,64 @@
+"""Item price history.
+
+``ItemPriceVersion`` rows are appended whenever an item's prices change: by
+a post_save receiver for single saves, and by ``record_prices`` called from
+the bulk writers (CSV imports, generated catalogs) that skip signals. Order
+lines point at the version they were billed at, and ``catalog_as_of``
+answers what every item cost at some earlier time.
+"""
+
+from django.db.models import OuterRef
+from django.utils import timezone
+
+from shoppingcart.models import ItemPriceVersion
+
+PRICE_BATCH_SIZE = 1000
+
+
+def record_prices(items, at=None, batch_size=PRICE_BATCH_SIZE):
+    """Add a version, valid from ``at`` (now by default), for each of
+    ``items`` (a queryset) whose prices differ from its latest version.
+    Returns the number of versions added.
+
+    Items and their latest versions are compared in one query, so running
+    it again without a price change adds nothing.
+    """
+    rows = items.annotate(
+        **{
+            f"version_{field}": ItemPriceVersion.latest_for(OuterRef("pk"), field=field)
+            for field in ("pk", *ItemPriceVersion.PRICE_FIELDS)
+        }
+    ).values_list(
+        "pk",
+        *ItemPriceVersion.PRICE_FIELDS,
+        "version_pk",
+        *(f"version_{field}" for field in ItemPriceVersion.PRICE_FIELDS),
+    )
+    at = at or timezone.now()
+    versions = [
+        ItemPriceVersion(
+            item_id=pk,
+            original_price=original_price,
+            discount_price=discount_price,
+            valid_from=at,
+        )
+        for (
+            pk,
+            original_price,
+            discount_price,
+            version_pk,
+            *version_prices,
+        ) in rows.iterator(batch_size)
+        if version_pk is None or version_prices != [original_price, discount_price]
+    ]
+    ItemPriceVersion.objects.bulk_create(versions, batch_size)
+    return len(versions)
+
+
+def catalog_as_of(at, category_id=None):
+    """``ItemPriceVersion``s in force at ``at``, with their items, for every
+    item still in the catalog that had a price by then."""
+    versions = ItemPriceVersion.objects.as_of(at).select_related("item__category")
+    if category_id is not None:
+        versions = versions.filter(item__category_id=category_id)
+    return versions.order_by("item_id")
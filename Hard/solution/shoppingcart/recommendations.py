@@ -0,0 +1,163 @@
+"""Frequently bought together recommendations.
+
+``ItemPair`` is a sparse item x item co-occurrence matrix: one row per pair
+of items that have been in the same order, stored in both directions so an
+item's neighbours are a single index range scan. ``rebuild_pairs`` counts
+the whole order history in one pass; after that each new order is added by
+``add_order_pairs`` from the background worker.
+
+Each item's top ``RELATED_LIMIT`` neighbours are cached and dropped when one
+of its pairs changes, so recommending for a cart costs one cache round trip
+plus one primary key lookup for the items shown. A list read just before a
+change commits can be cached again just after it is dropped, so entries also
+expire after ``RELATED_CACHE_TIMEOUT`` seconds.
+"""
+
+import time
+from collections import Counter
+from itertools import combinations, groupby, islice, permutations
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max
+
+from shoppingcart.models import Item, ItemPair, Order, OrderLine
+
+RELATED_LIMIT = 20
+RELATED_CACHE_TIMEOUT = 60 * 10
+RECOMMENDATION_COUNT = 4
+PAIR_BATCH_SIZE = 5000
+RECOMMENDATIONS_VERSION_KEY = "recommendations:version"
+
+
+def get_recommendations_version():
+    version = cache.get(RECOMMENDATIONS_VERSION_KEY)
+    if version is None:
+        cache.add(RECOMMENDATIONS_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(RECOMMENDATIONS_VERSION_KEY)
+    return version
+
+
+def bump_recommendations_version():
+    try:
+        return cache.incr(RECOMMENDATIONS_VERSION_KEY)
+    except ValueError:
+        return get_recommendations_version()
+
+
+def related_key(version, item_id):
+    return f"recommendations:{version}:{item_id}"
+
+
+def top_pairs(item_id):
+    return list(
+        ItemPair.objects.filter(item_id=item_id)
+        .order_by("-count", "other_id")
+        .values_list("other_id", "count")[:RELATED_LIMIT]
+    )
+
+
+def get_related(item_ids):
+    """``{item_id: [(other_id, count), ...]}`` with each item's most frequent
+    partners first, read from the cache where possible."""
+    version = get_recommendations_version()
+    keys = {related_key(version, item_id): item_id for item_id in item_ids}
+    related = {keys[key]: pairs for key, pairs in cache.get_many(keys).items()}
+    missing = {
+        key: top_pairs(item_id)
+        for key, item_id in keys.items()
+        if item_id not in related
+    }
+    if missing:
+        cache.set_many(missing, RELATED_CACHE_TIMEOUT)
+        related.update((keys[key], pairs) for key, pairs in missing.items())
+    return related
+
+
+def recommend(item_ids, k=RECOMMENDATION_COUNT):
+    """Pks of up to ``k`` items most often bought with ``item_ids``, best
+    first. Counts are summed over every item given."""
+    scores = Counter()
+    for pairs in get_related(item_ids).values():
+        for other_id, count in pairs:
+            scores[other_id] += count
+    for item_id in item_ids:
+        scores.pop(item_id, None)
+    return [item_id for item_id, _ in scores.most_common(k)]
+
+
+def recommended_items(item_ids, k=RECOMMENDATION_COUNT):
+    """Available ``Item``s to show next to ``item_ids``."""
+    if not item_ids:
+        return []
+    ranked = recommend(item_ids, RELATED_LIMIT)
+    items = Item.objects.filter(available=True).in_bulk(ranked)
+    return [items[item_id] for item_id in ranked if item_id in items][:k]
+
+
+def forget_related(item_ids):
+    version = get_recommendations_version()
+    cache.delete_many([related_key(version, item_id) for item_id in item_ids])
+
+
+@transaction.atomic
+def add_order_pairs(order_id):
+    """Count the pairs of items in one order, unless that was already done.
+    Returns whether the order was counted now."""
+    if not Order.objects.filter(pk=order_id, in_item_pairs=False).update(
+        in_item_pairs=True
+    ):
+        return False
+    lines = OrderLine.objects.filter(order_id=order_id, item__isnull=False)
+    item_ids = sorted(set(lines.values_list("item_id", flat=True)))
+    if len(item_ids) < 2:
+        return True
+
+    pairs = ItemPair.objects.filter(item_id__in=item_ids, other_id__in=item_ids)
+    existing = set(pairs.values_list("item_id", "other_id"))
+    pairs.update(count=F("count") + 1)
+    ItemPair.objects.bulk_create(
+        ItemPair(item_id=item_id, other_id=other_id, count=1)
+        for item_id, other_id in permutations(item_ids, 2)
+        if (item_id, other_id) not in existing
+    )
+    transaction.on_commit(lambda: forget_related(item_ids))
+    return True
+
+
+@transaction.atomic
+def rebuild_pairs(batch_size=PAIR_BATCH_SIZE):
+    """Recount every pair from the order history. Returns the number of
+    distinct pairs.
+
+    Lines are read through one cursor sorted by order and counted in memory,
+    one entry per pair that occurs at all, before the table is rewritten.
+    """
+    # Orders placed while this runs are left for their own update task.
+    last_pk = Order.objects.aggregate(last_pk=Max("pk"))["last_pk"] or 0
+    lines = (
+        OrderLine.objects.filter(order_id__lte=last_pk, item__isnull=False)
+        .order_by("order_id")
+        .values_list("order_id", "item_id")
+        .iterator(batch_size)
+    )
+    counts = Counter()
+    for _, order_lines in groupby(lines, key=lambda line: line[0]):
+        item_ids = sorted({item_id for _, item_id in order_lines})
+        counts.update(combinations(item_ids, 2))
+
+    ItemPair.objects.all().delete()
+    rows = (
+        ItemPair(item_id=item_id, other_id=other_id, count=count)
+        for (first, second), count in counts.items()
+        for item_id, other_id in ((first, second), (second, first))
+    )
+    # bulk_create would build every row up front; feed it a batch at a time.
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        ItemPair.objects.bulk_create(batch)
+    Order.objects.filter(pk__lte=last_pk).update(in_item_pairs=True)
+    transaction.on_commit(bump_recommendations_version)
+    return len(counts)
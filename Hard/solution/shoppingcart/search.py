@@ -0,0 +1,121 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from shoppingcart.models import Category, Item
+
+ITEM_SEARCH_TABLE = "shoppingcart_item_search"
+CATEGORY_SEARCH_TABLE = "shoppingcart_category_search"
+SEARCH_LIMIT = 50
+
+
+def search_enabled():
+    # FTS5 is SQLite-only; other backends fall back to LIKE queries.
+    return connection.vendor == "sqlite"
+
+
+def index_items(items):
+    if not search_enabled():
+        return
+    rows = [(item.pk, item.name, item.category.name) for item in items]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {ITEM_SEARCH_TABLE} WHERE rowid = %s",
+            [(pk,) for pk, _, _ in rows],
+        )
+        cursor.executemany(
+            f"INSERT INTO {ITEM_SEARCH_TABLE} (rowid, name, category) "
+            "VALUES (%s, %s, %s)",
+            rows,
+        )
+
+
+def unindex_item(item_pk):
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {ITEM_SEARCH_TABLE} WHERE rowid = %s", [item_pk])
+
+
+def index_category(category):
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {CATEGORY_SEARCH_TABLE} WHERE rowid = %s", [category.pk]
+        )
+        cursor.execute(
+            f"INSERT INTO {CATEGORY_SEARCH_TABLE} (rowid, name) VALUES (%s, %s)",
+            [category.pk, category.name],
+        )
+    index_items(category.item_set.select_related("category"))
+
+
+def unindex_category(category_pk):
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {CATEGORY_SEARCH_TABLE} WHERE rowid = %s", [category_pk]
+        )
+
+
+def build_match(query):
+    """Turn free text into an FTS5 query matching every word as a prefix."""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def ranked_ids(table, query, limit):
+    match = build_match(query)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {table} WHERE {table} MATCH %s "
+            "ORDER BY rank LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def filter_by_search(queryset, table, query):
+    match = build_match(query)
+    if not (search_enabled() and match):
+        return queryset.filter(name__icontains=query)
+    return queryset.filter(
+        pk__in=RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [match])
+    )
+
+
+def filter_items(queryset, query):
+    """Restrict an Item queryset to matches of ``query``, keeping its order."""
+    return filter_by_search(queryset, ITEM_SEARCH_TABLE, query)
+
+
+def filter_categories(queryset, query):
+    """Restrict a Category queryset to matches of ``query``, keeping its order."""
+    return filter_by_search(queryset, CATEGORY_SEARCH_TABLE, query)
+
+
+def search_items(query, limit=SEARCH_LIMIT):
+    """Item pks matching ``query`` by name or category, best match first."""
+    if not search_enabled():
+        return list(
+            Item.objects.filter(name__icontains=query).values_list("pk", flat=True)[
+                :limit
+            ]
+        )
+    return ranked_ids(ITEM_SEARCH_TABLE, query, limit)
+
+
+def search_categories(query, limit=SEARCH_LIMIT):
+    """Category pks matching ``query``, best match first."""
+    if not search_enabled():
+        return list(
+            Category.objects.filter(name__icontains=query).values_list("pk", flat=True)[
+                :limit
+            ]
+        )
+    return ranked_ids(CATEGORY_SEARCH_TABLE, query, limit)
@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from shoppingcart import search
+from shoppingcart.catalog import bump_catalog_version
+from shoppingcart.models import (
+    Category,
+    DeliveryTier,
+    Item,
+    ItemPriceVersion,
+    Promotion,
+)
+from shoppingcart.prices import record_prices
+
+# Notification hooks, sent from the background worker (see
+# shoppingcart.tasks) so slow receivers never hold up a request.
+# order_placed: order. order_status_changed: order, status.
+order_placed = Signal()
+order_status_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Item)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, **kwargs):
+    search.index_items([instance])
+
+
+@receiver(post_save, sender=Item)
+def record_item_prices(sender, instance, created, update_fields=None, **kwargs):
+    price_fields = set(ItemPriceVersion.PRICE_FIELDS)
+    if created:
+        # Nothing to compare a new item's prices with.
+        ItemPriceVersion.objects.create(
+            item=instance,
+            original_price=instance.original_price,
+            discount_price=instance.discount_price,
+        )
+    elif update_fields is None or price_fields & set(update_fields):
+        record_prices(Item.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Item)
+def unindex_item(sender, instance, **kwargs):
+    search.unindex_item(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    search.index_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    search.unindex_category(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=DeliveryTier)
+def invalidate_delivery_tariff(sender, **kwargs):
+    cache.delete(DeliveryTier.TARIFF_CACHE_KEY)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_tax_rates(sender, **kwargs):
+    cache.delete(Category.TAX_RATES_CACHE_KEY)
+
+
+@receiver([post_save, post_delete], sender=Promotion)
+@receiver(m2m_changed, sender=Promotion.items.through)
+@receiver(m2m_changed, sender=Promotion.categories.through)
+def invalidate_promotions(sender, **kwargs):
+    cache.delete(Promotion.INDEX_CACHE_KEY)
@@ -0,0 +1,155 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from shoppingcart.models import Item, StockReservation
+
+RESERVATION_TTL = timedelta(minutes=15)
+
+
+class OutOfStock(Exception):
+    def __init__(self, item_ids):
+        self.item_ids = list(item_ids)
+        super().__init__(f"Not enough stock for items {self.item_ids}")
+
+
+def per_item(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def take_stock(quantities):
+    """Take ``{item pk: units}`` off stock with one conditional UPDATE.
+
+    Items whose stock isn't tracked always succeed. Raises OutOfStock if any
+    tracked item has fewer units left than asked for; callers run this inside
+    a transaction so that the rows already decremented are rolled back.
+    """
+    quantities = {pk: units for pk, units in quantities.items() if units > 0}
+    if not quantities:
+        return
+    wanted = per_item(quantities)
+    updated = Item.objects.filter(
+        Q(stock_quantity__isnull=True) | Q(stock_quantity__gte=wanted),
+        pk__in=quantities,
+    ).update(stock_quantity=F("stock_quantity") - wanted)
+    if updated < len(quantities):
+        short = list(
+            Item.objects.filter(
+                pk__in=quantities, stock_quantity__lt=wanted
+            ).values_list("pk", flat=True)
+        )
+        if short:
+            raise OutOfStock(short)
+
+
+def return_stock(quantities):
+    """Put ``{item pk: units}`` back on stock with one UPDATE."""
+    quantities = {pk: units for pk, units in quantities.items() if units > 0}
+    if quantities:
+        Item.objects.filter(pk__in=quantities).update(
+            stock_quantity=F("stock_quantity") + per_item(quantities)
+        )
+
+
+def reserve(session_key, item_id, quantity):
+    """Hold ``quantity`` units of an item for a cart, replacing any earlier
+    hold and restarting its expiry. A quantity of 0 releases the hold."""
+    reserve_many(session_key, {item_id: quantity})
+
+
+def reserve_many(session_key, quantities):
+    """Set a cart's holds to ``{item pk: units}`` in one transaction.
+
+    Stock moves with one UPDATE each way, whatever the number of items. If
+    any item is short, OutOfStock is raised and no hold changes.
+    """
+    quantities = {pk: max(units, 0) for pk, units in quantities.items()}
+    expires_at = timezone.now() + RESERVATION_TTL
+    with transaction.atomic():
+        reservations = {
+            reservation.item_id: reservation
+            for reservation in StockReservation.objects.select_for_update().filter(
+                session_key=session_key, item_id__in=quantities
+            )
+        }
+        held = {pk: reservation.quantity for pk, reservation in reservations.items()}
+        take_stock({pk: units - held.get(pk, 0) for pk, units in quantities.items()})
+        return_stock({pk: units - quantities[pk] for pk, units in held.items()})
+
+        released = [pk for pk, units in quantities.items() if units == 0]
+        if released:
+            StockReservation.objects.filter(
+                session_key=session_key, item_id__in=released
+            ).delete()
+        changed = []
+        created = []
+        for pk, units in quantities.items():
+            if units == 0:
+                continue
+            reservation = reservations.get(pk)
+            if reservation is None:
+                created.append(
+                    StockReservation(
+                        session_key=session_key,
+                        item_id=pk,
+                        quantity=units,
+                        expires_at=expires_at,
+                    )
+                )
+            else:
+                reservation.quantity = units
+                reservation.expires_at = expires_at
+                changed.append(reservation)
+        StockReservation.objects.bulk_update(changed, ["quantity", "expires_at"])
+        StockReservation.objects.bulk_create(created)
+
+
+def release(session_key):
+    """Return every unit held for a cart."""
+    with transaction.atomic():
+        reservations = StockReservation.objects.select_for_update().filter(
+            session_key=session_key
+        )
+        held = dict(reservations.values_list("item_id", "quantity"))
+        if reservations.delete()[0]:
+            return_stock(held)
+
+
+def commit(session_key, cart):
+    """Turn a cart's holds into sold units at checkout.
+
+    Units already held count towards the cart; any shortfall is taken off
+    stock and any surplus returned. Must run inside the checkout transaction.
+    """
+    reservations = StockReservation.objects.select_for_update().filter(
+        session_key=session_key
+    )
+    held = dict(reservations.values_list("item_id", "quantity"))
+    reservations.delete()
+    take_stock({pk: quantity - held.get(pk, 0) for pk, quantity in cart.items()})
+    return_stock({pk: units - cart.get(pk, 0) for pk, units in held.items()})
+
+
+def sweep_expired(now=None):
+    """Release holds past their expiry. Returns the number released."""
+    now = now or timezone.now()
+    released = 0
+    expired = StockReservation.objects.filter(expires_at__lte=now).values_list(
+        "pk", "item_id", "quantity"
+    )
+    for pk, item_id, quantity in list(expired):
+        with transaction.atomic():
+            # The conditional delete claims the hold, so a checkout that
+            # consumed it first leaves nothing to return.
+            claimed = StockReservation.objects.filter(
+                pk=pk, expires_at__lte=now
+            ).delete()[0]
+            if claimed:
+                return_stock({item_id: quantity})
+                released += 1
+    return released
@@ -0,0 +1,362 @@
+"""Server-Sent Events streams served straight from ASGI.
+
+Django 3.0 runs every view in a worker thread, even under ASGI, so an open
+stream per watcher would tie up one thread each. These streams are plain
+ASGI apps instead: ``EventStreamRouter`` sits in front of Django in
+``asgi.py`` and serves them on the event loop. A single ``OrderFeed`` per
+process polls the database and fans changes out to every watcher, so the
+query rate doesn't grow with the number of open streams.
+"""
+
+import asyncio
+import json
+import logging
+import re
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections
+from django.http.cookie import parse_cookie
+
+from shoppingcart.models import Order, OrderStatusEvent
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 2
+KEEPALIVE_INTERVAL = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+FINAL_STATUSES = {"COMP", "CANC"}
+STREAM_TOKEN_SALT = "shoppingcart.streams.order_status_stream"
+STREAM_TOKEN_MAX_AGE = 60 * 60 * 24
+
+
+def database_sync_to_async(func):
+    """``sync_to_async`` that cleans up the worker thread's DB connection."""
+
+    def wrapped(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapped)
+
+
+def order_event(order):
+    return {
+        "type": "order",
+        "id": order["pk"],
+        "status": order["order_status"],
+        "customer_name": order["customer_name"],
+        "payable": order["payable"],
+        "billing_date_time": order["billing_date_time"],
+    }
+
+
+def status_event(event):
+    return {
+        "type": "status",
+        "id": event["order_id"],
+        "from_status": event["from_status"],
+        "status": event["to_status"],
+        "changed_at": event["changed_at"],
+    }
+
+
+def latest_cursors():
+    last_order = Order.objects.order_by("-pk").values_list("pk", flat=True).first()
+    last_event = (
+        OrderStatusEvent.objects.order_by("-pk").values_list("pk", flat=True).first()
+    )
+    return last_order or 0, last_event or 0
+
+
+def changes_since(last_order, last_event):
+    """New orders and status changes after the given pks, oldest first."""
+    orders = list(
+        Order.objects.filter(pk__gt=last_order)
+        .order_by("pk")
+        .values("pk", "order_status", "customer_name", "payable", "billing_date_time")
+    )
+    events = list(
+        OrderStatusEvent.objects.filter(pk__gt=last_event)
+        .order_by("pk")
+        .values("pk", "order_id", "from_status", "to_status", "changed_at")
+    )
+    if orders:
+        last_order = orders[-1]["pk"]
+    if events:
+        last_event = events[-1]["pk"]
+    changes = [order_event(order) for order in orders]
+    changes += [status_event(event) for event in events]
+    return changes, last_order, last_event
+
+
+class OrderFeed:
+    """Polls for order changes while anyone is watching and hands each change
+    to every subscriber queue."""
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.subscribers = set()
+        self.task = None
+        self.primed = None
+
+    async def subscribe(self):
+        """A queue receiving every change made after this returns.
+
+        Returns once the feed has read its starting point, so whatever the
+        caller reads from the database next can't miss a later change.
+        """
+        queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.primed = asyncio.get_event_loop().create_future()
+            self.task = asyncio.ensure_future(self.run())
+        try:
+            await asyncio.shield(self.primed)
+        except BaseException:
+            self.unsubscribe(queue)
+            raise
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def run(self):
+        try:
+            last_order, last_event = await database_sync_to_async(latest_cursors)()
+        except Exception as e:
+            self.primed.set_exception(e)
+            raise
+        self.primed.set_result(None)
+        while self.subscribers:
+            await asyncio.sleep(self.interval)
+            try:
+                changes, last_order, last_event = await database_sync_to_async(
+                    changes_since
+                )(last_order, last_event)
+            except DatabaseError:
+                logger.exception("Polling for order changes failed")
+                continue
+            for change in changes:
+                self.publish(change)
+
+    def publish(self, change):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(change)
+            except asyncio.QueueFull:
+                # A watcher this far behind has stalled; drop it and let its
+                # EventSource reconnect.
+                self.unsubscribe(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+
+feed = OrderFeed()
+
+
+class EventStream:
+    """One SSE response, ending when the client goes away."""
+
+    def __init__(self, receive, send):
+        self.receive = receive
+        self.send = send
+        self.disconnected = asyncio.Event()
+        self.watcher = None
+
+    async def start(self):
+        await self.send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        self.watcher = asyncio.ensure_future(self.watch_disconnect())
+
+    async def watch_disconnect(self):
+        while True:
+            message = await self.receive()
+            if message["type"] == "http.disconnect":
+                self.disconnected.set()
+                return
+
+    async def write(self, text):
+        await self.send(
+            {"type": "http.response.body", "body": text.encode(), "more_body": True}
+        )
+
+    async def event(self, name, data):
+        payload = json.dumps(data, cls=DjangoJSONEncoder)
+        await self.write(f"event: {name}\ndata: {payload}\n\n")
+
+    async def close(self):
+        self.watcher.cancel()
+        if not self.disconnected.is_set():
+            await self.send({"type": "http.response.body", "body": b""})
+
+    async def next_change(self, queue):
+        """The next change from ``queue``, ``None`` on a keepalive timeout, or
+        raise ``ConnectionAbortedError`` once the stream should end."""
+        getter = asyncio.ensure_future(queue.get())
+        disconnect = asyncio.ensure_future(self.disconnected.wait())
+        done, _ = await asyncio.wait(
+            [getter, disconnect],
+            timeout=KEEPALIVE_INTERVAL,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        disconnect.cancel()
+        if getter not in done:
+            getter.cancel()
+            if disconnect in done:
+                raise ConnectionAbortedError
+            return None
+        change = getter.result()
+        if change is None:
+            raise ConnectionAbortedError
+        return change
+
+    async def follow(
+        self, queue, accept=lambda change: True, last=lambda change: False
+    ):
+        """Send every accepted change until the client disconnects or a
+        change for which ``last`` is true has been sent."""
+        try:
+            while True:
+                try:
+                    change = await self.next_change(queue)
+                except ConnectionAbortedError:
+                    return
+                if change is None:
+                    await self.write(": keepalive\n\n")
+                elif accept(change):
+                    await self.event(change["type"], change)
+                    if last(change):
+                        return
+        finally:
+            feed.unsubscribe(queue)
+
+
+async def send_plain(send, status, text):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+        }
+    )
+    await send({"type": "http.response.body", "body": text.encode()})
+
+
+def is_staff_session(scope):
+    """Whether the session cookie in ``scope`` belongs to an active staff
+    user, as ``staff_member_required`` checks for views."""
+    cookies = parse_cookie(dict(scope.get("headers", [])).get(b"cookie", b"").decode())
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return False
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user(SimpleNamespace(session=session))
+    return user.is_active and user.is_staff
+
+
+async def vendor_order_stream(scope, receive, send):
+    """New orders and status changes for the vendor order list; staff only."""
+    if not await database_sync_to_async(is_staff_session)(scope):
+        return await send_plain(send, 403, "Forbidden")
+    queue = await feed.subscribe()
+    stream = EventStream(receive, send)
+    await stream.start()
+    await stream.follow(queue)
+    await stream.close()
+
+
+def order_stream_token(order_id):
+    """Token authorising the status stream and status API of ``order_id``,
+    handed out with the bill so the phone number never goes into a URL."""
+    return signing.dumps(order_id, salt=STREAM_TOKEN_SALT)
+
+
+def check_order_stream_token(token, order_id):
+    try:
+        signed_id = signing.loads(
+            token, salt=STREAM_TOKEN_SALT, max_age=STREAM_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return signed_id == order_id
+
+
+def get_order_status(order_id):
+    return (
+        Order.objects.filter(pk=order_id).values_list("order_status", flat=True).first()
+    )
+
+
+async def order_status_stream(scope, receive, send, order_id):
+    """Status changes of one order, for holders of its
+    ``order_stream_token``. The stream ends once the order is completed or
+    cancelled."""
+    query = parse_qs(scope.get("query_string", b"").decode())
+    if not check_order_stream_token(query.get("token", [""])[0], order_id):
+        return await send_plain(send, 404, "Order Not Found")
+    # The feed has its starting point once subscribed, so a change made
+    # after the status is read below is always published.
+    queue = await feed.subscribe()
+    status = await database_sync_to_async(get_order_status)(order_id)
+    if status is None:
+        feed.unsubscribe(queue)
+        return await send_plain(send, 404, "Order Not Found")
+
+    stream = EventStream(receive, send)
+    await stream.start()
+    await stream.event("status", {"type": "status", "id": order_id, "status": status})
+
+    if status in FINAL_STATUSES:
+        feed.unsubscribe(queue)
+    else:
+        await stream.follow(
+            queue,
+            accept=lambda change: change["type"] == "status"
+            and change["id"] == order_id,
+            last=lambda change: change["status"] in FINAL_STATUSES,
+        )
+    await stream.close()
+
+
+ROUTES = [
+    (re.compile(r"^/events/orders/$"), vendor_order_stream),
+    (re.compile(r"^/events/orders/(?P<order_id>\d+)/$"), order_status_stream),
+]
+
+
+class EventStreamRouter:
+    """ASGI app serving the event streams and passing everything else on to
+    Django."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            for pattern, stream in ROUTES:
+                match = pattern.match(scope["path"])
+                if match:
+                    kwargs = {
+                        name: int(value) for name, value in match.groupdict().items()
+                    }
+                    return await stream(scope, receive, send, **kwargs)
+        return await self.application(scope, receive, send)
@@ -0,0 +1,108 @@
+import random
+
+from django.db import transaction
+
+from shoppingcart.catalog import bump_catalog_version
+from shoppingcart.models import Category, Item, Order, OrderLine
+from shoppingcart.prices import record_prices
+from shoppingcart.search import index_category, index_items
+
+GENERATE_BATCH_SIZE = 5000
+MAX_LINES_PER_ORDER = 5
+
+
+def new_rows(model, last_pk):
+    # bulk_create doesn't return pks on every backend, so rows added by this
+    # process are read back by pk instead.
+    return model.objects.filter(pk__gt=last_pk or 0).order_by("pk")
+
+
+def last_pk(model):
+    return model.objects.order_by("-pk").values_list("pk", flat=True).first()
+
+
+def generate_catalog(categories, items, seed=0, batch_size=GENERATE_BATCH_SIZE):
+    """Add ``categories`` categories holding ``items`` items between them.
+
+    Returns the new items. Names are numbered from the current row count so
+    repeated runs add to the catalog instead of clashing with it.
+    """
+    rng = random.Random(seed)
+    start = Category.objects.count()
+    before = last_pk(Category)
+    Category.objects.bulk_create(
+        (Category(name=f"Category {start + i}") for i in range(categories)),
+        batch_size=batch_size,
+    )
+    new_categories = list(new_rows(Category, before))
+    for category in new_categories:
+        index_category(category)
+
+    before = last_pk(Item)
+    batch = []
+    for i in range(items):
+        original_price = rng.randrange(99, 100000)
+        batch.append(
+            Item(
+                name=f"Item {i}",
+                category=new_categories[i % len(new_categories)],
+                original_price=original_price,
+                discount_price=(
+                    round(original_price * rng.uniform(0.5, 0.95))
+                    if rng.random() < 0.3
+                    else None
+                ),
+                weight_in_gms=rng.randrange(10, 5000),
+                stock_quantity=rng.randrange(0, 500) if rng.random() < 0.5 else None,
+            )
+        )
+        if len(batch) >= batch_size:
+            Item.objects.bulk_create(batch)
+            batch = []
+    Item.objects.bulk_create(batch)
+    new_items = new_rows(Item, before).select_related("category")
+    index_items(new_items)
+    record_prices(new_items)
+    bump_catalog_version()
+    return new_rows(Item, before).with_price_version().select_related("category")
+
+
+def generate_orders(orders, items, seed=0, batch_size=GENERATE_BATCH_SIZE):
+    """Add ``orders`` checked-out orders with 1-5 lines drawn from ``items``."""
+    rng = random.Random(seed)
+    items = list(items)
+    for start in range(0, orders, batch_size):
+        size = min(batch_size, orders - start)
+        carts = [
+            {
+                item: rng.randint(1, 3)
+                for item in rng.sample(items, rng.randint(1, MAX_LINES_PER_ORDER))
+            }
+            for _ in range(size)
+        ]
+        batch = []
+        for cart in carts:
+            home_delivery = rng.random() < 0.5
+            order = Order(
+                customer_name=f"Customer {rng.randrange(orders)}",
+                customer_mobile_no=rng.randrange(6000000000, 9999999999),
+                payment_method=rng.choice(Order.PAYMENT_CHOICES)[0],
+                delivery_option="HMD" if home_delivery else "TKW",
+                distance_from_shop=rng.uniform(0, 49) if home_delivery else 0,
+                shipping_address="Bengaluru" if home_delivery else "",
+                order_status=rng.choice(Order.ORDER_STATUSES)[0],
+            )
+            order.compute_totals(cart.items())
+            batch.append(order)
+
+        with transaction.atomic():
+            before = last_pk(Order)
+            Order.objects.bulk_create(batch)
+            order_ids = new_rows(Order, before).values_list("pk", flat=True)
+            lines = []
+            for order_id, cart in zip(order_ids, carts):
+                for item, quantity in cart.items():
+                    line = OrderLine.from_item(None, item, quantity)
+                    line.order_id = order_id
+                    lines.append(line)
+            OrderLine.objects.bulk_create(lines)
@@ -0,0 +1,78 @@
+"""Background tasks run by the run_worker command (see shoppingcart.worker).
+
+Tasks may run more than once, so each must leave the same result when
+repeated.
+"""
+
+import json
+import os
+
+from django.conf import settings
+
+from shoppingcart.analytics import update_rollups
+from shoppingcart.models import Order
+from shoppingcart.recommendations import add_order_pairs
+from shoppingcart.signals import order_placed, order_status_changed
+from shoppingcart.stock import sweep_expired
+from shoppingcart.utilities import order_directory
+from shoppingcart.worker import task
+
+
+def get_invoice_directory():
+    return getattr(settings, "INVOICE_DIRECTORY", order_directory)
+
+
+@task
+def write_invoice(order_id):
+    """Write the order_<pk>.json invoice file, in the format that
+    import_order_invoices reads."""
+    order = Order.objects.get(pk=order_id)
+    cart_list = [{"order_id": order.pk}]
+    for line in order.lines.select_related("item", "price_version"):
+        cart_list.append(
+            {
+                "model": "shoppingcart.item",
+                "pk": line.item_id,
+                "fields": {
+                    "name": line.name,
+                    "category": line.category_id,
+                    "original_price": line.original_price,
+                    "discount_price": line.discount_price,
+                    "weight_in_gms": line.weight_in_gms,
+                    "available": line.item.available if line.item else False,
+                },
+                "quantity": line.quantity,
+            }
+        )
+    path = os.path.join(get_invoice_directory(), f"order_{order.pk}.json")
+    # Write to a temporary file first so readers never see a partial invoice.
+    with open(path + ".tmp", "w") as f:
+        json.dump(cart_list, f)
+    os.replace(path + ".tmp", path)
+
+
+@task
+def sweep_reservations():
+    sweep_expired()
+
+
+@task
+def notify_order_placed(order_id):
+    order = Order.objects.get(pk=order_id)
+    order_placed.send(sender=Order, order=order)
+
+
+@task
+def notify_status_changed(order_ids, status):
+    for order in Order.objects.filter(pk__in=order_ids):
+        order_status_changed.send(sender=Order, order=order, status=status)
+
+
+@task
+def update_sales_rollups(order_ids):
+    update_rollups(order_ids)
+
+
+@task
+def update_item_pairs(order_id):
+    add_order_pairs(order_id)
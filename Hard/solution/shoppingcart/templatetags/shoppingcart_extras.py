@@ -5,4 +5,4 @@ register = template.Library()
 
 @register.filter
 def get_quantity(cart, item_object):
-    return cart.get(item_object, 0)
+    return cart.get(item_object.pk, 0)
@@ -1,3 +1,1838 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shoppingcart.analytics import update_rollups
+from shoppingcart.benchmarks import run_benchmarks
+from shoppingcart.catalog import get_categories, get_category_items
+from shoppingcart.exports import export_orders
+from shoppingcart.imports import import_items
+from shoppingcart.management.commands.backfill_order_totals import TOTAL_FIELDS
+from shoppingcart.metrics import metrics
+from gadgetify.delivery import DeliveryTariff
+from gadgetify.pricing import (
+    BuyXGetY,
+    CartThreshold,
+    PercentOff,
+    PriceLine,
+    PricingEngine,
+    PromotionIndex,
+    to_paise,
+)
+from shoppingcart.models import (
+    Category,
+    DeliveryTier,
+    Item,
+    ItemPair,
+    ItemPriceVersion,
+    Order,
+    OrderLine,
+    OrderPromotion,
+    OrderStatusEvent,
+    Promotion,
+    SalesRollup,
+    StockReservation,
+    Task,
+)
+from shoppingcart.pagination import KeysetPaginator
+from shoppingcart.prices import catalog_as_of, record_prices
+from shoppingcart.recommendations import add_order_pairs, rebuild_pairs, recommend
+from shoppingcart.search import filter_categories, filter_items, search_items
+from shoppingcart.signals import order_placed
+from shoppingcart.stock import OutOfStock, commit, reserve, sweep_expired
+from shoppingcart.streams import (
+    POLL_INTERVAL,
+    EventStreamRouter,
+    database_sync_to_async,
+    feed,
+    order_stream_token,
+)
+from shoppingcart.synthetic import generate_catalog, generate_orders
+from shoppingcart.tasks import (
+    notify_order_placed,
+    notify_status_changed,
+    sweep_reservations,
+    update_item_pairs,
+    update_sales_rollups,
+    write_invoice,
+)
+from shoppingcart.views import ITEM_SORT_FIELDS, ORDER_SORT_FIELDS
+from shoppingcart.worker import claim, enqueue, enqueue_once, run_pending, task
+
+
+def make_item(category="Chargers", **overrides):
+    """Create an Item, an "Anker 20W" charger unless ``overrides`` say
+    otherwise. ``category`` is a Category or the name of one, created if
+    needed."""
+    if isinstance(category, str):
+        category, _ = Category.objects.get_or_create(name=category)
+    fields = {
+        "name": "Anker 20W",
+        "original_price": 1499,
+        "weight_in_gms": 80,
+        **overrides,
+    }
+    return Item.objects.create(category=category, **fields)
+
+
+def make_order(cart=None, **overrides):
+    """Check out ``cart`` (``{item pk: quantity}``) as a takeaway order
+    paid cash on delivery, unless ``overrides`` say otherwise."""
+    fields = {
+        "customer_name": "Customer",
+        "customer_mobile_no": 9988776655,
+        "payment_method": "COD",
+        "delivery_option": "TKW",
+        **overrides,
+    }
+    order = Order(**fields)
+    order.save(cart or {})
+    return order
+
+
+class CheckoutQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Phones")
+        Item.objects.bulk_create(
+            Item(
+                name=f"Phone {i}",
+                category=category,
+                original_price=1000 + i,
+                discount_price=900 + i if i % 2 else None,
+                weight_in_gms=200,
+            )
+            for i in range(100)
+        )
+        # bulk_create skips the post_save receiver recording prices.
+        record_prices(Item.objects.all())
+        cls.items = list(Item.objects.order_by("pk"))
+
+    def checkout(self, basket_size):
+        order = Order(
+            customer_name="Customer",
+            customer_mobile_no=9988776655,
+            payment_method="COD",
+            delivery_option="TKW",
+        )
+        cart = {item.pk: 2 for item in self.items[:basket_size]}
+        with CaptureQueriesContext(connection) as queries:
+            order.save(cart)
+        return order, len(queries)
+
+    def test_query_count_is_independent_of_basket_size(self):
+        # Load the cached tax rates and promotions first.
+        self.checkout(1)
+        _, small_basket_queries = self.checkout(1)
+        order, large_basket_queries = self.checkout(100)
+        self.assertEqual(small_basket_queries, large_basket_queries)
+        self.assertEqual(order.lines.count(), 100)
+
+    def test_totals_are_stored(self):
+        order, _ = self.checkout(2)
+        order.refresh_from_db()
+        self.assertEqual(order.subtotal, round((1000 + 901) * 2, 2))
+        self.assertEqual(order.savings, 200)
+        self.assertEqual(order.amount_payable, round(order.subtotal * 1.06, 2))
+
+    def test_status_lookup_serves_cached_bill(self):
+        cache.clear()
+        order, _ = self.checkout(3)
+        lookup = {"order_id": order.pk, "phone_number": order.customer_mobile_no}
+
+        with CaptureQueriesContext(connection) as cold:
+            first = self.client.post(reverse("order_status"), lookup)
+        with CaptureQueriesContext(connection) as warm:
+            second = self.client.post(reverse("order_status"), lookup)
+        self.assertContains(first, "Phone 2")
+        self.assertContains(second, "Phone 2")
+        # The order lines and promotions aren't read again.
+        self.assertEqual(len(warm), len(cold) - 2)
+
+        Order.objects.filter(pk=order.pk).change_status("COMP")
+        response = self.client.post(reverse("order_status"), lookup)
+        self.assertContains(response, "Order Status: Completed")
+
+
+class CartStoreTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Audio")
+        cls.item = Item.objects.create(
+            name="Earphones",
+            category=cls.category,
+            original_price=600,
+            discount_price=399,
+            weight_in_gms=67,
+        )
+
+    def add_to_cart(self, client, quantity):
+        client.post(
+            reverse("display_shopping_list", args=[self.category.pk]),
+            {"item_pk": self.item.pk, "quantity": quantity},
+        )
+
+    def assert_carts_are_isolated(self):
+        first, second = self.client_class(), self.client_class()
+        self.add_to_cart(first, 3)
+        self.add_to_cart(second, 1)
+        self.assertEqual(
+            first.get(reverse("create_order")).context["cart"], {self.item: 3}
+        )
+        self.assertEqual(
+            second.get(reverse("create_order")).context["cart"], {self.item: 1}
+        )
+
+        self.add_to_cart(first, 0)
+        self.assertEqual(first.get(reverse("create_order")).context["cart"], {})
+
+    def test_signed_cookie_store(self):
+        self.assert_carts_are_isolated()
+
+    @override_settings(CART_STORE="shoppingcart.cart.CacheCartStore")
+    def test_cache_store(self):
+        self.assert_carts_are_isolated()
+
+    @override_settings(CART_STORE="shoppingcart.cart.DatabaseCartStore")
+    def test_database_store(self):
+        self.assert_carts_are_isolated()
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Cameras")
+        self.item = Item.objects.create(
+            name="Canon 1300D",
+            category=self.category,
+            original_price=43999,
+            weight_in_gms=1432,
+        )
+
+    def test_repeat_reads_skip_the_database(self):
+        get_categories(), get_category_items(self.category.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_categories(), [self.category])
+            self.assertEqual(get_category_items(self.category.pk), [self.item])
+
+    def test_edits_invalidate_cached_pages(self):
+        get_category_items(self.category.pk)
+        self.item.discount_price = 39999
+        self.item.save()
+        self.assertEqual(get_category_items(self.category.pk)[0].discount_price, 39999)
+
+        self.item.delete()
+        self.assertEqual(get_category_items(self.category.pk), [])
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Laptops")
+        Item.objects.bulk_create(
+            Item(
+                name=f"Laptop {i}",
+                category=category,
+                original_price=50000,
+                discount_price=45000 + (i % 4) * 1000 if i % 3 else None,
+                weight_in_gms=2000,
+            )
+            for i in range(23)
+        )
+        cls.paginator = KeysetPaginator(
+            Item.objects.all(), ("pk", "discount_price"), "pk"
+        )
+
+    def walk(self, query, direction="next_query"):
+        pages = []
+        while query is not None:
+            page = self.paginator.paginate(QueryDict(query))
+            pages.append([item.pk for item in page])
+            query = getattr(page, direction)
+        return pages, page
+
+    def test_pages_cover_every_row_once_in_order(self):
+        items = Item.objects.all()
+        for order_by in ("pk", "-pk", "discount_price", "-discount_price"):
+            field = order_by.lstrip("-")
+            expected = [
+                item.pk
+                for item in sorted(
+                    items,
+                    key=lambda item: (getattr(item, field) or 0, item.pk),
+                    reverse=order_by.startswith("-"),
+                )
+            ]
+            pages, _ = self.walk(f"order_by={order_by}&page_size=5")
+            self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+            self.assertEqual(sum(pages, []), expected)
+
+    def test_previous_cursor_walks_back(self):
+        forward, last_page = self.walk("order_by=-discount_price&page_size=5")
+        backward, _ = self.walk(last_page.prev_query, direction="prev_query")
+        self.assertEqual(list(reversed(backward)), forward[:-1])
+
+    def test_unknown_sort_field_falls_back_to_default(self):
+        page = self.paginator.paginate(
+            QueryDict("order_by=original_price&page_size=1000&after=garbage")
+        )
+        self.assertEqual(page.order_by, "pk")
+        self.assertEqual(len(page), 23)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite syntax")
+class HotQueryIndexTest(TestCase):
+    def query_plan(self, queryset, sort_fields, default_order_by, params=""):
+        with CaptureQueriesContext(connection) as queries:
+            KeysetPaginator(queryset, sort_fields, default_order_by).paginate(
+                QueryDict(params)
+            )
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + queries[-1]["sql"])
+            return " ".join(str(row[-1]) for row in cursor.fetchall())
+
+    def assert_uses_index(self, plan, index_name):
+        self.assertIn(f"USING INDEX {index_name}", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_order_listing_queries(self):
+        for field, index_name in [
+            ("order_status", "order_status_billed_idx"),
+            ("payment_method", "order_payment_billed_idx"),
+            ("delivery_option", "order_delivery_billed_idx"),
+        ]:
+            plan = self.query_plan(
+                Order.objects.filter(**{field: "X"}),
+                ORDER_SORT_FIELDS,
+                "-billing_date_time",
+            )
+            self.assert_uses_index(plan, index_name)
+
+        for order_by, index_name in [
+            ("-billing_date_time", "order_billed_idx"),
+            ("order_modified", "order_modified_idx"),
+            ("customer_name", "order_customer_name_idx"),
+        ]:
+            plan = self.query_plan(
+                Order.objects.all(),
+                ORDER_SORT_FIELDS,
+                "-billing_date_time",
+                f"order_by={order_by}",
+            )
+            self.assert_uses_index(plan, index_name)
+
+    def test_order_status_lookup(self):
+        plan = Order.objects.filter(pk=1, customer_mobile_no=9988776655).explain()
+        self.assertIn("INTEGER PRIMARY KEY", plan)
+
+    def test_item_listing_queries(self):
+        plan = self.query_plan(
+            Item.objects.filter(category_id=1, available=True), ITEM_SORT_FIELDS, "-pk"
+        )
+        self.assert_uses_index(plan, "item_category_avail_idx")
+
+        for order_by, index_name in [
+            ("name", "item_name_idx"),
+            ("-original_price", "item_original_price_idx"),
+            ("weight_in_gms", "item_weight_idx"),
+        ]:
+            plan = self.query_plan(
+                Item.objects.all(), ITEM_SORT_FIELDS, "-pk", f"order_by={order_by}"
+            )
+            self.assert_uses_index(plan, index_name)
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.phones = Category.objects.create(name="Smartphones")
+        self.audio = Category.objects.create(name="Audio")
+        self.oneplus = Item.objects.create(
+            name="OnePlus 7 Pro",
+            category=self.phones,
+            original_price=52999,
+            weight_in_gms=206,
+        )
+        self.buds = Item.objects.create(
+            name="OnePlus Buds",
+            category=self.audio,
+            original_price=4999,
+            weight_in_gms=40,
+        )
+
+    def test_prefix_matching_on_name_and_category(self):
+        self.assertEqual(search_items("oneplus pro"), [self.oneplus.pk])
+        self.assertCountEqual(search_items("onep"), [self.oneplus.pk, self.buds.pk])
+        self.assertEqual(search_items("smart"), [self.oneplus.pk])
+        self.assertEqual(search_items("%"), [])
+
+    def test_index_follows_edits(self):
+        self.buds.name = "Nord Buds"
+        self.buds.save()
+        self.assertEqual(search_items("nord"), [self.buds.pk])
+        self.assertEqual(search_items("oneplus"), [self.oneplus.pk])
+
+        self.audio.name = "Headphones"
+        self.audio.save()
+        self.assertEqual(search_items("headph"), [self.buds.pk])
+
+        self.buds.delete()
+        self.assertEqual(search_items("nord"), [])
+
+    def test_vendor_filters(self):
+        items = filter_items(Item.objects.order_by("pk"), "onep")
+        self.assertEqual(list(items), [self.oneplus, self.buds])
+        categories = filter_categories(Category.objects.all(), "aud")
+        self.assertEqual(list(categories), [self.audio])
+
+    def test_customer_search_page(self):
+        response = self.client.get(reverse("search"), {"q": "buds"})
+        self.assertEqual(response.context["results"], [self.buds])
+
+
+class DeliveryTariffTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_tier_lookup(self):
+        tariff = DeliveryTariff([(20, 30), (5, 0), (50, 60)])
+        costs = [tariff.cost(km) for km in (0, 5, 5.5, 20, 20.1, 50, 50.5, -1)]
+        self.assertEqual(costs, [0, 0, 30, 30, 60, 60, None, None])
+
+    def test_weight_surcharge(self):
+        tariff = DeliveryTariff([(5, 0, 10), (20, 30)], free_weight_gms=2000)
+        self.assertEqual(tariff.cost(3, weight_in_gms=2000), 0)
+        self.assertEqual(tariff.cost(3, weight_in_gms=4500), 30)
+        self.assertEqual(tariff.cost(10, weight_in_gms=4500), 30)
+
+    def test_vendor_tiers_override_defaults(self):
+        order = Order(delivery_option="HMD", distance_from_shop=7.5)
+        self.assertEqual(order.get_shipping_cost(), 30)
+
+        DeliveryTier.objects.create(max_distance_km=10, cost=25, surcharge_per_kg=2)
+        self.assertEqual(order.get_shipping_cost(weight_in_gms=1500), 29)
+        order.distance_from_shop = 12
+        self.assertIsNone(order.get_shipping_cost())
+
+
+class PricingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.phones = Category.objects.create(name="Phones")
+        self.books = Category.objects.create(name="Books", tax_rate=Decimal("0"))
+        self.phone = Item.objects.create(
+            name="Phone",
+            category=self.phones,
+            original_price=999.99,
+            discount_price=899.99,
+            weight_in_gms=200,
+        )
+        self.book = Item.objects.create(
+            name="Book", category=self.books, original_price=0.1, weight_in_gms=300
+        )
+
+    def test_engine_works_in_paise(self):
+        engine = PricingEngine(
+            tax_rates={"books": 0},
+            discounts=[PercentOff(10, categories={"audio"}), PercentOff(5)],
+        )
+        quote = engine.quote(
+            [
+                PriceLine("earphones", 3, to_paise(0.1), to_paise(0.3), "audio", 67),
+                PriceLine("novel", 2, to_paise("0.2"), category="books"),
+                PriceLine("cable", 1, 199),
+            ]
+        )
+        self.assertEqual(quote.subtotal, 27 + 38 + 189)
+        self.assertEqual(quote.discount, 3 + 2 + 10)
+        self.assertEqual(quote.savings, 60 + 3 + 2 + 10)
+        # 6% of 2.16, half up, once for the whole cart; books are untaxed.
+        self.assertEqual(quote.tax, 13)
+        self.assertEqual(quote.weight_in_gms, 201)
+        self.assertEqual(quote.rupees()["total"], Decimal("2.67"))
+
+    def test_batch_quotes(self):
+        engine = PricingEngine()
+        line = PriceLine("mouse", 1, to_paise(700))
+        quotes = engine.quote_many([[line], [line, line._replace(key="pad")]], [0, 30])
+        self.assertEqual([quote.subtotal for quote in quotes], [70000, 140000])
+        self.assertEqual([quote.total for quote in quotes], [74200, 148430])
+        self.assertIs(quotes[0].lines[0], quotes[1].lines[0])
+
+    def test_category_tax_rates_at_checkout(self):
+        order = Order(
+            customer_name="Customer",
+            customer_mobile_no=9988776655,
+            payment_method="COD",
+            delivery_option="TKW",
+        )
+        order.save({self.phone.pk: 3, self.book.pk: 3})
+        self.assertEqual(order.subtotal, 2700.27)
+        self.assertEqual(order.savings, 300)
+        self.assertEqual(order.tax, 162)
+        self.assertEqual(order.payable, 2862.27)
+
+        self.phones.tax_rate = Decimal("0.18")
+        self.phones.save()
+        out = io.StringIO()
+        call_command("reprice_orders", "--dry-run", stdout=out)
+        self.assertIn("Would change 1 of 1 orders", out.getvalue())
+        order.refresh_from_db()
+        self.assertEqual(order.tax, 162)
+
+        call_command("reprice_orders", stdout=io.StringIO())
+        order.refresh_from_db()
+        self.assertEqual(order.tax, 485.99)
+        self.assertEqual(order.payable, 3186.26)
+
+
+class PromotionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.phones = Category.objects.create(name="Phones")
+        self.phone = Item.objects.create(
+            name="Phone",
+            category=self.phones,
+            original_price=999.99,
+            discount_price=899.99,
+            weight_in_gms=200,
+        )
+
+    def test_rules_are_looked_up_by_item_and_category(self):
+        rules = [PercentOff(1, items={i}) for i in range(300)]
+        audio = PercentOff(10, items={7}, categories={"audio"})
+        index = PromotionIndex([*rules, audio, CartThreshold(0, percent=5)])
+        line = PriceLine(7, 1, 100, category="audio")
+        self.assertEqual(index.line_rules(line), [rules[7], audio])
+        self.assertEqual(len(index.cart_rules(line)), 1)
+        self.assertEqual(index.line_rules(line._replace(key=500)), [audio])
+
+    def test_line_and_cart_rules(self):
+        three_for_two = BuyXGetY(2, 1, categories={"audio"}, name="3 for 2")
+        audio_threshold = CartThreshold(
+            50000, amount=3000, categories={"audio"}, name="300 off audio"
+        )
+        ten_percent = PercentOff(10)
+        engine = PricingEngine(
+            tax_rates={"books": 0},
+            discounts=[
+                ten_percent,
+                three_for_two,
+                audio_threshold,
+                CartThreshold(100000, percent=50),
+            ],
+        )
+        quote = engine.quote(
+            [
+                PriceLine("earphones", 7, 10000, category="audio"),
+                PriceLine("novel", 1, 10000, category="books"),
+            ]
+        )
+        # The better line rule wins: two free earphones over 10% off; the
+        # audio threshold is met after that, the half-off one isn't.
+        self.assertEqual(
+            quote.applied,
+            {three_for_two: 20000, ten_percent: 1000, audio_threshold: 3000},
+        )
+        self.assertEqual(quote.subtotal, 50000 + 9000 - 3000)
+        self.assertEqual(quote.tax, 2820)
+
+    def test_cart_discount_is_taken_off_each_tax_rate(self):
+        engine = PricingEngine(
+            tax_rates={"books": 0}, discounts=[CartThreshold(0, percent=10)]
+        )
+        quote = engine.quote(
+            [
+                PriceLine("earphones", 5, 10000, category="audio"),
+                PriceLine("novel", 1, 10000, category="books"),
+            ]
+        )
+        self.assertEqual(quote.cart_discount, 6000)
+        self.assertEqual(quote.tax, 2700)
+
+    def test_time_windows(self):
+        now = timezone.now()
+        flash_sale = PercentOff(
+            20, starts_at=now + timedelta(hours=1), ends_at=now + timedelta(hours=2)
+        )
+        line = PriceLine("phone", 1, 10000)
+        for at, discount in [
+            (now, 0),
+            (now + timedelta(hours=1), 2000),
+            (now + timedelta(hours=2), 0),
+        ]:
+            engine = PricingEngine(discounts=[flash_sale], at=at)
+            self.assertEqual(engine.quote([line]).discount, discount)
+
+    def create_promotions(self):
+        now = timezone.now()
+        flash_sale = Promotion.objects.create(
+            name="Phone flash sale",
+            kind=Promotion.PERCENT_OFF,
+            percent=10,
+            starts_at=now - timedelta(hours=1),
+            ends_at=now + timedelta(hours=1),
+        )
+        flash_sale.categories.add(self.phones)
+        Promotion.objects.create(
+            name="Spend 1000, save 100",
+            kind=Promotion.CART_THRESHOLD,
+            minimum_total=1000,
+            amount_off=100,
+        )
+        Promotion.objects.create(
+            name="Ended", kind=Promotion.PERCENT_OFF, percent=50, ends_at=now
+        )
+        Promotion.objects.create(
+            name="Disabled", kind=Promotion.PERCENT_OFF, percent=50, enabled=False
+        )
+        return flash_sale
+
+    def test_index_is_cached_until_promotions_change(self):
+        flash_sale = self.create_promotions()
+        self.assertEqual(len(Promotion.get_index()), 2)
+        with self.assertNumQueries(0):
+            Promotion.get_index()
+
+        flash_sale.categories.remove(self.phones)
+        flash_sale.items.add(self.phone)
+        self.assertEqual(
+            Promotion.get_index().line_rules(self.phone.price_line(1))[0].items,
+            {self.phone.pk},
+        )
+        Promotion.objects.filter(name="Disabled").get().delete()
+        flash_sale.enabled = False
+        flash_sale.save()
+        self.assertEqual(len(Promotion.get_index()), 1)
+
+    def test_applied_promotions_are_recorded_on_the_order(self):
+        flash_sale = self.create_promotions()
+        response = self.client.post(
+            reverse("cart_api"),
+            json.dumps({"items": {self.phone.pk: 2}}),
+            content_type="application/json",
+        )
+        self.assertEqual(
+            response.json()["promotions"],
+            [
+                {"id": flash_sale.pk, "name": "Phone flash sale", "discount": 180.0},
+                {
+                    "id": flash_sale.pk + 1,
+                    "name": "Spend 1000, save 100",
+                    "discount": 100.0,
+                },
+            ],
+        )
+
+        response = self.client.post(
+            reverse("api_checkout"),
+            json.dumps(
+                {
+                    "customer_name": "Customer",
+                    "customer_mobile_no": 9988776655,
+                    "payment_method": "COD",
+                    "delivery_option": "TKW",
+                }
+            ),
+            content_type="application/json",
+        )
+        order = Order.objects.get(pk=response.json()["id"])
+        self.assertEqual(order.subtotal, 1519.98)
+        self.assertEqual(order.tax, 91.2)
+        self.assertEqual(order.savings, 480)
+        self.assertEqual(order.payable, 1611.18)
+        self.assertEqual(
+            sorted(order.promotions.values_list("name", "discount")),
+            [("Phone flash sale", 180.0), ("Spend 1000, save 100", 100.0)],
+        )
+
+        # Repricing leaves orders billed with promotions alone.
+        out = io.StringIO()
+        call_command("reprice_orders", stdout=out)
+        self.assertIn("Changed 0 of 0 orders", out.getvalue())
+
+    def test_validation(self):
+        with self.assertRaises(ValidationError):
+            Promotion(name="Buy", kind=Promotion.BUY_X_GET_Y, buy_quantity=2).clean()
+        with self.assertRaises(ValidationError):
+            Promotion(name="Spend", kind=Promotion.CART_THRESHOLD).clean()
+
+
+class BackfillOrderTotalsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.item = make_item()
+
+    def backfill(self, *args):
+        out = io.StringIO()
+        call_command("backfill_order_totals", *args, stdout=out)
+        return out.getvalue()
+
+    def totals(self, order):
+        return Order.objects.values(*TOTAL_FIELDS).get(pk=order.pk)
+
+    def test_fills_in_missing_totals_only(self):
+        missing = make_order({self.item.pk: 2})
+        stale = make_order({self.item.pk: 1})
+        billed = self.totals(missing)
+        Order.objects.filter(pk=missing.pk).update(**dict.fromkeys(TOTAL_FIELDS, None))
+        Order.objects.filter(pk=stale.pk).update(payable=1)
+        empty = make_order()
+        Order.objects.filter(pk=empty.pk).update(payable=None)
+
+        err = io.StringIO()
+        out = io.StringIO()
+        call_command("backfill_order_totals", stdout=out, stderr=err)
+        self.assertIn("Backfilled 1 orders (1 skipped)", out.getvalue())
+        self.assertIn(f"Order {empty.pk}: no order lines", err.getvalue())
+        self.assertEqual(self.totals(missing), billed)
+        self.assertEqual(self.totals(stale)["payable"], 1)
+
+    def test_all_recomputes_every_order(self):
+        order = make_order({self.item.pk: 1})
+        billed = self.totals(order)
+        Order.objects.filter(pk=order.pk).update(payable=1, tax=0)
+
+        self.assertIn("Backfilled 1 orders", self.backfill("--all", "--batch-size=1"))
+        self.assertEqual(self.totals(order), billed)
+
+    def test_todays_promotions_leave_backfilled_totals_alone(self):
+        order = make_order({self.item.pk: 2})
+        billed = Order.objects.values(*TOTAL_FIELDS).get(pk=order.pk)
+        Order.objects.filter(pk=order.pk).update(payable=None)
+        Promotion.objects.create(
+            name="Half price", kind=Promotion.PERCENT_OFF, percent=50
+        )
+
+        self.assertIn("Backfilled 1 orders", self.backfill())
+        self.assertEqual(Order.objects.values(*TOTAL_FIELDS).get(pk=order.pk), billed)
+
+
+class ImportOrderInvoicesTest(TestCase):
+    def setUp(self):
+        self.item = make_item(discount_price=1299)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, file_name, content):
+        with open(os.path.join(self.directory.name, file_name), "w") as f:
+            f.write(content)
+
+    def run_import(self):
+        out = io.StringIO()
+        err = io.StringIO()
+        call_command(
+            "import_order_invoices",
+            directory=self.directory.name,
+            stdout=out,
+            stderr=err,
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_lines_are_imported_once(self):
+        order = make_order({self.item.pk: 3})
+        with override_settings(INVOICE_DIRECTORY=self.directory.name):
+            write_invoice(order.pk)
+        order.lines.all().delete()
+        self.write("order_9999.json", json.dumps([{"order_id": 9999}]))
+        self.write("order_broken.json", "[{")
+        self.write("notes.txt", "not an invoice")
+
+        out, err = self.run_import()
+        self.assertIn("Imported 1 order lines", out)
+        self.assertIn("order_9999.json: order 9999 not found, skipped", err)
+        self.assertIn("order_broken.json: not an invoice file, skipped", err)
+        line = order.lines.select_related("price_version").get()
+        self.assertEqual(
+            (line.item_id, line.name, line.quantity, line.actual_price),
+            (self.item.pk, "Anker 20W", 3, 1299),
+        )
+        self.assertEqual(line.price_version.valid_from, order.billing_date_time)
+
+        out, _ = self.run_import()
+        self.assertIn(f"order_{order.pk}.json: already imported", out)
+        self.assertIn("Imported 0 order lines", out)
+        self.assertEqual(order.lines.count(), 1)
+
+
+class PriceHistoryTest(TestCase):
+    def setUp(self):
+        self.item = make_item()
+        self.category = self.item.category
+
+    def prices(self):
+        return list(
+            self.item.price_versions.order_by("pk").values_list(
+                "original_price", "discount_price"
+            )
+        )
+
+    def test_versions_are_added_on_price_changes_only(self):
+        self.item.discount_price = 1299
+        self.item.save(update_fields=["discount_price"])
+        self.item.available = False
+        self.item.save(update_fields=["available"])
+        self.item.save()
+        self.assertEqual(self.prices(), [(1499, None), (1499, 1299)])
+
+        import_items(
+            io.StringIO(
+                "name,category,original_price,weight_in_gms\n"
+                "Anker 20W,Chargers,1399,80\n"
+                "Anker 65W,Chargers,3999,150\n"
+            )
+        )
+        self.assertEqual(self.prices(), [(1499, None), (1499, 1299), (1399, 1299)])
+        new_item = Item.objects.get(name="Anker 65W")
+        self.assertEqual(new_item.price_versions.count(), 1)
+        self.assertEqual(record_prices(Item.objects.all()), 0)
+
+    def test_lines_reference_the_price_they_were_billed_at(self):
+        order = make_order({self.item.pk: 1})
+        self.item.original_price = 1599
+        self.item.save()
+
+        line = order.lines.select_related("price_version").get()
+        self.assertEqual(line.price_version.original_price, 1499)
+        self.assertEqual(
+            self.item.price_versions.latest("valid_from", "pk").original_price, 1599
+        )
+
+        # Billed prices outlive the item.
+        self.item.delete()
+        line = order.lines.select_related("price_version").get()
+        self.assertEqual((line.item_id, line.actual_price), (None, 1499))
+
+    def test_items_without_versions_get_one_when_billed(self):
+        Item.objects.bulk_create(
+            [
+                Item(
+                    name="Anker 65W",
+                    category=self.category,
+                    original_price=3999,
+                    discount_price=3499,
+                    weight_in_gms=150,
+                )
+            ]
+        )
+        item = Item.objects.get(name="Anker 65W")
+        order = make_order({item.pk: 1})
+        line = order.lines.get()
+        self.assertEqual((line.original_price, line.discount_price), (3999, 3499))
+        self.assertEqual(item.price_versions.get(), line.price_version)
+
+    def test_catalog_as_of(self):
+        now = timezone.now()
+        self.item.price_versions.update(valid_from=now - timedelta(days=10))
+        other = make_item(name="Anker 65W", original_price=3999, weight_in_gms=150)
+        self.item.original_price = 1399
+        self.item.save()
+        ItemPriceVersion.objects.filter(original_price__in=[3999, 1399]).update(
+            valid_from=now - timedelta(days=5)
+        )
+
+        def prices_at(days_ago):
+            return [
+                (version.item_id, version.original_price)
+                for version in catalog_as_of(now - timedelta(days=days_ago))
+            ]
+
+        self.assertEqual(prices_at(20), [])
+        self.assertEqual(prices_at(7), [(self.item.pk, 1499)])
+        self.assertEqual(prices_at(1), [(self.item.pk, 1399), (other.pk, 3999)])
+
+        out = io.StringIO()
+        as_of = timezone.localtime(now - timedelta(days=7)).date().isoformat()
+        call_command("catalog_as_of", as_of, stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([row["original_price"] for row in rows], ["1499.0"])
+
+
+class BulkOrderStatusTest(TestCase):
+    def setUp(self):
+        Order.objects.bulk_create(
+            Order(
+                customer_name=f"Customer {i}",
+                customer_mobile_no=9988776655,
+                payment_method="COD" if i % 2 else "NETB",
+                delivery_option="TKW",
+                order_status="COMP" if i == 0 else "TRAN",
+            )
+            for i in range(10)
+        )
+        self.order_ids = list(Order.objects.order_by("pk").values_list("pk", flat=True))
+
+    def test_single_update_with_audit_log(self):
+        with CaptureQueriesContext(connection) as queries:
+            changed = Order.objects.all().change_status("COMP", source="test")
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(changed, self.order_ids[1:])
+        self.assertEqual(Order.objects.filter(order_status="COMP").count(), 10)
+        self.assertEqual(
+            OrderStatusEvent.objects.filter(
+                from_status="TRAN", to_status="COMP"
+            ).count(),
+            9,
+        )
+
+    def test_disallowed_transitions_are_skipped(self):
+        self.assertEqual(Order.objects.all().change_status("TRAN"), [])
+        self.assertEqual(Order.objects.filter(order_status="TRAN").count(), 9)
+        self.assertFalse(OrderStatusEvent.objects.exists())
+
+    def test_bulk_endpoint_by_ids_and_by_filter(self):
+        url = reverse("bulk_order_status")
+        data = {"new_status": "CANC", "order_ids": self.order_ids[:3]}
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.assertFalse(Order.objects.filter(order_status="CANC").exists())
+
+        self.client.force_login(User.objects.create_user("vendor", is_staff=True))
+        self.client.post(url, data)
+        self.assertEqual(Order.objects.filter(order_status="CANC").count(), 2)
+
+        self.client.post(
+            url,
+            {
+                "new_status": "COMP",
+                "apply_to": "filter",
+                "filters": "payment_method=COD&order_status=TRAN",
+            },
+        )
+        statuses = dict(Order.objects.values_list("pk", "order_status"))
+        for i, order_id in enumerate(self.order_ids[3:], start=3):
+            self.assertEqual(statuses[order_id], "COMP" if i % 2 else "TRAN")
+
+
+class OrderExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Order.objects.bulk_create(
+            Order(
+                customer_name=f"Customer {i}",
+                customer_mobile_no=9988776655,
+                payment_method="COD" if i % 2 else "NETB",
+                delivery_option="TKW",
+            )
+            for i in range(6)
+        )
+        cls.orders = list(Order.objects.order_by("pk"))
+        # Every order but the last gets (index + 1) lines.
+        price_version = ItemPriceVersion.objects.create(original_price=100)
+        OrderLine.objects.bulk_create(
+            OrderLine(
+                order=order,
+                price_version=price_version,
+                name=f"Item {j}",
+                weight_in_gms=10,
+                quantity=j + 1,
+            )
+            for i, order in enumerate(cls.orders[:-1])
+            for j in range(i + 1)
+        )
+
+    def test_jsonl_merges_lines_into_their_orders(self):
+        rows = [
+            json.loads(line)
+            for line in export_orders(Order.objects.all(), "jsonl", with_lines=True)
+        ]
+        self.assertEqual([row["id"] for row in rows], [o.pk for o in self.orders])
+        self.assertEqual([len(row["lines"]) for row in rows], [1, 2, 3, 4, 5, 0])
+        self.assertEqual(rows[1]["lines"][1]["quantity"], 2)
+
+    def test_filters_and_chunked_queries(self):
+        orders = Order.objects.matching(QueryDict("payment_method=COD"))
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(csv.reader(export_orders(orders, "csv", with_lines=True)))
+        # One read each for orders and lines, whatever the number of orders.
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(rows[0][0], "id")
+        # Orders 1 and 3 have 2 and 4 lines; order 5 has none but keeps a row.
+        self.assertEqual(len(rows) - 1, 2 + 4 + 1)
+        self.assertEqual({row[7] for row in rows[1:]}, {"COD"})
+
+    def test_view_and_command(self):
+        url = reverse("export_orders")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_user("vendor", is_staff=True))
+        response = self.client.get(url, {"format": "jsonl", "payment_method": "NETB"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual(len(body.splitlines()), 3)
+
+        out = io.StringIO()
+        call_command("export_orders", "--payment_method", "NETB", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+
+class ItemImportTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Chargers")
+        self.item = Item.objects.create(
+            name="Anker 20W",
+            category=self.category,
+            original_price=1499,
+            weight_in_gms=80,
+            stock_quantity=7,
+        )
+
+    def test_upserts_in_batches(self):
+        csv_file = io.StringIO(
+            "name,category,original_price,discount_price,weight_in_gms\n"
+            "Anker 20W,Chargers,1399,1299,80\n"
+            "Anker 65W,Chargers,3999,,150\n"
+            "Boat Rockerz,Headphones,2990,1499,170\n"
+            "Bad Row,Headphones,free,,170\n"
+            ",Headphones,100,,10\n"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = import_items(csv_file, batch_size=2)
+        self.assertEqual((result.created, result.updated), (2, 1))
+        self.assertEqual([line for line, _ in result.errors], [5, 6])
+        self.assertIn("original_price", result.errors[0][1])
+        # Two batches, each a handful of queries however many rows it holds.
+        self.assertLess(len(queries), 30)
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.discount_price, 1299)
+        # Columns missing from the file are left alone.
+        self.assertEqual(self.item.stock_quantity, 7)
+        self.assertTrue(Category.objects.filter(name="Headphones").exists())
+        self.assertEqual(Item.objects.count(), 3)
+        self.assertEqual(
+            set(
+                Item.objects.filter(pk__in=search_items("rocke")).values_list(
+                    "name", flat=True
+                )
+            ),
+            {"Boat Rockerz"},
+        )
+
+    def test_missing_columns(self):
+        with self.assertRaises(ValidationError):
+            import_items(io.StringIO("name,category\nAnker 20W,Chargers\n"))
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.clear()
+        category = Category.objects.create(name="Cables")
+        Item.objects.bulk_create(
+            Item(
+                name=f"Cable {i}",
+                category=category,
+                original_price=99,
+                weight_in_gms=20,
+            )
+            for i in range(5)
+        )
+
+    def test_server_timing_and_prometheus_summary(self):
+        response = self.client.get(reverse("all_items"))
+        self.assertRegex(response["Server-Timing"], r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("tpl;dur=", response["Server-Timing"])
+
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 302)
+        User.objects.create_superuser("vendor", "vendor@example.com", "secret")
+        self.client.login(username="vendor", password="secret")
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('gadgetify_request_queries_count{view="all_items"} 1', body)
+        self.assertIn(
+            'gadgetify_request_duration_seconds{view="all_items",quantile="0.99"}', body
+        )
+
+    def test_item_list_query_count_is_flat(self):
+        # Category names come from the same query as the items.
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("all_items"))
+        Item.objects.bulk_create(
+            Item(
+                name=f"Cable {i}",
+                category=Category.objects.create(name=f"Cables {i}"),
+                original_price=99,
+                weight_in_gms=20,
+            )
+            for i in range(5, 10)
+        )
+        with CaptureQueriesContext(connection) as more_queries:
+            self.client.get(reverse("all_items"))
+        self.assertEqual(len(queries), len(more_queries))
+
+    @override_settings(QUERY_BUDGETS={"all_items": 1})
+    def test_query_budget_alert(self):
+        with self.assertLogs("shoppingcart.metrics", "WARNING") as logs:
+            self.client.get(reverse("all_items"))
+        self.assertIn("all_items ran", logs.output[0])
+
+
+class BenchmarkTest(TestCase):
+    def test_generated_data_drives_every_scenario(self):
+        items = generate_catalog(3, 30, batch_size=7)
+        generate_orders(20, items, batch_size=7)
+        self.assertEqual(Item.objects.filter(category__name="Category 2").count(), 10)
+        self.assertEqual(Order.objects.filter(lines__isnull=True).count(), 0)
+        # Bulk-created rows are still indexed for search.
+        self.assertEqual(len(search_items("category", limit=100)), 30)
+
+        results = run_benchmarks(repeat=2)
+        self.assertEqual(len(results), 5)
+        for result in results:
+            self.assertEqual(result["status_codes"], [200], result["scenario"])
+        self.assertEqual(Order.objects.count(), 22)
+
+
+class CartApiTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Cases")
+        Item.objects.bulk_create(
+            Item(
+                name=f"Case {i}",
+                category=category,
+                original_price=500,
+                weight_in_gms=50,
+            )
+            for i in range(30)
+        )
+        self.items = list(Item.objects.order_by("pk"))
+        self.limited = self.items[0]
+        Item.objects.filter(pk=self.limited.pk).update(stock_quantity=1)
+
+    def post(self, changes):
+        return self.client.post(
+            reverse("cart_api"),
+            json.dumps({"items": changes}),
+            content_type="application/json",
+        )
+
+    def test_batch_update_query_count_is_flat(self):
+        # The first change also creates the session.
+        self.post({self.items[1].pk: 1})
+        with CaptureQueriesContext(connection) as small:
+            self.post({self.items[2].pk: 1})
+        with CaptureQueriesContext(connection) as large:
+            response = self.post({item.pk: 2 for item in self.items[3:]})
+        self.assertEqual(len(small), len(large))
+
+        data = response.json()
+        self.assertEqual(data["units"], 2 + 2 * 27)
+        self.assertEqual(data["subtotal"], 500 * 56)
+        self.assertEqual(self.client.get(reverse("cart_api")).json()["units"], 56)
+
+    def test_rejected_items_are_reported(self):
+        data = self.post(
+            {self.limited.pk: 2, self.items[1].pk: 3, 999999: 1, self.items[2].pk: 0}
+        ).json()
+        self.assertEqual(set(data["errors"]), {str(self.limited.pk), "999999"})
+        self.assertEqual(
+            [(line["item_pk"], line["quantity"]) for line in data["lines"]],
+            [(self.items[1].pk, 3)],
+        )
+        self.assertEqual(self.post({self.items[1].pk: 0}).json()["lines"], [])
+
+    def test_malformed_body(self):
+        response = self.client.post(
+            reverse("cart_api"), "not json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class JsonApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Speakers")
+        self.item = Item.objects.create(
+            name="JBL Go 3",
+            category=self.category,
+            original_price=2999,
+            discount_price=2499,
+            weight_in_gms=210,
+        )
+
+    def post_json(self, name, data):
+        return self.client.post(
+            reverse(name), json.dumps(data), content_type="application/json"
+        )
+
+    def test_catalog_conditional_get(self):
+        url = reverse("api_category_items", args=[self.category.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()["items"][0]["price"], 2499)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"catalog-'))
+        self.assertIn("Last-Modified", response)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        self.item.discount_price = 1999
+        self.item.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["items"][0]["price"], 1999)
+        self.assertEqual(
+            self.client.get(reverse("api_category_items", args=[0])).status_code, 404
+        )
+
+    def test_checkout_and_order_status(self):
+        self.post_json("cart_api", {"items": {self.item.pk: 2}})
+        response = self.post_json(
+            "api_checkout",
+            {
+                "customer_name": "Customer",
+                "customer_mobile_no": 9988776655,
+                "payment_method": "COD",
+                "delivery_option": "TKW",
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        order = response.json()
+        self.assertEqual(order["lines"][0]["quantity"], 2)
+        self.assertEqual(self.client.get(reverse("cart_api")).json()["lines"], [])
+
+        url = reverse("api_order_status", args=[order["id"]])
+        token = order["token"]
+        response = self.client.get(url, HTTP_X_ORDER_TOKEN=token)
+        self.assertEqual(response.json()["status"], "TRAN")
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                url, HTTP_X_ORDER_TOKEN=token, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+        Order.objects.filter(pk=order["id"]).change_status("COMP")
+        response = self.client.get(
+            url, HTTP_X_ORDER_TOKEN=token, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.json()["status"], "COMP")
+
+    def test_order_status_needs_the_orders_token(self):
+        order = Order(
+            customer_name="Customer",
+            customer_mobile_no=9988776655,
+            payment_method="COD",
+            delivery_option="TKW",
+        )
+        order.save({self.item.pk: 1})
+        url = reverse("api_order_status", args=[order.pk])
+        for headers in [
+            {},
+            {"HTTP_X_ORDER_TOKEN": "not-a-token"},
+            {"HTTP_X_ORDER_TOKEN": order_stream_token(order.pk + 1)},
+        ]:
+            response = self.client.get(url, {"phone_number": "9988776655"}, **headers)
+            self.assertEqual(response.status_code, 404)
+
+    def test_writes_must_be_json(self):
+        response = self.client.post(reverse("cart_api"), {"items": "1"})
+        self.assertEqual(response.status_code, 415)
+        response = self.post_json("api_checkout", {"customer_name": "Customer"})
+        self.assertEqual(response.status_code, 400)
+
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Power Banks")
+        self.item = Item.objects.create(
+            name="MI 10000mAh",
+            category=category,
+            original_price=1199,
+            weight_in_gms=350,
+            stock_quantity=5,
+        )
+        self.untracked = Item.objects.create(
+            name="MI 20000mAh",
+            category=category,
+            original_price=1999,
+            weight_in_gms=450,
+        )
+
+    def stock(self):
+        self.item.refresh_from_db()
+        return self.item.stock_quantity
+
+    def test_reservations_hold_and_release_stock(self):
+        reserve("alice", self.item.pk, 3)
+        self.assertEqual(self.stock(), 2)
+        with self.assertRaises(OutOfStock):
+            reserve("bob", self.item.pk, 3)
+        self.assertEqual(self.stock(), 2)
+
+        reserve("alice", self.item.pk, 1)
+        self.assertEqual(self.stock(), 4)
+        reserve("alice", self.item.pk, 0)
+        self.assertEqual(self.stock(), 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_checkout_consumes_holds_and_takes_the_rest(self):
+        reserve("alice", self.item.pk, 2)
+        with transaction.atomic():
+            commit("alice", {self.item.pk: 4, self.untracked.pk: 10})
+        self.assertEqual(self.stock(), 1)
+        self.assertFalse(StockReservation.objects.exists())
+
+        with self.assertRaises(OutOfStock), transaction.atomic():
+            commit("bob", {self.item.pk: 2, self.untracked.pk: 1})
+        self.assertEqual(self.stock(), 1)
+
+    def test_only_tracked_items_are_held_for_carts(self):
+        url = reverse("display_shopping_list", args=[self.item.category_id])
+        for item in (self.item, self.untracked):
+            self.client.post(url, {"item_pk": item.pk, "quantity": 2})
+        self.client.post(
+            reverse("cart_api"),
+            json.dumps({"items": {self.untracked.pk: 3}}),
+            content_type="application/json",
+        )
+        self.assertEqual(
+            list(StockReservation.objects.values_list("item_id", "quantity")),
+            [(self.item.pk, 2)],
+        )
+        self.assertEqual(self.stock(), 3)
+
+    def test_sweep_returns_expired_holds(self):
+        reserve("alice", self.item.pk, 2)
+        reserve("bob", self.item.pk, 1)
+        StockReservation.objects.filter(session_key="alice").update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(sweep_expired(), 1)
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(StockReservation.objects.get().session_key, "bob")
+
+
+class FlashSaleStressTest(TransactionTestCase):
+    STOCK = 10
+    BUYERS = 40
+    CHECKOUT_ATTEMPTS = 50
+
+    def setUp(self):
+        category = Category.objects.create(name="Flash Sale")
+        self.item = Item.objects.create(
+            name="OnePlus 7 Pro",
+            category=category,
+            original_price=52999,
+            discount_price=42999,
+            weight_in_gms=206,
+            stock_quantity=self.STOCK,
+        )
+
+    def checkout(self, buyer, results):
+        order = Order(
+            customer_name=f"Buyer {buyer}",
+            customer_mobile_no=9988776655,
+            payment_method="COD",
+            delivery_option="TKW",
+        )
+        cart = {self.item.pk: 1}
+        try:
+            for attempt in range(1, self.CHECKOUT_ATTEMPTS + 1):
+                try:
+                    with transaction.atomic():
+                        commit(f"buyer-{buyer}", cart)
+                        order.save(cart)
+                    results.append(True)
+                    return
+                except OutOfStock:
+                    results.append(False)
+                    return
+                except OperationalError:
+                    # SQLite reports lock contention instead of blocking
+                    time.sleep(min(0.01 * attempt, 0.1))
+            results.append(None)
+        finally:
+            connections.close_all()
+
+    def test_no_overselling_under_concurrent_checkouts(self):
+        results = []
+        threads = [
+            threading.Thread(target=self.checkout, args=(buyer, results))
+            for buyer in range(self.BUYERS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertNotIn(None, results, "a checkout never got the database lock")
+        self.item.refresh_from_db()
+        self.assertEqual(results.count(True), self.STOCK)
+        self.assertEqual(self.item.stock_quantity, 0)
+        self.assertEqual(Order.objects.count(), self.STOCK)
+
+
+class OrderEventStreamTest(TransactionTestCase):
+    def setUp(self):
+        self.order = Order(
+            customer_name="Customer",
+            customer_mobile_no=9988776655,
+            payment_method="COD",
+            delivery_option="TKW",
+        )
+        self.order.save({})
+        feed.interval = 0.01
+        self.addCleanup(setattr, feed, "interval", POLL_INTERVAL)
+        self.app = EventStreamRouter(None)
+
+    def open_stream(self, path, query=b"", headers=()):
+        """Start a GET on the router; returns the response message queue, a
+        callable that disconnects the client and the request task."""
+        sent = asyncio.Queue()
+        gone = asyncio.Event()
+
+        async def receive():
+            await gone.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query,
+            "headers": list(headers),
+        }
+        task = asyncio.ensure_future(self.app(scope, receive, sent.put))
+        return sent, gone.set, task
+
+    async def next_event(self, sent):
+        while True:
+            message = await asyncio.wait_for(sent.get(), 5)
+            body = message.get("body", b"").decode()
+            if body.startswith("event:"):
+                name, data = body.split("\n")[:2]
+                return name[len("event: ") :], json.loads(data[len("data: ") :])
+
+    def staff_cookie(self):
+        staff = User.objects.create_user("vendor", password="secret", is_staff=True)
+        self.client.force_login(staff)
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        return (b"cookie", f"{settings.SESSION_COOKIE_NAME}={session_key}".encode())
+
+    def token_query(self, order_id):
+        return urlencode({"token": order_stream_token(order_id)}).encode()
+
+    def test_vendor_feed_and_customer_status_stream(self):
+        sync = database_sync_to_async
+        staff_cookie = self.staff_cookie()
+
+        async def scenario():
+            vendor, disconnect_vendor, vendor_task = self.open_stream(
+                "/events/orders/", headers=[staff_cookie]
+            )
+            customer, _, customer_task = self.open_stream(
+                f"/events/orders/{self.order.pk}/", self.token_query(self.order.pk)
+            )
+            self.assertEqual((await customer.get())["status"], 200)
+            self.assertEqual(
+                await self.next_event(customer),
+                ("status", {"type": "status", "id": self.order.pk, "status": "TRAN"}),
+            )
+            # Let the feed read its starting point before anything changes.
+            await asyncio.sleep(0.1)
+
+            new_order = Order(
+                customer_name="Another",
+                customer_mobile_no=9988776600,
+                payment_method="COD",
+                delivery_option="TKW",
+            )
+            await sync(new_order.save)({})
+            name, data = await self.next_event(vendor)
+            self.assertEqual((name, data["id"]), ("order", new_order.pk))
+
+            await sync(Order.objects.filter(pk=self.order.pk).change_status)("COMP")
+            name, data = await self.next_event(customer)
+            self.assertEqual((name, data["status"]), ("status", "COMP"))
+            # The customer stream ends on a final status.
+            await asyncio.wait_for(customer_task, 5)
+            self.assertEqual((await self.next_event(vendor))[1]["status"], "COMP")
+
+            disconnect_vendor()
+            await asyncio.wait_for(vendor_task, 5)
+            self.assertEqual(feed.subscribers, set())
+
+            for query in [b"token=forged", self.token_query(self.order.pk + 1)]:
+                missing, _, task = self.open_stream(
+                    f"/events/orders/{self.order.pk}/", query
+                )
+                await task
+                self.assertEqual((await missing.get())["status"], 404)
+
+            anonymous, _, task = self.open_stream("/events/orders/")
+            await task
+            self.assertEqual((await anonymous.get())["status"], 403)
+
+        asyncio.run(scenario())
+
+    def test_first_subscriber_sees_changes_right_after_subscribing(self):
+        sync = database_sync_to_async
+
+        async def scenario():
+            queue = await feed.subscribe()
+            try:
+                # No wait for the feed here: subscribe has primed it.
+                await sync(Order.objects.filter(pk=self.order.pk).change_status)("CANC")
+                change = await asyncio.wait_for(queue.get(), 5)
+                self.assertEqual(
+                    (change["id"], change["status"]), (self.order.pk, "CANC")
+                )
+            finally:
+                feed.unsubscribe(queue)
+
+        asyncio.run(scenario())
+
+
+@task(name="shoppingcart.tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("Task failed")
+
+
+class WorkerTest(TestCase):
+    def setUp(self):
+        self.item = Item.objects.create(
+            name="JBL Go 3",
+            category=Category.objects.create(name="Speakers"),
+            original_price=2999,
+            discount_price=2499,
+            weight_in_gms=210,
+        )
+        self.invoice_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.invoice_directory.cleanup)
+
+    def checkout(self):
+        self.client.post(
+            reverse("cart_api"),
+            json.dumps({"items": {self.item.pk: 2}}),
+            content_type="application/json",
+        )
+        response = self.client.post(
+            reverse("api_checkout"),
+            json.dumps(
+                {
+                    "customer_name": "Customer",
+                    "customer_mobile_no": 9988776655,
+                    "payment_method": "COD",
+                    "delivery_option": "TKW",
+                }
+            ),
+            content_type="application/json",
+        )
+        return Order.objects.get(pk=response.json()["id"])
+
+    def test_checkout_work_runs_in_worker(self):
+        order = self.checkout()
+        self.assertEqual(
+            set(Task.objects.filter(status=Task.QUEUED).values_list("name", flat=True)),
+            {
+                write_invoice.task_name,
+                notify_order_placed.task_name,
+                update_sales_rollups.task_name,
+                update_item_pairs.task_name,
+            },
+        )
+
+        received = []
+
+        def receiver(sender, order, **kwargs):
+            received.append(order.pk)
+
+        order_placed.connect(receiver)
+        self.addCleanup(order_placed.disconnect, receiver)
+        with override_settings(INVOICE_DIRECTORY=self.invoice_directory.name):
+            self.assertEqual(run_pending(), 4)
+        self.assertEqual(received, [order.pk])
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
+
+        path = os.path.join(self.invoice_directory.name, f"order_{order.pk}.json")
+        with open(path) as f:
+            invoice = json.load(f)
+        self.assertEqual(invoice[0], {"order_id": order.pk})
+        self.assertEqual(invoice[1]["pk"], self.item.pk)
+        self.assertEqual(invoice[1]["quantity"], 2)
+
+    def test_status_change_is_queued(self):
+        order = self.checkout()
+        Order.objects.filter(pk=order.pk).change_status("COMP")
+        queued = Task.objects.get(name=notify_status_changed.task_name)
+        self.assertEqual(
+            json.loads(queued.payload), {"order_ids": [order.pk], "status": "COMP"}
+        )
+
+    def test_failing_task_is_retried_then_failed(self):
+        failing = enqueue(fail)
+        self.assertEqual(run_pending(), 1)
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, Task.QUEUED)
+        self.assertGreater(failing.run_at, timezone.now())
+        self.assertIn("Task failed", failing.last_error)
+
+        # Not due until the backoff has passed.
+        self.assertEqual(run_pending(), 0)
+        Task.objects.filter(pk=failing.pk).update(run_at=timezone.now())
+        self.assertEqual(run_pending(), 1)
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, Task.FAILED)
+        self.assertEqual(failing.attempts, 2)
+
+        call_command("run_worker", "--retry-failed", stdout=io.StringIO())
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Task.QUEUED, 0))
+
+    def test_expired_lease_is_claimed_again(self):
+        queued = enqueue(sweep_reservations)
+        self.assertEqual(claim(), [queued])
+        # Held by a live worker.
+        self.assertEqual(claim(), [])
+
+        Task.objects.filter(pk=queued.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        call_command("run_worker", "--once", "--sweep-interval=0", stdout=io.StringIO())
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Task.DONE, 2))
+
+    def test_enqueue_once_and_status(self):
+        enqueue_once(sweep_reservations)
+        enqueue_once(sweep_reservations)
+        self.assertEqual(Task.objects.count(), 1)
+
+        out = io.StringIO()
+        call_command("run_worker", "--status", stdout=out)
+        self.assertIn(sweep_reservations.task_name, out.getvalue())
+
+
+class SalesRollupTest(TestCase):
+    def setUp(self):
+        self.phones = Category.objects.create(name="Phones")
+        self.speakers = Category.objects.create(name="Speakers")
+        self.phone = Item.objects.create(
+            name="Phone",
+            category=self.phones,
+            original_price=1000,
+            discount_price=900,
+            weight_in_gms=200,
+        )
+        self.speaker = Item.objects.create(
+            name="Speaker",
+            category=self.speakers,
+            original_price=500,
+            weight_in_gms=300,
+        )
+
+    def order(self, cart, payment_method="COD"):
+        order = Order(
+            customer_name="Customer",
+            customer_mobile_no=9988776655,
+            payment_method=payment_method,
+            delivery_option="TKW",
+        )
+        order.save(cart)
+        return order
+
+    def rollup(self, dimension, key="", period=SalesRollup.DAY):
+        return SalesRollup.objects.get(period=period, dimension=dimension, key=key)
+
+    def rollup_rows(self):
+        return sorted(
+            SalesRollup.objects.values_list(
+                "period",
+                "period_start",
+                "dimension",
+                "key",
+                "label",
+                *SalesRollup.AMOUNT_FIELDS,
+            )
+        )
+
+    def test_item_revenue_reconciles_with_promotional_orders(self):
+        # The promotion index is cached outside the test transaction.
+        cache.clear()
+        self.addCleanup(cache.clear)
+        phone_sale = Promotion.objects.create(
+            name="Phone sale", kind=Promotion.PERCENT_OFF, percent=10
+        )
+        phone_sale.categories.add(self.phones)
+        Promotion.objects.create(
+            name="Spend 1000, save 100",
+            kind=Promotion.CART_THRESHOLD,
+            minimum_total=1000,
+            amount_off=100,
+        )
+        order = self.order({self.phone.pk: 2, self.speaker.pk: 1})
+        update_rollups([order.pk])
+
+        total = self.rollup(SalesRollup.TOTAL)
+        items = [
+            self.rollup(SalesRollup.ITEM, str(item.pk))
+            for item in (self.phone, self.speaker)
+        ]
+        categories = [
+            self.rollup(SalesRollup.CATEGORY, str(category.pk))
+            for category in (self.phones, self.speakers)
+        ]
+        self.assertEqual(total.revenue, order.subtotal)
+        self.assertEqual(total.revenue + total.tax + total.shipping, order.payable)
+        for rows in (items, categories):
+            self.assertEqual(sum(row.revenue for row in rows), total.revenue)
+            self.assertEqual(sum(row.savings for row in rows), total.savings)
+
+    def test_orders_are_added_once_and_cancellations_reversed(self):
+        first = self.order({self.phone.pk: 2, self.speaker.pk: 1})
+        second = self.order({self.phone.pk: 1}, payment_method="NETB")
+        self.assertEqual(update_rollups([first.pk, second.pk]), 2)
+        self.assertEqual(update_rollups([first.pk, second.pk]), 0)
+
+        for period in (SalesRollup.HOUR, SalesRollup.DAY):
+            total = self.rollup(SalesRollup.TOTAL, period=period)
+            self.assertEqual((total.orders, total.units), (2, 4))
+            self.assertEqual(total.revenue, first.subtotal + second.subtotal)
+            self.assertEqual(total.tax, round(first.tax + second.tax, 2))
+        phone = self.rollup(SalesRollup.ITEM, str(self.phone.pk))
+        self.assertEqual((phone.label, phone.orders, phone.units), ("Phone", 2, 3))
+        self.assertEqual((phone.revenue, phone.savings), (2700, 300))
+        speakers = self.rollup(SalesRollup.CATEGORY, str(self.speakers.pk))
+        self.assertEqual((speakers.label, speakers.revenue), ("Speakers", 500))
+        self.assertEqual(self.rollup(SalesRollup.PAYMENT_METHOD, "COD").orders, 1)
+
+        Order.objects.filter(pk=first.pk).change_status("CANC")
+        run_pending()
+        total = self.rollup(SalesRollup.TOTAL)
+        self.assertEqual((total.orders, total.revenue), (1, second.subtotal))
+        self.assertEqual(self.rollup(SalesRollup.ITEM, str(self.phone.pk)).units, 1)
+        # Rows left without orders are removed.
+        self.assertFalse(
+            SalesRollup.objects.filter(
+                dimension=SalesRollup.CATEGORY, key=str(self.speakers.pk)
+            ).exists()
+        )
+
+    def test_rebuild_matches_incremental_updates(self):
+        orders = [
+            self.order({self.phone.pk: 1}),
+            self.order({self.speaker.pk: 3}, payment_method="CCARD"),
+            self.order({self.phone.pk: 2, self.speaker.pk: 2}),
+        ]
+        update_rollups([order.pk for order in orders])
+        Order.objects.filter(pk=orders[1].pk).change_status("CANC")
+        update_rollups([orders[1].pk])
+        incremental = self.rollup_rows()
+
+        call_command("rebuild_sales_rollups", stdout=io.StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+        self.assertEqual(
+            list(
+                Order.objects.order_by("pk").values_list("in_sales_rollups", flat=True)
+            ),
+            [True, False, True],
+        )
+
+    def test_dashboard_reads_only_rollups(self):
+        order = self.order({self.phone.pk: 1, self.speaker.pk: 1})
+        update_rollups([order.pk])
+        self.client.force_login(User.objects.create_user("vendor", is_staff=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("sales_dashboard"), {"period": "hour"})
+        self.assertContains(response, "Speakers")
+        self.assertEqual(response.context["totals"]["total_orders"], 1)
+        self.assertEqual(response.context["top_items"][0]["name"], "Phone")
+        tables = " ".join(query["sql"] for query in queries)
+        self.assertNotIn("shoppingcart_order", tables)
+        self.assertNotIn("shoppingcart_item", tables)
+
+
+class RecommendationTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Audio")
+        self.a, self.b, self.c, self.d = [
+            Item.objects.create(
+                name=name,
+                category=category,
+                original_price=100,
+                weight_in_gms=100,
+            )
+            for name in ("Amp", "Bass", "Cable", "Deck")
+        ]
+
+    def order(self, *items):
+        order = Order(
+            customer_name="Customer",
+            customer_mobile_no=9988776655,
+            payment_method="COD",
+            delivery_option="TKW",
+        )
+        order.save({item.pk: 1 for item in items})
+        return order
+
+    def pair_rows(self):
+        return sorted(ItemPair.objects.values_list("item_id", "other_id", "count"))
+
+    def test_rebuild_and_incremental_counts_agree(self):
+        self.order(self.a, self.b)
+        self.order(self.a, self.b, self.c)
+        self.order(self.a, self.d)
+        call_command("rebuild_item_pairs", stdout=io.StringIO())
+        self.assertEqual(ItemPair.objects.count(), 8)
+        self.assertEqual(recommend([self.a.pk]), [self.b.pk, self.c.pk, self.d.pk])
+
+        order = self.order(self.c, self.d, self.b)
+        self.assertTrue(add_order_pairs(order.pk))
+        self.assertFalse(add_order_pairs(order.pk))
+        incremental = self.pair_rows()
+        rebuild_pairs()
+        self.assertEqual(self.pair_rows(), incremental)
+        # The cart's own items are never recommended.
+        self.assertEqual(recommend([self.a.pk, self.b.pk], k=2), [self.c.pk, self.d.pk])
+
+    def test_cached_neighbours_are_dropped_on_change(self):
+        add_order_pairs(self.order(self.a, self.b).pk)
+        self.assertEqual(recommend([self.a.pk]), [self.b.pk])
+        with self.assertNumQueries(0):
+            recommend([self.a.pk])
+
+        add_order_pairs(self.order(self.a, self.c).pk)
+        add_order_pairs(self.order(self.a, self.c).pk)
+        self.assertEqual(recommend([self.a.pk]), [self.c.pk, self.b.pk])
+
+    def test_shopping_list_widget_and_api(self):
+        add_order_pairs(self.order(self.a, self.b).pk)
+        self.client.post(
+            reverse("cart_api"),
+            json.dumps({"items": {self.a.pk: 1}}),
+            content_type="application/json",
+        )
+        url = reverse("display_shopping_list", args=[self.a.category_id])
+        response = self.client.get(url)
+        self.assertEqual(list(response.context["recommendations"]), [self.b])
+        self.assertContains(response, "Frequently bought together")
+
+        Item.objects.filter(pk=self.b.pk).update(available=False)
+        self.assertEqual(list(self.client.get(url).context["recommendations"]), [])
+
+        response = self.client.get(reverse("api_related_items", args=[self.b.pk]))
+        self.assertEqual(response.json()["items"][0]["name"], "Amp")
+        response = self.client.get(reverse("api_related_items", args=[0]))
+        self.assertEqual(response.status_code, 404)
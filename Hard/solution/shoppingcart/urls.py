@@ -1,6 +1,6 @@
 from django.urls import path
 
-from shoppingcart import views
+from shoppingcart import api, views
 
 urlpatterns = [
     path("", views.index, name="index"),
@@ -11,8 +11,24 @@ urlpatterns = [
         views.display_shopping_list,
         name="display_shopping_list",
     ),
+    path("search/", views.search, name="search"),
+    path("api/categories/", api.categories_api, name="api_categories"),
+    path(
+        "api/categories/<int:category_id>/items/",
+        api.category_items_api,
+        name="api_category_items",
+    ),
+    path(
+        "api/items/<int:item_id>/related/",
+        api.related_items_api,
+        name="api_related_items",
+    ),
+    path("api/cart/", api.cart_api, name="cart_api"),
+    path("api/checkout/", api.checkout_api, name="api_checkout"),
+    path("api/orders/<int:order_id>/", api.order_status_api, name="api_order_status"),
     path("order/", views.create_order, name="create_order"),
     path("create_item/", views.create_item, name="create_item"),
+    path("import_items/", views.import_items, name="import_items"),
     path("edit_category/<int:category_id>/", views.edit_category, name="edit_category"),
     path(
         "edit_category/<int:category_id>/delete",
@@ -23,8 +39,12 @@ urlpatterns = [
     path("edit_item/<int:item_id>/", views.edit_item, name="edit_item"),
     path("edit_item/<int:item_id>/delete", views.delete_item, name="delete_item"),
     path("all_orders/", views.show_all_orders, name="all_orders"),
+    path("all_orders/status/", views.bulk_order_status, name="bulk_order_status"),
+    path("all_orders/export/", views.export_orders, name="export_orders"),
     path("all_items/", views.show_all_items, name="all_items"),
     path("all_categories/", views.show_all_categories, name="all_categories"),
     path("vendor/", views.vendor, name="vendor"),
+    path("vendor/metrics/", views.show_metrics, name="metrics"),
+    path("vendor/sales/", views.sales_dashboard, name="sales_dashboard"),
     path("status/", views.get_order_status, name="order_status"),
 ]
@@ -1,11 +1,17 @@
+from gadgetify.delivery import DeliveryTariff
+
 shop_details = {
     "shopName": "GadgetifyWithGSBlr",
     "shopAddress": "311/5 Akshay nagar, Bangalore, Karnataka, India",
     "shopContactNumber": "+91 9988776655",
 }
-delivery_cost = {
-    range(0, 6): 0,
-    range(6, 21): 30,
-    range(21, 51): 60,
-}
+# Default (distance up to km, charge in rupees) tiers, used until the vendor
+# configures DeliveryTier rows
+delivery_cost = DeliveryTariff(
+    [
+        (5, 0),
+        (20, 30),
+        (50, 60),
+    ]
+)
 order_directory = "shoppingcart/order_invoices/"
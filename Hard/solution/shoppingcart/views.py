@@ -1,24 +1,40 @@
-from datetime import datetime
+import io
 
 from django.contrib import messages
-from django.core.exceptions import ObjectDoesNotExist
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
-
+from django.views.decorators.http import require_POST
+
+from gadgetify.pricing import to_rupees
+from shoppingcart.analytics import DASHBOARD_PERIODS, sales_summary
+from shoppingcart.catalog import get_categories, get_category_items
+from shoppingcart.checkout import place_order
+from shoppingcart.exports import EXPORT_FORMATS
+from shoppingcart.exports import export_orders as export_order_rows
 from shoppingcart.forms import CategoryForm, ItemForm, OrderForm
-from shoppingcart.models import Category, Item, Order
+from shoppingcart.imports import IMPORT_COLUMNS
+from shoppingcart.imports import import_items as import_item_rows
+from shoppingcart.metrics import metrics
+from shoppingcart.models import Category, Item, Order, SalesRollup
+from shoppingcart.pagination import KeysetPaginator
+from shoppingcart.recommendations import recommended_items
+from shoppingcart.search import filter_categories, filter_items, search_items
+from shoppingcart.stock import OutOfStock, release, reserve
+from shoppingcart.streams import order_stream_token
 from shoppingcart.utilities import shop_details
 
-cart = dict()
-
 
 def index(request):
     return render(request, "index.html")
 
 
 def clear_cart(request):
-    if cart:
-        cart.clear()
+    if request.cart:
+        release(request.cart.session_key)
+        request.cart.clear()
         messages.info(request, "Cart cleared! Add more items")
         return redirect(reverse("categories"))
     else:
@@ -27,7 +43,7 @@ def clear_cart(request):
 
 
 def display_categories(request):
-    categories = Category.objects.all()
+    categories = get_categories()
     return render(request, "categories.html", context={"categories": categories},)
 
 
@@ -36,18 +52,37 @@ def display_shopping_list(request, category):
         item_id = request.POST.get("item_pk")
         quantity = int(request.POST.get("quantity"))
         new_item = Item.objects.get(pk=item_id)
-        if quantity == 0:
-            if cart.get(new_item):
-                del cart[new_item]
-        else:
-            cart[new_item] = quantity
+        # Untracked items can't run out, so there's nothing to hold.
+        if new_item.stock_quantity is not None:
+            try:
+                reserve(request.cart.session_key, new_item.pk, quantity)
+            except OutOfStock:
+                messages.error(request, f"Not enough {new_item.name} in stock")
+                return redirect("display_shopping_list", category=category)
+        request.cart.set(new_item.pk, quantity)
         messages.success(request, f"Item {new_item.name} updated")
         return redirect("display_shopping_list", category=category)
-    shopping_list = Item.objects.filter(category=category)
+    shopping_list = get_category_items(category)
     return render(
         request,
         "shopping_list.html",
-        context={"shopping_list": shopping_list, "cart": cart},
+        context={
+            "shopping_list": shopping_list,
+            "cart": request.cart,
+            "recommendations": recommended_items(list(request.cart)),
+        },
+    )
+
+
+def search(request):
+    query = request.GET.get("q", "").strip()
+    results = []
+    if query:
+        item_ids = search_items(query)
+        items = Item.objects.select_related("category").in_bulk(item_ids)
+        results = [items[item_id] for item_id in item_ids if item_id in items]
+    return render(
+        request, "search_results.html", context={"query": query, "results": results}
     )
 
 
@@ -56,52 +91,101 @@ def vendor(request):
     return render(request, "vendor/vendor_main.html")
 
 
+@staff_member_required
+def show_metrics(request):
+    return HttpResponse(
+        metrics.to_prometheus(), content_type="text/plain; version=0.0.4"
+    )
+
+
+@staff_member_required
+def sales_dashboard(request):
+    period = request.GET.get("period")
+    if period not in DASHBOARD_PERIODS:
+        period = SalesRollup.DAY
+    return render(
+        request,
+        "vendor/sales_dashboard.html",
+        context={
+            "period": period,
+            "periods": SalesRollup.PERIODS,
+            **sales_summary(period),
+        },
+    )
+
+
 # ----------Order "R" (Vendor)----------
 
+ORDER_SORT_FIELDS = ("pk", "billing_date_time", "order_modified", "customer_name")
+
 
 def show_all_orders(request):
     if request.method == "POST":
         new_status = request.POST.get("new_status")
         order_id = request.POST.get("order_id")
         if new_status and order_id:
-            order = Order.objects.filter(pk=order_id).update(
-                order_status=new_status, order_modified=datetime.now()
+            changed = Order.objects.filter(pk=order_id).change_status(
+                new_status, source="vendor"
             )
+            if not changed:
+                messages.error(request, f"Order {order_id} can't be changed")
         return redirect(reverse("all_orders"))
     if request.method == "GET":
-        order_by = request.GET.get("order_by", "-billing_date_time")
-        choices = {}
-        filter_fields = []
-        for field in Order._meta.fields:
-            if field.choices:
-                filter_fields.append(field.attname)
-                choices[field.name] = field.choices
-
-        params = {}
-        for field_name in filter_fields:
-            val = request.GET.get(field_name)
-            if val:
-                params[field_name] = val
-
-        if any(params.values()):
-            orders = Order.objects.filter(**params)
-        else:
-            orders = Order.objects.all()
-        search = request.GET.get("q")
-        if search:
-            orders = orders.filter(pk=search)
-        orders_sorted = orders.order_by(order_by)
+        choices = Order.get_filter_choices()
+        orders = Order.objects.matching(request.GET)
+        page = KeysetPaginator(
+            orders, ORDER_SORT_FIELDS, "-billing_date_time"
+        ).paginate(request.GET)
 
         context = {
             "choices": choices,
-            "orders": orders_sorted,
+            "orders": page,
+            "page": page,
             "statuses": choices["order_status"],
+            "status_names": dict(choices["order_status"]),
+            "filters": request.GET.urlencode(),
         }
         return render(request, "vendor/all_orders.html", context)
 
 
+@staff_member_required
+@require_POST
+def bulk_order_status(request):
+    new_status = request.POST.get("new_status")
+    filters = request.POST.get("filters", "")
+    all_orders_url = reverse("all_orders") + (f"?{filters}" if filters else "")
+    if not new_status:
+        messages.error(request, "Select a new status")
+        return redirect(all_orders_url)
+    if request.POST.get("apply_to") == "filter":
+        orders = Order.objects.matching(QueryDict(filters))
+    else:
+        order_ids = [pk for pk in request.POST.getlist("order_ids") if pk.isdigit()]
+        orders = Order.objects.filter(pk__in=order_ids)
+    changed = orders.change_status(new_status, source="bulk")
+    status_name = dict(Order.ORDER_STATUSES).get(new_status, new_status)
+    messages.success(request, f"{len(changed)} orders marked as {status_name}")
+    return redirect(all_orders_url)
+
+
+@staff_member_required
+def export_orders(request):
+    export_format = request.GET.get("format")
+    if export_format not in EXPORT_FORMATS:
+        export_format = "csv"
+    orders = Order.objects.matching(request.GET)
+    response = StreamingHttpResponse(
+        export_order_rows(orders, export_format, bool(request.GET.get("lines"))),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="orders.{export_format}"'
+    return response
+
+
 # ----------Item "CRUD" (Vendor)----------
 
+ITEM_SORT_FIELDS = ("pk", "name", "original_price", "discount_price", "weight_in_gms")
+
 
 def create_item(request):
     if request.method == "POST":
@@ -125,9 +209,29 @@ def create_item(request):
     )
 
 
+IMPORT_ERRORS_SHOWN = 100
+
+
+@staff_member_required
+def import_items(request):
+    context = {"columns": IMPORT_COLUMNS}
+    if request.method == "POST" and "file" in request.FILES:
+        csv_file = io.TextIOWrapper(request.FILES["file"], encoding="utf-8-sig")
+        try:
+            result = import_item_rows(csv_file)
+        except ValidationError as e:
+            messages.error(request, " ".join(e.messages))
+        except UnicodeDecodeError:
+            messages.error(request, "Upload a UTF-8 encoded CSV file")
+        else:
+            messages.success(request, "Items Imported")
+            context["result"] = result
+            context["errors"] = result.errors[:IMPORT_ERRORS_SHOWN]
+    return render(request, "vendor/import_items.html", context)
+
+
 def show_all_items(request):
     if request.method == "GET":
-        order_by = request.GET.get("order_by", "-pk")
         category_id = request.GET.get("category_id")
         choices = {}
         filter_fields = []
@@ -160,13 +264,15 @@ def show_all_items(request):
             items = Item.objects.filter(category__id=category_id)
         else:
             items = Item.objects.all()
+        items = items.select_related("category")
         search = request.GET.get("q")
         if search:
-            items = items.filter(name__contains=search)
-        items_sorted = items.order_by(order_by)
+            items = filter_items(items, search)
+        page = KeysetPaginator(items, ITEM_SORT_FIELDS, "-pk").paginate(request.GET)
         context = {
             "choices": choices,
-            "items": items_sorted,
+            "items": page,
+            "page": page,
         }
         return render(request, "vendor/all_items.html", context)
 
@@ -186,7 +292,11 @@ def edit_item(request, item_id):
     if request.method == "POST":
         form = ItemForm(request.POST, instance=ins)
         if form.is_valid():
-            item = form.save()
+            # Write only what the vendor changed, so a stale form can't
+            # overwrite stock taken by concurrent checkouts.
+            item = form.save(commit=False)
+            if form.changed_data:
+                item.save(update_fields=form.changed_data)
             messages.success(request, "Item Edited")
             return redirect(reverse("all_items"))
         else:
@@ -232,7 +342,7 @@ def show_all_categories(request):
     if request.method == "GET":
         search = request.GET.get("q")
         if search:
-            categories = Category.objects.filter(name__contains=search)
+            categories = filter_categories(Category.objects.all(), search)
         else:
             categories = Category.objects.all()
         context = {
@@ -280,12 +390,14 @@ def edit_category(request, category_id):
 def create_order(request):
     if request.method == "POST":
         form = OrderForm(request.POST)
-        if cart:
+        if request.cart:
             if form.is_valid():
                 order = form.save(commit=False)
-                order.order_status = "TRAN"
-                order.save(cart)
-                cart.clear()
+                try:
+                    place_order(order, request.cart)
+                except OutOfStock:
+                    messages.error(request, "Some items in the cart are out of stock")
+                    return redirect(reverse("create_order"))
                 return render(
                     request,
                     "display_bill.html",
@@ -301,8 +413,22 @@ def create_order(request):
     else:
         form = OrderForm()
 
+    cart = request.cart.get_items()
+    quote = Order.get_pricing_engine().quote(
+        item.price_line(quantity) for item, quantity in cart.items()
+    )
     return render(
-        request, "create_order.html", context={"cart": dict(cart), "form": form},
+        request,
+        "create_order.html",
+        context={
+            "cart": cart,
+            "form": form,
+            "quote": quote.rupees(),
+            "promotions": [
+                (rule.name, to_rupees(discount))
+                for rule, discount in quote.applied.items()
+            ],
+        },
     )
 
 
@@ -313,13 +439,19 @@ def get_order_status(request):
         order_id = request.POST.get("order_id")
         phone_number = request.POST.get("phone_number")
         try:
+            # Lines are only read when the cached bill fragment is missing.
             queried_order = Order.objects.get(
                 pk=order_id, customer_mobile_no=phone_number
             )
             return render(
                 request,
                 "display_bill.html",
-                context={"order": queried_order, **shop_details, "status_check": True},
+                context={
+                    "order": queried_order,
+                    **shop_details,
+                    "status_check": True,
+                    "stream_token": order_stream_token(queried_order.pk),
+                },
             )
         except ObjectDoesNotExist:
             messages.error(request, "Order Not Found")
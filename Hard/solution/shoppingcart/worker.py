@@ -0,0 +1,152 @@
+"""Database-backed task queue for work that doesn't belong in a request.
+
+Tasks are plain functions registered with ``@task``. ``enqueue`` inserts a
+``Task`` row in the caller's transaction, so work queued during checkout
+exists exactly when the order does. ``run_worker`` claims due tasks with a
+conditional UPDATE and a lease; a task whose worker dies is claimed again
+once its lease runs out, so every task runs at least once and must be safe
+to repeat. Failures are retried with exponential backoff.
+"""
+
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from shoppingcart.models import Task
+
+logger = logging.getLogger(__name__)
+
+TASK_LEASE = timedelta(minutes=5)
+RETRY_BASE_DELAY = 10
+RETRY_MAX_DELAY = 60 * 60
+CLAIM_BATCH_SIZE = 20
+
+registry = {}
+
+
+def task(func=None, *, name=None, max_attempts=5):
+    """Register ``func`` as a task, run by name as ``func(**payload)``."""
+
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        registry[task_name] = (func, max_attempts)
+        func.task_name = task_name
+        return func
+
+    if func is not None:
+        return register(func)
+    return register
+
+
+def build_task(func, delay=0, **kwargs):
+    _, max_attempts = registry[func.task_name]
+    return Task(
+        name=func.task_name,
+        payload=json.dumps(kwargs),
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue(func, delay=0, **kwargs):
+    """Queue ``func(**kwargs)`` to run in a worker ``delay`` seconds from
+    now. The keyword arguments must be JSON-serializable."""
+    queued = build_task(func, delay, **kwargs)
+    queued.save()
+    return queued
+
+
+def enqueue_many(calls):
+    """Queue several ``(func, kwargs)`` calls with one INSERT."""
+    return Task.objects.bulk_create(
+        build_task(func, **kwargs) for func, kwargs in calls
+    )
+
+
+def enqueue_once(func, **kwargs):
+    """Queue ``func(**kwargs)`` unless an identical call is already waiting."""
+    waiting = Task.objects.filter(
+        name=func.task_name, payload=json.dumps(kwargs), status=Task.QUEUED
+    )
+    if not waiting.exists():
+        return enqueue(func, **kwargs)
+
+
+def due_tasks(now):
+    return Task.objects.filter(
+        Q(status=Task.QUEUED, run_at__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim(limit=CLAIM_BATCH_SIZE):
+    """Lease up to ``limit`` due tasks for this worker.
+
+    Each task is claimed with an UPDATE conditioned on the state it was read
+    in, so two workers never run the same lease.
+    """
+    now = timezone.now()
+    candidates = (
+        due_tasks(now)
+        .order_by("run_at")
+        .values_list("pk", "status", "locked_until")[:limit]
+    )
+    claimed = []
+    for pk, status, locked_until in candidates:
+        updated = Task.objects.filter(
+            pk=pk, status=status, locked_until=locked_until
+        ).update(
+            status=Task.RUNNING,
+            locked_until=now + TASK_LEASE,
+            attempts=F("attempts") + 1,
+        )
+        if updated:
+            claimed.append(pk)
+    return list(Task.objects.filter(pk__in=claimed).order_by("run_at"))
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def run_task(queued):
+    """Run a claimed task and record how it went. Returns True on success."""
+    entry = registry.get(queued.name)
+    now = timezone.now()
+    try:
+        if entry is None:
+            raise LookupError(f"No task registered as {queued.name!r}")
+        func, _ = entry
+        with transaction.atomic():
+            func(**json.loads(queued.payload))
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("%s failed (attempt %d)", queued, queued.attempts)
+        if queued.attempts < queued.max_attempts:
+            changes = {
+                "status": Task.QUEUED,
+                "run_at": now + timedelta(seconds=retry_delay(queued.attempts)),
+            }
+        else:
+            changes = {"status": Task.FAILED, "finished": now}
+        Task.objects.filter(pk=queued.pk).update(
+            locked_until=None, last_error=error, **changes
+        )
+        return False
+    Task.objects.filter(pk=queued.pk).update(
+        status=Task.DONE, locked_until=None, finished=now
+    )
+    return True
+
+
+def run_pending(limit=CLAIM_BATCH_SIZE):
+    """Claim and run one batch of due tasks. Returns how many ran."""
+    tasks = claim(limit)
+    for queued in tasks:
+        run_task(queued)
+    return len(tasks)
@@ -1,6 +1,6 @@
 import datetime
 import os
-from collections import defaultdict, namedtuple
+from collections import namedtuple
 
 from flask import (
     Flask,
@@ -9,15 +9,24 @@ from flask import (
     redirect,
     render_template,
     request,
+    session,
     url_for,
 )
 
-from utilities import delivery_cost, shop_details, shopping_list
+from utilities import (
+    delivery_cost,
+    price_line,
+    pricing,
+    shop_details,
+    shopping_list,
+    to_paise,
+)
 
 app = Flask(__name__)
-app.secret_key = os.urandom(12)
+# The cart lives in the signed session cookie, so every worker process must
+# share the same secret key for carts to survive across processes.
+app.secret_key = os.environ.get("SECRET_KEY") or os.urandom(12)
 
-cart = defaultdict(int)
 Item = namedtuple(
     "Item", ["item_name", "final_price_per_item", "amount_saved_per_item"]
 )
@@ -28,12 +37,51 @@ def hello_world():
     return render_template("index.html")
 
 
-@app.route("/add_to_cart", methods=["POST"])
-def add_to_cart():
-    form_id = request.form["id"]
-    item_name = form_id.lstrip("quantity_")
-    quantity = int(request.form["quantity"])
+@app.route("/api/cart", methods=["GET", "POST"])
+def cart_api():
+    """Read the cart, or set many quantities at once from a JSON body like
+    {"items": {"<item name>": <quantity>, ...}}; a quantity of 0 removes the
+    item. Unknown items are left out and listed in "errors"."""
+    stored_cart = session.get("cart", {})
+    errors = {}
+    if request.method == "POST":
+        payload = request.get_json(silent=True) or {}
+        changes = payload.get("items")
+        if not isinstance(changes, dict):
+            return (
+                jsonify({"error": 'Expected {"items": {"<item name>": <quantity>}}'}),
+                400,
+            )
+        for item_name, quantity in changes.items():
+            if item_name not in shopping_list:
+                errors[item_name] = "Item not found"
+                continue
+            try:
+                quantity = int(quantity)
+            except (TypeError, ValueError):
+                errors[item_name] = "Quantity must be a number"
+                continue
+            if quantity > 0:
+                stored_cart[item_name] = quantity
+            else:
+                stored_cart.pop(item_name, None)
+        session["cart"] = stored_cart
+
+    cart = get_cart()
+    totals = quote_cart(cart).rupees()
+    return jsonify(
+        {
+            "items": {item.item_name: quantity for item, quantity in cart.items()},
+            "units": sum(cart.values()),
+            "subtotal": float(totals["subtotal"]),
+            "savings": float(totals["savings"]),
+            "tax": float(totals["tax"]),
+            "errors": errors,
+        }
+    )
+
 
+def get_item_tuple(item_name):
     final_price_per_item = shopping_list[item_name].get(
         "discount_price", shopping_list[item_name]["original_price"]
     )
@@ -44,16 +92,27 @@ def add_to_cart():
         )
     except KeyError:
         amount_saved_per_item = 0
-    item_tuple = Item(item_name, final_price_per_item, amount_saved_per_item)
+    return Item(item_name, final_price_per_item, amount_saved_per_item)
+
 
-    cart[item_tuple] += quantity
-    return jsonify({"item": item_name})
+def quote_cart(cart):
+    return pricing.quote(
+        price_line(item.item_name, quantity) for item, quantity in cart.items()
+    )
+
+
+def get_cart():
+    return {
+        get_item_tuple(item_name): quantity
+        for item_name, quantity in session.get("cart", {}).items()
+        if item_name in shopping_list
+    }
 
 
 @app.route("/clear_cart")
 def clear_cart():
-    if cart:
-        cart.clear()
+    if session.get("cart"):
+        session.pop("cart")
         flash("Cart cleared! Add more items")
         return redirect(url_for("display_shopping_list"))
     else:
@@ -63,68 +122,58 @@ def clear_cart():
 
 @app.route("/shopping_list")
 def display_shopping_list():
-    return render_template("shopping_list.html", shopping_list=shopping_list)
+    return render_template(
+        "shopping_list.html", shopping_list=shopping_list, cart=session.get("cart", {})
+    )
 
 
 @app.route("/order", methods=["GET", "POST"])
 def create_order():
+    cart = get_cart()
     if request.method == "GET":
         return render_template("create_order.html", cart=cart)
     if request.method == "POST":
         if cart:
-            bill = get_bill(request)
+            bill = get_bill(request, cart)
             if bill is None:
                 flash("Undeliverable Shipping Address")
                 return redirect(url_for("create_order"))
             else:
-                cart.clear()
+                session.pop("cart")
                 return render_template("display_bill.html", bill=bill)
         else:
             flash("No items in cart to be billed")
             return redirect(url_for("create_order"))
 
 
-def get_delivery_cost(dist):
-    try:
-        return delivery_cost[
-            filter(lambda x: dist in x, delivery_cost.keys()).__next__()
-        ]
-    except StopIteration:
-        return None
-
-
-def get_bill(request):
+def get_bill(request, cart):
     customer_name = request.form.get("name")
     customer_phone_no = request.form.get("phoneNumber")
     payment_method = request.form.get("paymentMethod")
     delivery_method = request.form.get("delivery")
 
-    delivery_cost = 0
+    quote = quote_cart(cart)
+    shipping_cost = 0
     shipping_address = ""
     if delivery_method == "homedel":
-        dist_in_kms = int(request.form.get("distKMs"))
+        dist_in_kms = float(request.form.get("distKMs"))
         shipping_address = request.form.get("shippingAddress")
-        delivery_cost = get_delivery_cost(dist_in_kms)
-        if delivery_cost is None:
+        shipping_cost = delivery_cost.cost(dist_in_kms, quote.weight_in_gms)
+        if shipping_cost is None:
             return None
-    price = 0
-    saved = 0
-    for item_tuple, quantity in cart.items():
-        price += item_tuple.final_price_per_item * quantity
-        saved += item_tuple.amount_saved_per_item * quantity
-
-    tax_applied = round(0.06 * price, 2)
-    total_price = round(price + tax_applied + delivery_cost, 2)
+    quote.shipping = to_paise(shipping_cost)
+
+    totals = quote.rupees()
     bill = {
         **shop_details,
         "customerName": customer_name,
         "customerPhoneNumber": customer_phone_no,
-        "cart": cart.copy(),
-        "totalTax": tax_applied,
+        "cart": cart,
+        "totalTax": totals["tax"],
         "deliveryMethod": delivery_method,
-        "deliveryCost": delivery_cost,
-        "totalPrice": total_price,
-        "totalSavings": saved,
+        "deliveryCost": shipping_cost,
+        "totalPrice": totals["total"],
+        "totalSavings": totals["savings"],
         "paymentMethod": payment_method,
         "shippingAddress": shipping_address,
         "billingDateTime": datetime.datetime.now(),
@@ -10,22 +10,55 @@ function deliveryCheck() {
   }
 }
 
+// Sends every changed quantity on the shopping list in one request to the
+// cart API.
 $(function () {
-  $("[id^=quantity_]").on("submit", function (event) {
-    var that = this;
-    var formId = this.id;
-    var quantity = this.elements.item(0).value;
+  function showSummary(data) {
+    $("#cart_summary").text(
+      `${data["units"]} items, \u20B9 ${data["subtotal"]}` +
+        (data["savings"] ? ` (saving \u20B9 ${data["savings"]})` : "")
+    );
+  }
+
+  function updateCart() {
+    var changes = {};
+    $("[id^=quantity_]").each(function () {
+      var input = $(this).find("input");
+      if (input.val() !== String(input.data("saved"))) {
+        changes[this.id.replace(/^quantity_/, "")] = parseInt(
+          input.val() || "0",
+          10
+        );
+      }
+    });
+    if ($.isEmptyObject(changes)) {
+      return;
+    }
     $.ajax({
-      data: {
-        id: formId,
-        quantity: quantity,
-      },
+      url: "/api/cart",
       type: "POST",
-      url: "/add_to_cart",
+      contentType: "application/json",
+      data: JSON.stringify({ items: changes }),
       success: function (data) {
-        alert(`Item added: ${data["item"]}`);
+        $("[id^=quantity_]").each(function () {
+          var quantity = data["items"][this.id.replace(/^quantity_/, "")] || 0;
+          $(this).find("input").data("saved", quantity).val(quantity);
+        });
+        showSummary(data);
+        var errors = Object.values(data["errors"]);
+        if (errors.length) {
+          alert(errors.join("\n"));
+        }
       },
     });
-    event.preventDefault();
-  });
+  }
+
+  if ($("#update_cart").length) {
+    $("[id^=quantity_]").on("submit", function (event) {
+      event.preventDefault();
+      updateCart();
+    });
+    $("#update_cart").on("click", updateCart);
+    $.getJSON("/api/cart", showSummary);
+  }
 });
@@ -1,3 +1,12 @@
+import os
+import sys
+
+# Shared components live in the gadgetify package at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from gadgetify.delivery import DeliveryTariff  # noqa: E402
+from gadgetify.pricing import PriceLine, PricingEngine, to_paise  # noqa: E402
+
 shopping_list = {
     "boAt BassHeads 100 in-Ear Wired Earphones": {
         "original_price": 600,
@@ -26,8 +35,24 @@ shop_details = {
     "shopAddress": "311/5 Akshay nagar, Bangalore, Karnataka, India",
     "shopContactNumber": "+91 9988776655",
 }
-delivery_cost = {
-    range(0, 6): 0,
-    range(6, 21): 30,
-    range(21, 51): 60,
-}
+# (distance up to km, charge in rupees)
+delivery_cost = DeliveryTariff(
+    [
+        (5, 0),
+        (20, 30),
+        (50, 60),
+    ]
+)
+# Tax and discount rules; see gadgetify.pricing
+pricing = PricingEngine()
+
+
+def price_line(item_name, quantity):
+    item = shopping_list[item_name]
+    return PriceLine(
+        key=item_name,
+        quantity=quantity,
+        price=to_paise(item.get("discount_price", item["original_price"])),
+        original_price=to_paise(item["original_price"]),
+        weight_in_gms=item["weight_in_gms"],
+    )
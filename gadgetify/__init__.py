@@ -0,0 +1 @@
+"""Components shared by the Easy, Medium and Hard shopping cart solutions."""
@@ -0,0 +1,43 @@
+import math
+from bisect import bisect_left
+
+
+class DeliveryTariff:
+    """Distance-tiered delivery charges with an optional weight surcharge.
+
+    ``tiers`` is an iterable of ``(max_distance_km, cost)`` or
+    ``(max_distance_km, cost, surcharge_per_kg)`` tuples. A tier covers
+    distances up to and including its ``max_distance_km``; distances beyond
+    the last tier are undeliverable. The surcharge is charged for every
+    started kilogram above ``free_weight_gms``.
+    """
+
+    def __init__(self, tiers, free_weight_gms=0):
+        tiers = sorted(tuple(tier) + (0,) * (3 - len(tier)) for tier in tiers)
+        self.breakpoints = [tier[0] for tier in tiers]
+        self.costs = [tier[1] for tier in tiers]
+        self.surcharges = [tier[2] for tier in tiers]
+        self.free_weight_gms = free_weight_gms
+
+    @property
+    def tiers(self):
+        return list(zip(self.breakpoints, self.costs, self.surcharges))
+
+    def is_deliverable(self, distance):
+        return (
+            distance is not None
+            and 0 <= distance
+            and bool(self.breakpoints)
+            and distance <= self.breakpoints[-1]
+        )
+
+    def cost(self, distance, weight_in_gms=0):
+        """Delivery charge for ``distance`` km, or ``None`` if out of range."""
+        if not self.is_deliverable(distance):
+            return None
+        tier = bisect_left(self.breakpoints, distance)
+        cost = self.costs[tier]
+        excess_gms = (weight_in_gms or 0) - self.free_weight_gms
+        if self.surcharges[tier] and excess_gms > 0:
+            cost += self.surcharges[tier] * math.ceil(excess_gms / 1000)
+        return cost
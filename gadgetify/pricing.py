@@ -0,0 +1,339 @@
+"""Cart pricing shared by the Easy, Medium and Hard shopping cart solutions.
+
+Amounts inside a quote are whole paise (``int``), so sums are exact and tax
+is rounded once per rate, half up. ``to_paise`` and ``to_rupees`` convert at
+the edges.
+
+Tax rates are looked up by category, falling back to a default rate.
+Discount rules either take money off individual lines (``PercentOff``,
+``BuyXGetY``) or off the whole cart once it reaches a minimum
+(``CartThreshold``), optionally only between two times. The engine keeps its
+rules in a ``PromotionIndex`` keyed by item and category, so pricing a line
+only looks at the rules that can apply to it, however many there are.
+
+``PricingEngine.quote_many`` prices a batch of carts in one call and works
+out the tax rate and discount of each distinct line only once. It is meant
+for bulk quotes and for repricing order history after a rule change.
+"""
+
+from collections import defaultdict, namedtuple
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import chain, repeat
+
+DEFAULT_TAX_RATE = Decimal("0.06")
+PAISE_PER_RUPEE = Decimal(100)
+QUOTE_TOTALS = ("subtotal", "savings", "discount", "tax", "shipping", "total")
+
+
+def to_paise(amount):
+    """Whole paise in ``amount`` rupees (an int, float, str or Decimal)."""
+    return round_paise(Decimal(str(amount)) * PAISE_PER_RUPEE)
+
+
+def to_rupees(paise):
+    return (Decimal(paise) / PAISE_PER_RUPEE).quantize(Decimal("0.01"))
+
+
+def round_paise(amount):
+    return int(Decimal(amount).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+# One cart line, in paise. ``price`` is the unit price before discount rules
+# and ``original_price`` the list price it is compared with for savings.
+PriceLine = namedtuple(
+    "PriceLine",
+    ["key", "quantity", "price", "original_price", "category", "weight_in_gms"],
+    defaults=(None, None, 0),
+)
+
+# A priced line: ``amount`` is what the line costs after ``discount``, and
+# ``savings`` everything taken off the list price. ``rule`` is the line rule
+# that gave the discount, if any.
+LineQuote = namedtuple(
+    "LineQuote",
+    ["line", "amount", "discount", "savings", "tax_rate", "rule"],
+    defaults=(None,),
+)
+
+
+class Rule:
+    """A discount rule for lines for one of ``items`` or in one of
+    ``categories``, or every line when neither is given.
+
+    A rule only applies from ``starts_at`` until ``ends_at``, when given;
+    compare them with the engine's ``at`` as aware datetimes. ``key`` and
+    ``name`` identify the rule in ``Quote.applied``.
+    """
+
+    per_line = True
+
+    def __init__(
+        self, items=(), categories=(), starts_at=None, ends_at=None, key=None, name=""
+    ):
+        self.items = frozenset(items)
+        self.categories = frozenset(categories)
+        self.starts_at = starts_at
+        self.ends_at = ends_at
+        self.key = key
+        self.name = name
+
+    def matches(self, line):
+        if not (self.items or self.categories):
+            return True
+        return line.key in self.items or line.category in self.categories
+
+    def active(self, at):
+        if self.starts_at is not None and at < self.starts_at:
+            return False
+        return self.ends_at is None or at < self.ends_at
+
+    def discount(self, line):
+        """Paise off ``line``."""
+        return 0
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name or self.key!r}>"
+
+
+class PercentOff(Rule):
+    """``percent`` off matching lines."""
+
+    def __init__(self, percent, **kwargs):
+        super().__init__(**kwargs)
+        self.percent = Decimal(str(percent))
+
+    def discount(self, line):
+        if not self.matches(line):
+            return 0
+        return round_paise(line.price * line.quantity * self.percent / 100)
+
+
+class BuyXGetY(Rule):
+    """For every ``buy`` units of a matching line, ``get`` more at
+    ``percent`` off (free by default)."""
+
+    def __init__(self, buy, get, percent=100, **kwargs):
+        super().__init__(**kwargs)
+        self.buy = buy
+        self.get = get
+        self.percent = Decimal(str(percent))
+
+    def discount(self, line):
+        if not self.matches(line):
+            return 0
+        discounted = line.quantity // (self.buy + self.get) * self.get
+        return round_paise(line.price * discounted * self.percent / 100)
+
+
+class CartThreshold(Rule):
+    """``percent`` plus ``amount`` paise off the matching lines of a cart
+    once they come to at least ``minimum`` paise."""
+
+    per_line = False
+
+    def __init__(self, minimum, percent=0, amount=0, **kwargs):
+        super().__init__(**kwargs)
+        self.minimum = minimum
+        self.percent = Decimal(str(percent))
+        self.amount = amount
+
+    def cart_discount(self, eligible):
+        """Paise off ``eligible``, the cost of the matching lines."""
+        if eligible <= 0 or eligible < self.minimum:
+            return 0
+        return min(round_paise(eligible * self.percent / 100) + self.amount, eligible)
+
+
+class PromotionIndex:
+    """Rules bucketed by the item and category they are limited to.
+
+    The rules that may apply to a line are those for its item, those for its
+    category and the unrestricted ones, so looking them up costs the same
+    however many other rules there are.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self.line_index = self.build(rule for rule in self.rules if rule.per_line)
+        self.cart_index = self.build(rule for rule in self.rules if not rule.per_line)
+
+    @staticmethod
+    def build(rules):
+        by_item = defaultdict(list)
+        by_category = defaultdict(list)
+        everywhere = []
+        for rule in rules:
+            for item in rule.items:
+                by_item[item].append(rule)
+            for category in rule.categories:
+                by_category[category].append(rule)
+            if not (rule.items or rule.categories):
+                everywhere.append(rule)
+        return dict(by_item), dict(by_category), everywhere
+
+    @staticmethod
+    def lookup(index, line):
+        by_item, by_category, everywhere = index
+        found = chain(
+            by_item.get(line.key, ()), by_category.get(line.category, ()), everywhere
+        )
+        # A rule for both the line's item and its category is listed twice.
+        return list(dict.fromkeys(found))
+
+    def line_rules(self, line):
+        return self.lookup(self.line_index, line)
+
+    def cart_rules(self, line):
+        return self.lookup(self.cart_index, line)
+
+    def __len__(self):
+        return len(self.rules)
+
+
+def allocate(amount, weights):
+    """Split ``amount`` paise in proportion to ``weights`` (``{key: paise}``)
+    in whole paise, the last key taking what rounding leaves over."""
+    total = sum(weights.values())
+    shares = {}
+    left = amount
+    for key, weight in list(weights.items())[:-1]:
+        shares[key] = amount * weight // total
+        left -= shares[key]
+    if weights:
+        shares[list(weights)[-1]] = left
+    return shares
+
+
+class Quote:
+    """Totals of one priced cart, in paise.
+
+    ``cart_discount`` is what ``cart_rule``, a ``CartThreshold``, took off on
+    top of the line discounts.
+    """
+
+    def __init__(self, lines, tax, shipping=0, cart_discount=0, cart_rule=None):
+        self.lines = lines
+        self.tax = tax
+        self.shipping = shipping
+        self.cart_discount = cart_discount
+        self.cart_rule = cart_rule
+        self.subtotal = sum(line.amount for line in lines) - cart_discount
+        self.savings = sum(line.savings for line in lines) + cart_discount
+        self.discount = sum(line.discount for line in lines) + cart_discount
+        self.units = sum(line.line.quantity for line in lines)
+        self.weight_in_gms = sum(
+            (line.line.weight_in_gms or 0) * line.line.quantity for line in lines
+        )
+
+    @property
+    def total(self):
+        return self.subtotal + self.tax + self.shipping
+
+    @property
+    def applied(self):
+        """``{rule: paise}`` for every rule that took something off."""
+        applied = defaultdict(int)
+        for line in self.lines:
+            if line.rule is not None and line.discount:
+                applied[line.rule] += line.discount
+        if self.cart_discount:
+            applied[self.cart_rule] += self.cart_discount
+        return dict(applied)
+
+    def rupees(self):
+        """The totals as ``Decimal`` rupees."""
+        return {name: to_rupees(getattr(self, name)) for name in QUOTE_TOTALS}
+
+
+class PricingEngine:
+    """Prices carts of ``PriceLine``s.
+
+    ``tax_rates`` maps a category to its rate; other lines pay
+    ``default_tax_rate``. ``discounts`` is a list of rules or a
+    ``PromotionIndex`` of them, evaluated as they stand at ``at`` (now by
+    default). Of the line rules matching a line, the one taking the most off
+    applies, and of the cart rules, the one taking the most off the cart;
+    rules of a kind don't stack. Cart discounts come off after line
+    discounts, and before tax.
+    """
+
+    def __init__(
+        self, tax_rates=None, default_tax_rate=DEFAULT_TAX_RATE, discounts=(), at=None
+    ):
+        self.tax_rates = {
+            category: Decimal(str(rate)) for category, rate in (tax_rates or {}).items()
+        }
+        self.default_tax_rate = Decimal(str(default_tax_rate))
+        if not isinstance(discounts, PromotionIndex):
+            discounts = PromotionIndex(discounts)
+        self.promotions = discounts
+        self.at = at or datetime.now(timezone.utc)
+
+    def tax_rate(self, category):
+        return self.tax_rates.get(category, self.default_tax_rate)
+
+    def price_line(self, line):
+        gross = line.price * line.quantity
+        discount, applied = 0, None
+        for rule in self.promotions.line_rules(line):
+            if rule.active(self.at):
+                amount = rule.discount(line)
+                if amount > discount:
+                    discount, applied = amount, rule
+        discount = min(discount, gross)
+        original_price = line.original_price or line.price
+        return LineQuote(
+            line=line,
+            amount=gross - discount,
+            discount=discount,
+            savings=(original_price - line.price) * line.quantity + discount,
+            tax_rate=self.tax_rate(line.category),
+            rule=applied,
+        )
+
+    def build_quote(self, line_quotes, shipping=0):
+        taxable = defaultdict(int)
+        # Cost of the lines each cart rule covers, by tax rate.
+        eligible = defaultdict(lambda: defaultdict(int))
+        for line_quote in line_quotes:
+            taxable[line_quote.tax_rate] += line_quote.amount
+            for rule in self.promotions.cart_rules(line_quote.line):
+                if rule.active(self.at):
+                    eligible[rule][line_quote.tax_rate] += line_quote.amount
+
+        cart_discount, cart_rule = 0, None
+        for rule, amounts in eligible.items():
+            amount = rule.cart_discount(sum(amounts.values()))
+            if amount > cart_discount:
+                cart_discount, cart_rule = amount, rule
+        if cart_rule is not None:
+            for rate, share in allocate(cart_discount, eligible[cart_rule]).items():
+                taxable[rate] -= share
+
+        tax = sum(round_paise(amount * rate) for rate, amount in taxable.items())
+        return Quote(line_quotes, tax, shipping, cart_discount, cart_rule)
+
+    def quote(self, lines, shipping=0):
+        return self.build_quote([self.price_line(line) for line in lines], shipping)
+
+    def quote_many(self, carts, shipping=None):
+        """Quote every cart in ``carts``, each an iterable of ``PriceLine``s,
+        with ``shipping`` an optional matching sequence of charges in paise.
+
+        Lines that recur across carts are priced once.
+        """
+        priced = {}
+        quotes = []
+        for lines, cart_shipping in zip(
+            carts, repeat(0) if shipping is None else shipping
+        ):
+            line_quotes = []
+            for line in lines:
+                line_quote = priced.get(line)
+                if line_quote is None:
+                    line_quote = priced[line] = self.price_line(line)
+                line_quotes.append(line_quote)
+            quotes.append(self.build_quote(line_quotes, cart_shipping))
+        return quotes
+